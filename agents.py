@@ -1,196 +1,694 @@
 import os
-from crewai import Agent, Task, Crew, LLM
-from crewai_tools import SerperDevTool, ScrapeWebsiteTool
 from dotenv import load_dotenv
 import yaml
 import json
+import asyncio
+import threading
+import contextlib
 from pathlib import Path
-import hashlib
+import time
+import importlib.util
+import style_cache
+import result_cache
+import content_reducer
+import post_checks
+import prompt_templates
+import crew_events
+from tracing import Trace
+from research_cache import get_research_cache, _is_url, _atomic_write
 
 load_dotenv()
 
+# Config paths resolve relative to this file, not the working directory
+BASE_DIR = Path(__file__).resolve().parent
+CONFIG_DIR = BASE_DIR / "config"
+
+# "parallel" runs research and style analysis concurrently, "sequential" chains all five tasks,
+# "fast" is parallel with the validator and optimizer replaced by local checks + at most one LLM call
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "parallel")
+
+# Tokens of this task are streamed to listeners (see generate_post_stream)
+FINAL_TASK = "optimization_task"
+FINAL_AGENT = "engagement_optimizer"
+
+AGENT_NAMES = ["content_researcher", "style_analyzer", "viral_writer", "viral_validator", "engagement_optimizer"]
+
 # ==== LLM Configuration ====
-# Gemini keeps routing to Vertex AI (503 errors) with multi-agent crews
-# Best option: Use OpenAI (very cheap) or wait for Gemini to be available
-
-if os.getenv("OPENAI_API_KEY"):
-    gemini_llm = LLM(
-        model="gpt-4o-mini",
-        api_key=os.getenv("OPENAI_API_KEY"),
-        temperature=0.7
-    )
-    print("✅ Using OpenAI GPT-4o-mini (recommended)")
-elif os.getenv("GROQ_API_KEY"):
-    gemini_llm = LLM(
-        model="groq/llama-3.1-8b-instant",
-        api_key=os.getenv("GROQ_API_KEY"),
-        temperature=0.7
-    )
-    print("⚠️  Using Groq (free but has rate limits)")
-else:
-    gemini_llm = LLM(
-        model="gemini/gemini-2.0-flash-exp",
-        api_key=os.getenv("GEMINI_API_KEY"),
-        timeout=90,
-        max_retries=3
-    )
-    print("⚠️  Using Gemini (may hit Vertex AI rate limits)")
-    print("💡 For better reliability, add OPENAI_API_KEY to .env")
+# Every provider with an API key is kept (config/providers.yaml) and calls fail over between
+# them - Gemini keeps routing to Vertex AI (503 errors) and Groq is rate limited
+def build_router():
+    """LLMRouter over all configured providers"""
+    from llm_router import LLMRouter
+
+    router = LLMRouter.from_config(load_yaml_config("providers.yaml"))
+    for tier, providers in router.tiers.items():
+        print(f"✅ LLM tier '{tier}': {' -> '.join(p.label for p in providers)}")
+    if len({p.name for providers in router.tiers.values() for p in providers}) == 1:
+        print("💡 Add another provider's API key to .env for automatic failover")
+    return router
+
+def build_llm():
+    """Routed LLM of the default tier; returns ``(provider, llm)`` with the preferred provider"""
+    router = build_router()
+    return router.primary, router.llm()
 
 # ==== כלים חיצוניים (עם קאשינג + Fallback) ====
+SCRAPE_TIMEOUT = 30
+SCRAPE_HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; linkedin-post-generator)"}
+
+async def _call_tool(tool, args):
+    """Run a research tool without blocking the event loop (its own ``arun`` if it has one)"""
+    arun = getattr(tool, "arun", None)
+    if arun is not None:
+        try:
+            return await arun(args)
+        except NotImplementedError:
+            pass
+    return await asyncio.to_thread(tool.run, args)
+
 class CachedResearchTool:
-    def __init__(self):
-        self.cache_dir = Path("cache")
-        self.cache_dir.mkdir(exist_ok=True)
-        self.scrape_tool = ScrapeWebsiteTool(timeout=30, retries=2)
-        self.serper_tool = SerperDevTool()
+    def __init__(self, scrape_tool=None, serper_tool=None):
+        self.cache = get_research_cache()
+        # The stock ScrapeWebsiteTool is requests-based; the async path scrapes with httpx instead
+        # when it is installed (imported on first use, it is slow to import)
+        self.native_scrape = scrape_tool is None and importlib.util.find_spec("httpx") is not None
+        if scrape_tool is None or serper_tool is None:
+            from crewai_tools import SerperDevTool, ScrapeWebsiteTool
 
-    def _cache_file(self, key):
-        h = hashlib.sha256(key.encode('utf-8')).hexdigest()
-        return self.cache_dir / f"{h}.json"
+            scrape_tool = scrape_tool or ScrapeWebsiteTool(timeout=30, retries=2)
+            serper_tool = serper_tool or SerperDevTool()
+        self.scrape_tool = scrape_tool
+        self.serper_tool = serper_tool
 
     def fetch(self, input_url_or_topic):
-        f = self._cache_file(input_url_or_topic)
-        if f.exists():
-            with open(f, "r", encoding="utf-8") as cf:
-                return json.load(cf)["content"]
+        # Concurrent requests for the same URL/topic share one fetch
+        content = self.cache.get_or_fetch(input_url_or_topic, self._fetch_remote)
+        if content is not None:
+            return content
+        # Fallback חסר הצלחה
+        return "לא נמצאה תוצאה. נסה מונח אחר או בדוק את החיבור."
+
+    def fetch_reduced(self, input_url_or_topic, budget=None):
+        """``fetch`` trimmed to a token budget (see ``content_reducer.reduce_content``).
+
+        The reduced form is cached in the same entry as the raw scrape.
+        """
+        return self._reduced(input_url_or_topic, self.fetch(input_url_or_topic), budget)
+
+    async def afetch(self, input_url_or_topic):
+        """Async ``fetch``: same cache and fallbacks, concurrent callers share one fetch"""
+        content = await self.cache.aget_or_fetch(input_url_or_topic, self._afetch_remote)
+        if content is not None:
+            return content
+        return "לא נמצאה תוצאה. נסה מונח אחר או בדוק את החיבור."
+
+    async def afetch_reduced(self, input_url_or_topic, budget=None):
+        content = await self.afetch(input_url_or_topic)
+        # Reads/writes the cache entry on disk and reduces the page: off the event loop
+        return await asyncio.to_thread(self._reduced, input_url_or_topic, content, budget)
+
+    def _reduced(self, input_url_or_topic, content, budget):
+        budget = content_reducer.DEFAULT_TOKEN_BUDGET if budget is None else budget
+        name = f"reduced-v{content_reducer.REDUCER_VERSION}-{budget}"
+        reduced = self.cache.get_derived(input_url_or_topic, name)
+        if reduced is None:
+            reduced = content_reducer.reduce_content(content, budget, query=input_url_or_topic)
+            self.cache.put_derived(input_url_or_topic, name, reduced)
+        return reduced
+
+    async def _afetch_remote(self, input_url_or_topic):
+        try:
+            if self.native_scrape:
+                # A bare topic can't be scraped; go straight to search
+                if _is_url(input_url_or_topic):
+                    return await self._scrape_native(input_url_or_topic), "scrape"
+            else:
+                return await _call_tool(self.scrape_tool, {'website_url': input_url_or_topic}), "scrape"
+        except Exception as e:
+            print(f"❌ Scrape failed: {e}")
+        try:
+            return await _call_tool(self.serper_tool, {'search_query': input_url_or_topic}), "search"
+        except Exception as e:
+            print(f"❌ SerperDevTool failed: {e}")
+        return None
+
+    async def _scrape_native(self, url):
+        import httpx
+
+        if url.lower().startswith("www."):
+            url = "https://" + url
+        async with httpx.AsyncClient(timeout=SCRAPE_TIMEOUT, follow_redirects=True, headers=SCRAPE_HEADERS) as client:
+            response = await client.get(url)
+            response.raise_for_status()
+        return content_reducer.strip_html(response.text)
+
+    def _fetch_remote(self, input_url_or_topic):
         # ניסיון scrap מהאתר
         try:
-            content = self.scrape_tool.run({'website_url': input_url_or_topic})
-            with open(f, "w", encoding="utf-8") as cf:
-                json.dump({"content": content}, cf, ensure_ascii=False)
-            return content
+            return self.scrape_tool.run({'website_url': input_url_or_topic}), "scrape"
         except Exception as e:
             print(f"❌ ScrapeWebsiteTool failed: {e}")
         # חיפוש Google
         try:
-            result = self.serper_tool.run({'search_query': input_url_or_topic})
-            with open(f, "w", encoding="utf-8") as cf:
-                json.dump({"content": result}, cf, ensure_ascii=False)
-            return result
+            return self.serper_tool.run({'search_query': input_url_or_topic}), "search"
         except Exception as e:
             print(f"❌ SerperDevTool failed: {e}")
-        # Fallback חסר הצלחה
-        return "לא נמצאה תוצאה. נסה מונח אחר או בדוק את החיבור."
+        return None
 
 # ==== קונפיג סגנון ====
+STYLE_FILE = CONFIG_DIR / "writing_style.json"
+_style_file = prompt_templates.StyleFile(STYLE_FILE)
+
 def load_writing_style():
-    style_file = Path("config/writing_style.json")
-    if style_file.exists():
-        with open(style_file, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {"examples": [], "style_guidelines": ""}
+    """Current writing style (re-read only when the file changes); don't mutate it"""
+    return _style_file.get()
 
 def save_writing_style(examples, guidelines):
-    style_file = Path("config/writing_style.json")
-    style_file.parent.mkdir(exist_ok=True)
-    with open(style_file, "w", encoding="utf-8") as f:
-        json.dump({
-            "examples": examples,
-            "style_guidelines": guidelines
-        }, f, ensure_ascii=False, indent=2)
+    STYLE_FILE.parent.mkdir(exist_ok=True)
+    # Atomic, so a generation reading the file concurrently never sees half of it
+    _atomic_write(STYLE_FILE, json.dumps({
+        "examples": examples,
+        "style_guidelines": guidelines
+    }, ensure_ascii=False, indent=2))
+    _style_file.invalidate()
+    style_cache.clear()
 
 # ==== טעינת הגדרות YAML ====
-with open("config/agents.yaml", "r", encoding="utf-8") as f:
-    agents_config = yaml.safe_load(f)
-with open("config/tasks.yaml", "r", encoding="utf-8") as f:
-    tasks_config = yaml.safe_load(f)
+def load_yaml_config(name):
+    with open(CONFIG_DIR / name, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
 
 # ==== אייג'נטים ====
-style_analyzer = Agent(
-    role=agents_config['style_analyzer']['role'],
-    goal=agents_config['style_analyzer']['goal'],
-    backstory=agents_config['style_analyzer']['backstory'],
-    verbose=True,
-    llm=gemini_llm,
-)
-
-# Agent without tools - will work from context provided
-content_researcher = Agent(
-    role=agents_config['content_researcher']['role'],
-    goal=agents_config['content_researcher']['goal'],
-    backstory=agents_config['content_researcher']['backstory'],
-    verbose=True,
-    llm=gemini_llm,
-)
-
-viral_writer = Agent(
-    role=agents_config['viral_writer']['role'],
-    goal=agents_config['viral_writer']['goal'],
-    backstory=agents_config['viral_writer']['backstory'],
-    verbose=True,
-    llm=gemini_llm,
-)
-
-engagement_optimizer = Agent(
-    role=agents_config['engagement_optimizer']['role'],
-    goal=agents_config['engagement_optimizer']['goal'],
-    backstory=agents_config['engagement_optimizer']['backstory'],
-    verbose=True,
-    llm=gemini_llm,
-)
-
-viral_validator = Agent(
-    role=agents_config['viral_validator']['role'],
-    goal=agents_config['viral_validator']['goal'],
-    backstory=agents_config['viral_validator']['backstory'],
-    verbose=True,
-    llm=gemini_llm,
-)
+class Pipeline:
+    """LLM, YAML config and the five agents - built once per process.
+
+    Nothing here runs at import time; call ``get_pipeline()`` instead.
+    ``llm`` and the research tools can be injected (e.g. offline stubs for
+    benchmarks) and installed with ``set_pipeline()``; an injected ``llm``
+    serves every agent. Otherwise each agent gets a routed LLM of the
+    ``tier`` set for it in agents.yaml.
+
+    The YAML is validated when the pipeline is built (a bad placeholder
+    raises ``prompt_templates.TemplateError``); ``refresh()`` picks up
+    edits to it without a restart.
+    """
+
+    def __init__(self, provider=None, llm=None, scrape_tool=None, serper_tool=None):
+        self.router = None
+        if llm is None:
+            self.router = build_router()
+            provider, llm = self.router.primary, self.router.llm()
+        self.provider, self.llm = provider, llm
+        self.scrape_tool, self.serper_tool = scrape_tool, serper_tool
+        self._prompt_loader = prompt_templates.PromptConfigLoader(CONFIG_DIR, AGENT_NAMES)
+        self._build(self._prompt_loader.config)
+
+    def _build(self, prompts):
+        # Tracks which task each thread is executing (event routing, cancellation)
+        Agent = crew_events.agent_class()
+
+        self.prompts = prompts
+        self.agents_config = prompts.agents_config
+        self.tasks_config = prompts.tasks_config
+        self.agent_llms = {name: self._agent_llm(name) for name in AGENT_NAMES}
+        # Agents without tools - they work from the context provided
+        self.agents = {
+            name: Agent(
+                role=self.agents_config[name]['role'],
+                goal=self.agents_config[name]['goal'],
+                backstory=self.agents_config[name]['backstory'],
+                verbose=True,
+                llm=self.agent_llms[name],
+            )
+            for name in AGENT_NAMES
+        }
+
+    def refresh(self):
+        """Rebuild the agents if agents.yaml / tasks.yaml changed on disk since they were built"""
+        prompts = self._prompt_loader.get()
+        if prompts is not self.prompts:
+            with _pipeline_lock:
+                if prompts is not self.prompts:
+                    self._build(prompts)
+        return self
+
+    def _agent_llm(self, name):
+        if self.router is None:
+            return self.llm
+        from llm_router import DEFAULT_TIER
+
+        tier = self.agents_config[name].get("tier", DEFAULT_TIER)
+        # The final task's tokens are streamed to the UI, so its calls are never hedged
+        return self.router.llm(tier, hedge=False if name == FINAL_AGENT else None)
+
+    def models(self):
+        """Model of every agent, in AGENT_NAMES order (for cache keys)"""
+        return ",".join(self.agent_llms[name].model for name in AGENT_NAMES)
+
+    def research_tool(self):
+        return CachedResearchTool(self.scrape_tool, self.serper_tool)
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_pipeline():
+    """Lazily built, process-wide Pipeline"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = Pipeline()
+    return _pipeline
+
+def set_pipeline(pipeline):
+    """Replace the process-wide Pipeline (None to rebuild lazily on next use)"""
+    global _pipeline
+    with _pipeline_lock:
+        _pipeline = pipeline
+
+# Backwards-compatible module attributes (agents.gemini_llm, agents.viral_writer, ...)
+_LEGACY_ATTRS = {
+    "gemini_llm": lambda p: p.llm,
+    "LLM_PROVIDER": lambda p: p.provider,
+    "agents_config": lambda p: p.agents_config,
+    "tasks_config": lambda p: p.tasks_config,
+}
+
+def __getattr__(name):
+    if name in _LEGACY_ATTRS:
+        return _LEGACY_ATTRS[name](get_pipeline())
+    if name in AGENT_NAMES:
+        return get_pipeline().agents[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ==== בניית משימות ====
-def create_tasks(content_url_or_topic, writing_style_data):
+def _description(task_name, **request):
+    """Task description: the static YAML description, then its ``request`` template filled in.
+
+    OpenAI, Groq and Gemini cache the longest byte-identical prompt prefix,
+    so the persona (system prompt), the task template and the style block
+    come first and what changes per request comes last. CrewAI only adds
+    the fixed expected-output line and earlier tasks' outputs after it.
+    """
+    return get_pipeline().prompts.description(task_name, **request)
+
+def create_tasks(content_url_or_topic, writing_style_data, mode=None, style_analysis=None):
+    """Build the crew tasks.
+
+    In "parallel" mode research and style analysis don't depend on each
+    other, run as async tasks and are joined at ``writer_task``. When a
+    cached ``style_analysis`` is given the style task is skipped and the
+    analysis is handed to the writer directly. "fast" mode runs like
+    "parallel" but stops at the writer (see ``_fast_review_task``).
+    """
+    from crewai import Task
+
+    pipeline = get_pipeline()
+    agents, tasks_config = pipeline.agents, pipeline.tasks_config
+    mode = mode or PIPELINE_MODE
+    parallel = mode in ("parallel", "fast")
     research_task = Task(
-        description=tasks_config['research_task']['description'].format(content_input=content_url_or_topic),
-        agent=content_researcher,
+        name="research_task",
+        description=_description('research_task', content_input=content_url_or_topic),
+        agent=agents['content_researcher'],
         expected_output=tasks_config['research_task']['expected_output'],
+        async_execution=parallel and style_analysis is None,
     )
+    if style_analysis is not None:
+        writer_task = Task(
+            name="writer_task",
+            description=_description('writer_task', style_analysis=style_analysis),
+            agent=agents['viral_writer'],
+            expected_output=tasks_config['writer_task']['expected_output'],
+            context=[research_task]
+        )
+        return [research_task, writer_task] + ([] if mode == "fast" else _review_tasks(writer_task))
     style_task = Task(
-        description=tasks_config['style_task']['description'].format(
-            style_examples=json.dumps(writing_style_data.get('examples', []), ensure_ascii=False),
-            style_guidelines=writing_style_data.get('style_guidelines', '')
+        name="style_task",
+        description=_description(
+            'style_task',
+            style_examples=_style_file.examples_block(writing_style_data),
+            style_guidelines=writing_style_data.get('style_guidelines', ''),
         ),
-        agent=style_analyzer,
+        agent=agents['style_analyzer'],
         expected_output=tasks_config['style_task']['expected_output'],
-        context=[research_task]
+        async_execution=parallel,
+        context=[] if parallel else [research_task]
     )
     writer_task = Task(
+        name="writer_task",
         description=tasks_config['writer_task']['description'],
-        agent=viral_writer,
+        agent=agents['viral_writer'],
         expected_output=tasks_config['writer_task']['expected_output'],
         context=[research_task, style_task]
     )
+    return [research_task, style_task, writer_task] + ([] if mode == "fast" else _review_tasks(writer_task))
+
+def _review_tasks(writer_task):
+    from crewai import Task
+
+    pipeline = get_pipeline()
+    agents, tasks_config = pipeline.agents, pipeline.tasks_config
     viral_validator_task = Task(
+        name="viral_validator_task",
         description=tasks_config['viral_validator_task']['description'],
-        agent=viral_validator,
+        agent=agents['viral_validator'],
         expected_output=tasks_config['viral_validator_task']['expected_output'],
         context=[writer_task]
     )
     optimization_task = Task(
+        name=FINAL_TASK,
         description=tasks_config['optimization_task']['description'],
-        agent=engagement_optimizer,
+        agent=agents['engagement_optimizer'],
         expected_output=tasks_config['optimization_task']['expected_output'],
         context=[viral_validator_task]
     )
-    return [research_task, style_task, writer_task, viral_validator_task, optimization_task]
+    return [viral_validator_task, optimization_task]
 
-def generate_post(content_input, use_existing_style=True):
-    writing_style = load_writing_style() if use_existing_style else {"examples": [], "style_guidelines": ""}
-    
-    # Pre-fetch content using cached tool (outside of agent execution)
-    print("📥 מוריד תוכן...")
-    researcher = CachedResearchTool()
-    research_content = researcher.fetch(content_input)
-    print(f"✅ התוכן הורד ({len(research_content)} תווים)")
-    
-    # Pass the pre-fetched content directly to tasks
-    tasks = create_tasks(research_content, writing_style)
-    crew = Crew(
-        agents=[content_researcher, style_analyzer, viral_writer, viral_validator, engagement_optimizer],
-        tasks=tasks,
-        verbose=True,
+def _fast_review_task(post, needs_llm):
+    """Validation and optimization as one task, asked to fix only the checklist items in ``needs_llm``"""
+    from crewai import Task
+
+    pipeline = get_pipeline()
+    return Task(
+        name=FINAL_TASK,
+        description=_description(
+            'fast_review_task',
+            missing="\n".join(f"- {post_checks.CHECK_INSTRUCTIONS[name]}" for name in needs_llm),
+            post=post,
+        ),
+        agent=pipeline.agents[FINAL_AGENT],
+        expected_output=pipeline.tasks_config['fast_review_task']['expected_output'],
+    )
+
+def print_timings(timings):
+    print("⏱️  זמני שלבים:")
+    for stage, seconds in timings.items():
+        print(f"   • {stage}: {seconds:.2f}s")
+
+def _task_dependencies(tasks):
+    # CrewAI uses a sentinel (not a list) when a task has no explicit context
+    return {t.name: [c.name for c in t.context] if isinstance(t.context, list) else [] for t in tasks}
+
+def _result_key(content_input, writing_style, pipeline, mode=None):
+    """Result-cache key for this request, or None when the cache is off"""
+    if not result_cache.enabled():
+        return None
+    return result_cache.cache_key(
+        content_input,
+        writing_style,
+        pipeline.agents_config,
+        pipeline.tasks_config,
+        pipeline.models(),
+        getattr(pipeline.llm, "temperature", None),
+        mode or PIPELINE_MODE,
     )
-    result = crew.kickoff()
+
+def has_cached_result(content_input, use_existing_style=True, mode=None):
+    """Whether generating ``content_input`` in ``mode`` now would be served from the result cache"""
+    writing_style = load_writing_style() if use_existing_style else {"examples": [], "style_guidelines": ""}
+    key = _result_key(content_input, writing_style, get_pipeline().refresh(), mode)
+    return key is not None and result_cache.get_result_cache().contains(key)
+
+class _Generation:
+    """Steps shared by the sync and async generation paths (everything but fetch and kickoff)"""
+
+    def __init__(self, content_input, use_existing_style, mode, on_event, force):
+        self.content_input = content_input
+        self.mode = mode
+        self.force = force
+        self.on_event = on_event
+        self.trace = Trace()
+        self.writing_style = load_writing_style() if use_existing_style else {"examples": [], "style_guidelines": ""}
+        self.pipeline = get_pipeline().refresh()
+        self.result_key = _result_key(content_input, self.writing_style, self.pipeline, mode)
+        self.fast = (mode or PIPELINE_MODE) == "fast"
+        self.check_report = None
+
+    def emit(self, event):
+        event.setdefault("time", time.time())
+        self.trace.on_event(event)
+        if self.on_event:
+            self.on_event(event)
+
+    def cached_result(self):
+        """Result-cache hit as a single "result_cache" stage, or None"""
+        if self.result_key is None or self.force:
+            return None
+        cached = result_cache.get_result_cache().get(self.result_key)
+        if cached is None:
+            return None
+        print("♻️  הפוסט נטען מקאש התוצאות")
+        self.emit({"type": "stage_started", "stage": "result_cache", "agent": "Result Cache"})
+        self.emit({"type": "stage_attributes", "stage": "result_cache", "attributes": {
+            "saved_llm_calls": cached.get("llm_calls", 0),
+            "saved_tokens": cached.get("tokens", 0),
+        }})
+        self.emit({"type": "stage_completed", "stage": "result_cache"})
+        return cached["result"]
+
+    def fetch_started(self):
+        print("📥 מוריד תוכן...")
+        self.emit({"type": "stage_started", "stage": "research_fetch", "agent": "Research Fetch"})
+
+    def fetch_completed(self, reduced):
+        research_content = reduced["content"]
+        print(f"✅ התוכן הורד ({len(research_content)} תווים, {reduced['tokens_before']} -> {reduced['tokens_after']} טוקנים)")
+        self.emit({"type": "stage_attributes", "stage": "research_fetch", "attributes": {
+            "content_chars": len(research_content),
+            "content_tokens_raw": reduced["tokens_before"],
+            "content_tokens": reduced["tokens_after"],
+        }})
+        self.emit({"type": "stage_completed", "stage": "research_fetch"})
+        return research_content
+
+    def build_crew(self, research_content):
+        from crewai import Crew
+
+        pipeline = self.pipeline
+        # Style analysis only depends on the style file + YAML, so reuse it when unchanged
+        self.style_key = style_cache.cache_key(
+            self.writing_style,
+            pipeline.agents_config['style_analyzer'],
+            pipeline.tasks_config['style_task'],
+            pipeline.agent_llms['style_analyzer'].model,
+        )
+        self.style_analysis = style_cache.load(self.style_key)
+        if self.style_analysis is not None:
+            print("♻️  ניתוח הסגנון נטען מהקאש")
+        
+        # Pass the pre-fetched content directly to tasks
+        self.tasks = create_tasks(research_content, self.writing_style, mode=self.mode, style_analysis=self.style_analysis)
+        crew = Crew(
+            agents=list(pipeline.agents.values()),
+            tasks=self.tasks,
+            verbose=True,
+        )
+        stages, dependencies = [t.name for t in self.tasks], _task_dependencies(self.tasks)
+        if self.fast:
+            stages += ["local_checks", FINAL_TASK]
+            dependencies.update({"local_checks": ["writer_task"], FINAL_TASK: ["local_checks"]})
+        self.emit({"type": "pipeline_started", "stages": stages, "dependencies": dependencies})
+        return crew
+
+    def local_checks(self, draft):
+        """Fast mode: check the writer's draft locally and fix what needs no writing.
+
+        Returns a one-task crew for the items only the LLM can fix, or None
+        when nothing is left (the draft then is the final post).
+        """
+        if not self.fast:
+            return None
+        from crewai import Crew
+
+        self.emit({"type": "stage_started", "stage": "local_checks", "agent": "Local Checks"})
+        start = time.perf_counter()
+        self.check_report = post_checks.review(str(draft), self.content_input)
+        report = self.check_report
+        self.emit({"type": "stage_attributes", "stage": "local_checks", "attributes": {
+            "checks_passed": ",".join(report["passed"]),
+            "fixed_locally": ",".join(report["fixed_locally"]),
+            "needs_llm": ",".join(report["needs_llm"]),
+            "check_ms": (time.perf_counter() - start) * 1000,
+        }})
+        self.emit({"type": "stage_completed", "stage": "local_checks"})
+        print(f"🧪 צ'קליסט: תקין {report['passed']}, תוקן מקומית {report['fixed_locally']}, ל-LLM {report['needs_llm']}")
+        if not report["needs_llm"]:
+            return None
+        review_task = _fast_review_task(report["text"], report["needs_llm"])
+        self.tasks.append(review_task)
+        return Crew(agents=[review_task.agent], tasks=[review_task], verbose=True)
+
+    def _checked_result(self, result):
+        """Fast mode: the final post, with checks the LLM's rewrite dropped fixed again locally"""
+        report = self.check_report
+        if not report["needs_llm"]:
+            final = report["text"]
+            fixed_by_llm, unresolved = [], []
+        else:
+            after = post_checks.review(str(result), self.content_input)
+            final = after["text"]
+            fixed_by_llm = [name for name in report["needs_llm"] if name in after["passed"]]
+            unresolved = after["needs_llm"]
+            report["fixed_locally"] += [name for name in after["fixed_locally"] if name not in report["fixed_locally"]]
+        self.emit({"type": "stage_attributes", "stage": "local_checks", "attributes": {
+            "fixed_locally": ",".join(report["fixed_locally"]),
+            "fixed_by_llm": ",".join(fixed_by_llm),
+            "unresolved": ",".join(unresolved),
+        }})
+        if unresolved:
+            print(f"⚠️ סעיפים שנשארו חסרים: {unresolved}")
+        return final
+
+    def watch(self):
+        return crew_events.watch(self.tasks, self.emit, stream_tasks=[FINAL_TASK])
+
+    def completed(self, result):
+        """Save the caches; returns the final post"""
+        if self.check_report is not None:
+            result = self._checked_result(result)
+        if self.style_analysis is None:
+            style_task = next(t for t in self.tasks if t.name == "style_task")
+            style_cache.save(self.style_key, style_task.output.raw)
+        if self.result_key is not None:
+            stages = [span["attributes"] for span in self.trace.spans.values()]
+            result_cache.get_result_cache().put(
+                self.result_key,
+                self.content_input,
+                str(result),
+                llm_calls=sum(a["llm_calls"] for a in stages),
+                tokens=sum(a["prompt_tokens"] + a["completion_tokens"] for a in stages),
+                generation_time=time.time() - self.trace.root["start"],
+            )
+        return result
+
+def generate_post_traced(content_input, use_existing_style=True, mode=None, on_event=None, force=False):
+    """Run the crew and return ``(result, trace)``.
+
+    ``on_event`` (optional) receives progress events: fetch/stage start and
+    completion, LLM calls, and token chunks of the final task. The same
+    events feed the returned ``tracing.Trace``.
+
+    An identical earlier request (same input, style file, YAML and model)
+    is answered from the result cache as a single "result_cache" stage;
+    ``force`` skips the lookup and regenerates.
+
+    In "fast" mode the writer's draft goes through ``post_checks`` and the
+    "local_checks" stage records which checks passed, which were fixed
+    locally and which by the single merged LLM review (if one was needed).
+    """
+    run = None
+    try:
+        run = _Generation(content_input, use_existing_style, mode, on_event, force)
+        result = run.cached_result()
+        if result is None:
+            # Pre-fetch content using cached tool (outside of agent execution)
+            run.fetch_started()
+            research_content = run.fetch_completed(run.pipeline.research_tool().fetch_reduced(content_input))
+            crew = run.build_crew(research_content)
+            with run.watch():
+                result = crew.kickoff()
+            review = run.local_checks(result)
+            if review is not None:
+                with run.watch():
+                    result = review.kickoff()
+            result = run.completed(result)
+    except Exception:
+        if run is not None:
+            run.trace.finish(status="error")
+        raise
+    run.trace.finish()
+    return result, run.trace
+
+async def generate_post_async(content_input, use_existing_style=True, mode=None, on_event=None, force=False):
+    """Async ``generate_post_traced``: returns ``(result, trace)``.
+
+    Research is fetched on the event loop (``CachedResearchTool.afetch_reduced``).
+    CrewAI has no async kickoff, so the crew runs in a worker thread.
+    Cancelling the awaiting task finishes the trace as "cancelled" and
+    cancels the crew cooperatively: the thread keeps going only until the
+    next task or LLM call, which then ends without calling the provider
+    (see ``crew_events.watch``). ``on_event`` may be called from CrewAI's
+    threads.
+    """
+    run = None
+    try:
+        run = _Generation(content_input, use_existing_style, mode, on_event, force)
+        result = run.cached_result()
+        if result is None:
+            run.fetch_started()
+            reduced = await run.pipeline.research_tool().afetch_reduced(content_input)
+            research_content = run.fetch_completed(reduced)
+            crew = run.build_crew(research_content)
+            with run.watch():
+                result = await asyncio.to_thread(crew.kickoff)
+            review = run.local_checks(result)
+            if review is not None:
+                with run.watch():
+                    result = await asyncio.to_thread(review.kickoff)
+            result = run.completed(result)
+    except asyncio.CancelledError:
+        if run is not None:
+            run.trace.finish(status="cancelled")
+        print("⏹️ היצירה בוטלה")
+        raise
+    except Exception:
+        if run is not None:
+            run.trace.finish(status="error")
+        raise
+    run.trace.finish()
+    return result, run.trace
+
+def generate_post_with_timings(content_input, use_existing_style=True, mode=None, on_event=None, force=False):
+    """Run the crew and return ``(result, stage_timings)``"""
+    result, trace = generate_post_traced(content_input, use_existing_style, mode=mode, on_event=on_event, force=force)
+    return result, trace.stage_timings()
+
+async def generate_post_stream(content_input, use_existing_style=True, mode=None, force=False):
+    """Async generator of progress events for one generation (see ``generate_post_async``).
+
+    The last event is ``{"type": "done", "result": ..., "trace": {...}}``.
+    Closing the generator early (or cancelling its consumer) cancels the
+    generation.
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_event(event):
+        # CrewAI may emit from its own threads
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    async def run():
+        # Cancelled from outside the consumer (e.g. the event loop shutting down) unless replaced below
+        terminal = {"type": "error", "error": RuntimeError("היצירה בוטלה")}
+        try:
+            result, trace = await generate_post_async(content_input, use_existing_style, mode=mode,
+                                                      on_event=on_event, force=force)
+            terminal = {"type": "done", "result": result, "trace": trace.to_dict()}
+        except Exception as e:
+            terminal = {"type": "error", "error": e}
+        finally:
+            # Always end the stream, so the consumer never waits on an empty queue
+            on_event(terminal)
+
+    worker = asyncio.ensure_future(run())
+    try:
+        while True:
+            event = await events.get()
+            if event["type"] == "error":
+                raise event["error"]
+            yield event
+            if event["type"] == "done":
+                break
+    finally:
+        if not worker.done():
+            worker.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await worker
+
+def generate_post(content_input, use_existing_style=True, mode=None, force=False):
+    result, timings = generate_post_with_timings(content_input, use_existing_style, mode=mode, force=force)
+    print_timings(timings)
     return result
 
 
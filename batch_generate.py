@@ -0,0 +1,202 @@
+"""
+Batch Post Generation
+יצירת פוסטים במקביל מרשימת נושאים/לינקים
+
+Usage:
+    python batch_generate.py topics.txt --workers 4
+    python batch_generate.py --topic "AI agents in 2025" --topic https://github.com/x/y
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from rate_limit import TokenBucket
+
+# Requests per minute allowed by each provider's default tier
+DEFAULT_PROVIDER_RPM = {
+    "openai": 500,
+    "groq": 30,
+    "gemini": 15,
+}
+# A full crew run makes one LLM call per task
+LLM_CALLS_PER_POST = 5
+DEFAULT_WORKERS = 4
+
+
+def read_topics(path: Path) -> List[str]:
+    """Read one topic/URL per line, skipping blank lines and # comments"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+def provider_rpm(provider: str) -> float:
+    """RPM limit for a provider (override with BATCH_RPM_<PROVIDER>)"""
+    override = os.getenv(f"BATCH_RPM_{provider.upper()}")
+    rpm = float(override) if override else DEFAULT_PROVIDER_RPM.get(provider, 30)
+    if rpm <= 0:
+        raise ValueError(f"❌ BATCH_RPM_{provider.upper()} חייב להיות חיובי, התקבל {override}")
+    return rpm
+
+
+def generate_batch(
+    topics: Iterable[str],
+    max_workers: int = DEFAULT_WORKERS,
+    rpm: Optional[float] = None,
+    history=None,
+    on_result: Optional[Callable[[Dict], None]] = None,
+    skip_duplicates: bool = True,
+    force: bool = False,
+) -> Dict:
+    """Generate posts for many topics on a bounded worker pool.
+
+    Each newly generated post is written to ``history`` (a ``PostHistory``)
+    as soon as it completes. LLM calls are throttled per provider (``provider_rpm``,
+    or ``rpm`` for every provider) at the router, so calls that fail over to
+    another provider are held to that provider's limit.
+
+    With ``skip_duplicates``, topics that are near-duplicates of each other
+    or of a post already in history are not generated again; their entry
+    points at the existing post (``duplicate_of``). Topics generated before
+    with the same style, YAML, model and mode are served from the result cache
+    (``cached``, not saved again) unless ``force`` is set.
+
+    Returns a summary with per-topic results and overall throughput
+    (``posts_per_minute`` counts generated posts only, not cache hits).
+    """
+    from agents import generate_post_traced, get_pipeline, has_cached_result
+    from post_store import PostHistory, make_post_record
+
+    topics = list(topics)
+    history = history if history is not None else PostHistory()
+    duplicates: List[Dict] = []
+    if skip_duplicates:
+        try:
+            from dedup_index import dedupe_topics
+        except ImportError:
+            dedupe_topics = None
+        if dedupe_topics is not None:
+            topics, repeated = dedupe_topics(topics)
+            duplicates = [{"topic": t, "success": True, "duplicate_of_topic": twin} for t, twin in repeated.items()]
+    rpm_for = (lambda provider: rpm) if rpm is not None else provider_rpm
+    router = get_pipeline().router
+    limiter = None
+    if router is not None:
+        router.limit_rate(rpm_for, burst=LLM_CALLS_PER_POST)
+    else:
+        # Injected LLM (e.g. benchmark stubs): one bucket, a whole post's calls at a time
+        limiter = TokenBucket(rpm_for(get_pipeline().provider), capacity=LLM_CALLS_PER_POST)
+
+    def run_one(topic: str) -> Dict:
+        if skip_duplicates:
+            match = history.find_duplicate(topic)
+            if match:
+                return dict(match["post"], duplicate_score=match["score"], duplicate=True)
+        # A result-cache hit makes no LLM calls, so it doesn't wait for the limiter
+        if limiter is not None and (force or not has_cached_result(topic)):
+            limiter.acquire(LLM_CALLS_PER_POST)
+        start = time.perf_counter()
+        result, trace = generate_post_traced(topic, use_existing_style=True, force=force)
+        generation_time = time.perf_counter() - start
+        post_data = make_post_record(topic, str(result), generation_time, trace=trace.to_dict())
+        if "result_cache" in trace.spans:
+            # Saved when it was generated; a ~0s copy would skew the history stats
+            return dict(post_data, id=None, cached=True)
+        history.add_post(post_data)
+        return post_data
+
+    batch_start = time.perf_counter()
+    try:
+        results, failed = _run_pool(topics, run_one, max_workers, on_result)
+    finally:
+        if router is not None:
+            router.limit_rate(None)
+
+    elapsed = time.perf_counter() - batch_start
+    skipped = sum(1 for r in results if "duplicate_of" in r) + len(duplicates)
+    cached = sum(1 for r in results if r.get("cached"))
+    generated = len(topics) - failed - sum(1 for r in results if "duplicate_of" in r) - cached
+    return {
+        "total": len(topics) + len(duplicates),
+        "succeeded": len(topics) - failed + len(duplicates),
+        "failed": failed,
+        "duplicates": skipped,
+        "cached": cached,
+        "generated": generated,
+        "elapsed": elapsed,
+        "posts_per_minute": generated / elapsed * 60 if elapsed > 0 else 0.0,
+        "results": duplicates + results,
+    }
+
+
+def _run_pool(topics: List[str], run_one: Callable[[str], Dict], max_workers: int,
+              on_result: Optional[Callable[[Dict], None]]):
+    """Run ``run_one`` over ``topics``; returns the result entries and the number that failed"""
+    results: List[Dict] = []
+    failed = 0
+    print_lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run_one, topic): topic for topic in topics}
+        for future in as_completed(futures):
+            topic = futures[future]
+            try:
+                post_data = future.result()
+                entry = {"topic": topic, "success": True, "id": post_data["id"],
+                         "generation_time": post_data["generation_time"]}
+                if post_data.get("duplicate"):
+                    entry.update(generation_time=0.0, duplicate_of=post_data["id"], score=post_data["duplicate_score"])
+                elif post_data.get("cached"):
+                    entry["cached"] = True
+            except Exception as e:
+                failed += 1
+                entry = {"topic": topic, "success": False, "error": str(e)}
+            results.append(entry)
+            with print_lock:
+                status = ("♻️" if "duplicate_of" in entry else "⚡" if entry.get("cached") else "✅") if entry["success"] else "❌"
+                print(f"{status} [{len(results)}/{len(topics)}] {topic}")
+            if on_result:
+                on_result(entry)
+    return results, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate LinkedIn posts for a batch of topics/URLs")
+    parser.add_argument("file", nargs="?", type=Path, help="file with one topic/URL per line")
+    parser.add_argument("--topic", action="append", default=[], help="topic or URL (repeatable)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="max concurrent generations")
+    parser.add_argument("--rpm", type=float, default=None, help="LLM requests per minute (default: per provider)")
+    parser.add_argument("--allow-duplicates", action="store_true",
+                        help="generate near-duplicate topics again instead of reusing existing posts")
+    parser.add_argument("--force", action="store_true",
+                        help="regenerate even when an identical request is in the result cache")
+    args = parser.parse_args(argv)
+
+    topics = list(args.topic)
+    if args.file:
+        topics.extend(read_topics(args.file))
+    if not topics:
+        parser.error("❌ לא הוזנו נושאים")
+    if args.rpm is not None and args.rpm <= 0:
+        parser.error("❌ --rpm חייב להיות חיובי")
+
+    print(f"🚀 מייצר {len(topics)} פוסטים עם {args.workers} workers...")
+    summary = generate_batch(topics, max_workers=args.workers, rpm=args.rpm,
+                             skip_duplicates=not args.allow_duplicates, force=args.force)
+    print("\n" + "=" * 50)
+    print(f"✅ הצליחו: {summary['succeeded']}/{summary['total']}  ❌ נכשלו: {summary['failed']}")
+    if summary["duplicates"]:
+        print(f"♻️  כפילויות שדולגו: {summary['duplicates']}")
+    if summary["cached"]:
+        print(f"⚡ נטענו מקאש התוצאות: {summary['cached']}")
+    print(f"⏱️  זמן כולל: {summary['elapsed']:.1f}s")
+    print(f"📈 תפוקה: {summary['posts_per_minute']:.2f} פוסטים חדשים לדקה")
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
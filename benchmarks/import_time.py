@@ -0,0 +1,53 @@
+"""
+Startup-time benchmark for agents.py
+
+Measures, in fresh interpreters, the cost of ``import agents`` on its own
+and of ``import agents`` + ``get_pipeline()``. The latter is what every
+import used to pay when the LLM, YAML config and agents were built at
+module load.
+
+Usage:
+    python benchmarks/import_time.py [--runs 5]
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_ONLY = "import time; t = time.perf_counter(); import agents; print(time.perf_counter() - t)"
+IMPORT_AND_BUILD = (
+    "import time; t = time.perf_counter(); import agents; agents.get_pipeline(); "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure(code: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(out.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    lazy = measure(IMPORT_ONLY, args.runs)
+    eager = measure(IMPORT_AND_BUILD, args.runs)
+    print(f"import agents (lazy):          {lazy * 1000:8.1f} ms")
+    print(f"import + get_pipeline (eager): {eager * 1000:8.1f} ms")
+    print(json.dumps({"import_lazy_s": lazy, "import_eager_s": eager}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,467 @@
+"""
+Offline benchmark suite
+
+Runs the pipeline against a stub LLM and stub research tools (see
+``benchmarks/stubs.py``), so results are reproducible and free. Everything
+runs in a scratch directory; the real cache/ and data/ are never touched.
+
+Suites:
+    generate   generate_post end-to-end latency and pipeline overhead
+    batch      batch_generate throughput
+    history    PostHistory add/delete/page/stats/load at several sizes
+    cache      research-cache memory, disk, canonicalized and miss paths
+    dedup      near-duplicate index insert and query latency at several sizes
+    search     full-text search latency (rare, common and Hebrew-prefixed terms) at several sizes
+
+Usage:
+    python benchmarks/run_benchmarks.py [--suite history --suite cache] [--sizes 1000,10000,100000]
+    python benchmarks/run_benchmarks.py --out results.json --compare benchmarks/results/previous.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+SUITES = ["generate", "batch", "concurrency", "history", "cache", "reduce", "dedup", "search"]
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_CONCURRENCY = [1, 8, 32, 64]
+# A worker "sustains" a concurrency level while other users' events wait less than this
+MAX_LOOP_LAG_MS = 50
+# Rewriting the whole file per write makes the JSON backend unusable beyond this
+JSON_BACKEND_MAX_SIZE = 10000
+
+
+def summarize(samples: List[float]) -> Dict:
+    """Mean/p50/p95/max in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def measure(fn: Callable[[int], None], n: int) -> Dict:
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the crew's verbose output"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+# ---- generate / batch ----
+
+def bench_generate(args) -> Dict:
+    from stubs import install_stub_pipeline
+    import agents
+
+    pipeline = install_stub_pipeline(latency=args.llm_latency, output_tokens=args.llm_tokens,
+                                     scrape_latency=args.tool_latency)
+    results = {}
+    for mode in ("parallel", "sequential"):
+        samples, overhead = [], []
+        for i in range(args.runs):
+            calls_before = pipeline.llm.calls
+            start = time.perf_counter()
+            with quiet():
+                # A fresh topic per run, so research and style caches stay cold
+                agents.generate_post_traced(f"benchmark topic {mode} {i}", mode=mode)
+            elapsed = time.perf_counter() - start
+            samples.append(elapsed)
+            overhead.append(elapsed - (pipeline.llm.calls - calls_before) * args.llm_latency)
+        results[mode] = dict(summarize(samples), overhead_mean_ms=statistics.fmean(overhead) * 1000)
+    with quiet():
+        # Repeating an identical request is answered from the result cache
+        results["result_cache_hit"] = measure(
+            lambda i: agents.generate_post_traced(f"benchmark topic parallel {i % args.runs}"), args.runs)
+    results["llm_calls"] = pipeline.llm.calls
+    return results
+
+
+def bench_batch(args) -> Dict:
+    from stubs import install_stub_pipeline
+    import batch_generate
+    from post_store import PostHistory, SQLiteBackend
+
+    install_stub_pipeline(latency=args.llm_latency, output_tokens=args.llm_tokens,
+                          scrape_latency=args.tool_latency)
+    history = PostHistory(SQLiteBackend(Path("data/batch_bench.db")))
+    topics = [f"batch benchmark topic {i}" for i in range(args.batch_size)]
+    with quiet():
+        summary = batch_generate.generate_batch(topics, max_workers=args.workers, rpm=1e9, history=history,
+                                                skip_duplicates=False)
+    return {
+        "topics": summary["total"],
+        "workers": args.workers,
+        "failed": summary["failed"],
+        "cached": summary["cached"],
+        "elapsed_s": summary["elapsed"],
+        "posts_per_minute": summary["posts_per_minute"],
+    }
+
+
+def bench_concurrency(args) -> Dict:
+    """Concurrent generations in one event loop, as in a single Reflex worker.
+
+    Compares ``generate_post_async`` with the thread-per-generation pattern
+    (``asyncio.to_thread(generate_post_traced)``). Loop lag is how late a
+    10 ms ticker wakes up, i.e. how long other users' events would queue.
+    """
+    import asyncio
+    from stubs import install_stub_pipeline
+    import agents
+
+    install_stub_pipeline(latency=args.llm_latency, output_tokens=args.llm_tokens,
+                          scrape_latency=args.tool_latency)
+
+    async def run_level(mode: str, n: int) -> Dict:
+        lags, latencies = [], []
+        stop = asyncio.Event()
+
+        async def ticker():
+            while not stop.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - start - 0.01)
+
+        async def one(i: int):
+            topic = f"load {mode} {n} {i}"
+            start = time.perf_counter()
+            if mode == "async":
+                await agents.generate_post_async(topic)
+            else:
+                await asyncio.to_thread(agents.generate_post_traced, topic)
+            latencies.append(time.perf_counter() - start)
+
+        tick = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(one(i) for i in range(n)), return_exceptions=True)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await tick
+        failed = sum(1 for o in outcomes if isinstance(o, BaseException))
+        return {
+            "elapsed_s": elapsed,
+            "failed": failed,
+            "posts_per_minute": (n - failed) / elapsed * 60,
+            "latency": summarize(latencies or [0.0]),
+            "loop_lag": summarize(lags or [0.0]),
+        }
+
+    results = {}
+    previous = os.environ.get("RESULT_CACHE")
+    os.environ["RESULT_CACHE"] = "off"
+    try:
+        for mode in ("async", "threaded"):
+            levels = {}
+            sustained = 0
+            for n in args.concurrency:
+                with quiet():
+                    levels[str(n)] = asyncio.run(run_level(mode, n))
+                if levels[str(n)]["failed"] == 0 and levels[str(n)]["loop_lag"]["p95_ms"] < MAX_LOOP_LAG_MS:
+                    sustained = n
+            results[mode] = dict(levels, max_sustained=sustained)
+    finally:
+        if previous is None:
+            os.environ.pop("RESULT_CACHE", None)
+        else:
+            os.environ["RESULT_CACHE"] = previous
+    return results
+
+
+# ---- history ----
+
+def _synthetic_posts(n: int, prefix: str) -> List[Dict]:
+    from post_store import make_post_record
+
+    base = datetime(2025, 1, 1)
+    posts = []
+    for i in range(n):
+        post = make_post_record(f"topic {i}", "פוסט לדוגמה " * 40, 5 + (i % 50) * 0.7)
+        post["id"] = f"{prefix}{i:07d}"
+        post["timestamp"] = (base + timedelta(minutes=i)).isoformat()
+        posts.append(post)
+    return posts
+
+
+def _bench_backend(history, extra: List[Dict], samples: int) -> Dict:
+    _, middle_cursor = history.page(12)
+    for _ in range(min(10, history.count() // 12 // 2)):
+        _, middle_cursor = history.page(12, middle_cursor)
+    return {
+        "add": measure(lambda i: history.add_post(extra[i]), samples),
+        "delete": measure(lambda i: history.delete_post(extra[i]["id"]), samples),
+        "first_page": measure(lambda i: history.page(12), samples),
+        "deep_page": measure(lambda i: history.page(12, middle_cursor), samples),
+        "stats": measure(lambda i: history.stats(), samples),
+        "load_all": measure(lambda i: history.load(), 3),
+    }
+
+
+def bench_history(args) -> Dict:
+    from post_store import PostHistory, SQLiteBackend, JsonBackend
+
+    results = {}
+    for size in args.sizes:
+        posts = _synthetic_posts(size, "p")
+        extra = _synthetic_posts(args.samples, "x")
+
+        sqlite_history = PostHistory(SQLiteBackend(Path(f"data/bench_{size}.db")))
+        start = time.perf_counter()
+        for post in posts:
+            sqlite_history.add_post(post)
+        populate = time.perf_counter() - start
+        entry = {"sqlite": dict(_bench_backend(sqlite_history, extra, args.samples),
+                                populate_posts_per_s=size / populate)}
+
+        if size <= JSON_BACKEND_MAX_SIZE:
+            path = Path(f"data/bench_{size}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(posts, f, ensure_ascii=False)
+            entry["json"] = _bench_backend(PostHistory(JsonBackend(path)), extra, min(args.samples, 10))
+        results[str(size)] = entry
+        print(f"  history {size}: add p50 {entry['sqlite']['add']['p50_ms']:.3f}ms, "
+              f"first page p50 {entry['sqlite']['first_page']['p50_ms']:.3f}ms", file=sys.stderr)
+    return results
+
+
+# ---- research cache ----
+
+def bench_cache(args) -> Dict:
+    from research_cache import ResearchCache
+
+    n = args.samples
+    content = "תוכן לדוגמה מאתר " * 300
+    urls = [f"https://example.com/article/{i}" for i in range(n)]
+    variants = [f"HTTP://Example.com/article/{i}/?utm_source=x#top" for i in range(n)]
+
+    cache = ResearchCache(Path("cache/bench"), memory_entries=n)
+    results = {
+        "put": measure(lambda i: cache.put(urls[i], content, "scrape"), n),
+        "memory_hit": measure(lambda i: cache.get(urls[i]), n),
+        "canonicalized_hit": measure(lambda i: cache.get(variants[i]), n),
+        "miss": measure(lambda i: cache.get(f"https://example.com/missing/{i}"), n),
+    }
+    cold = ResearchCache(Path("cache/bench"), memory_entries=n)
+    results["disk_hit"] = measure(lambda i: cold.get(urls[i]), n)
+    results["get_or_fetch_miss"] = measure(
+        lambda i: cold.get_or_fetch(f"fresh topic {i}", lambda key: (content, "search")), n
+    )
+    results["counters"] = dict(cold.counters)
+    return results
+
+
+def bench_reduce(args) -> Dict:
+    from stubs import stub_page
+    from content_reducer import reduce_content, DEFAULT_TOKEN_BUDGET
+    from research_cache import ResearchCache
+
+    results = {}
+    for chars in (20000, 200000):
+        pages = [stub_page(f"https://example.com/reduce/{chars}/{i}", chars) for i in range(args.samples)]
+        reduced = [reduce_content(p, DEFAULT_TOKEN_BUDGET) for p in pages[:1]]
+        results[f"{chars}_chars"] = dict(
+            measure(lambda i: reduce_content(pages[i], DEFAULT_TOKEN_BUDGET), args.samples),
+            tokens_before=reduced[0]["tokens_before"],
+            tokens_after=reduced[0]["tokens_after"],
+        )
+    cache = ResearchCache(Path("cache/bench_reduce"))
+    for i, page in enumerate(pages):
+        cache.put(f"https://example.com/reduce/{i}", page)
+        cache.put_derived(f"https://example.com/reduce/{i}", "reduced", reduce_content(page))
+    results["cached_hit"] = measure(lambda i: cache.get_derived(f"https://example.com/reduce/{i}", "reduced"),
+                                    args.samples)
+    return results
+
+
+# ---- dedup index ----
+
+def bench_dedup(args) -> Dict:
+    from dedup_index import DedupIndex
+
+    results = {}
+    for size in args.sizes:
+        posts = _synthetic_posts(size, "d")
+        for i, post in enumerate(posts):
+            post["content_input"] = f"https://example.com/{i % 97}/article-{i}?topic={i * 7919 % 100003}"
+        index = DedupIndex(Path(f"data/dedup_{size}.db"))
+        start = time.perf_counter()
+        index.add_many(posts)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        index.query("warm up")
+        load = time.perf_counter() - start
+        queries = [posts[(i * 7) % size]["content_input"] + "&ref=x" for i in range(args.samples)]
+        extra = _synthetic_posts(args.samples, "dx")
+        results[str(size)] = {
+            "build_posts_per_s": size / build,
+            "load_s": load,
+            "query": measure(lambda i: index.query(queries[i]), args.samples),
+            "query_miss": measure(lambda i: index.query(f"unrelated topic number {i}"), args.samples),
+            "add": measure(lambda i: index.add(extra[i]), args.samples),
+        }
+        print(f"  dedup {size}: query p50 {results[str(size)]['query']['p50_ms']:.3f}ms", file=sys.stderr)
+    return results
+
+
+# ---- full-text search ----
+
+SEARCH_VOCABULARY = (
+    "סוכנים בינה מלאכותית פיתוח קוד אוטומציה מודל נתונים ענן ביצועים בדיקות "
+    "agents python cache latency pipeline vector database llm prompt deploy"
+).split()
+
+
+def bench_search(args) -> Dict:
+    import random
+    from search_index import SearchIndex
+
+    rng = random.Random(0)
+    results = {}
+    for size in args.sizes:
+        posts = []
+        for i in range(size):
+            words = rng.choices(SEARCH_VOCABULARY, k=60) + [f"topic{i}"]
+            posts.append({"id": f"s{i}", "content_input": f"topic{i} {rng.choice(SEARCH_VOCABULARY)}",
+                          "generated_post": " ".join(words)})
+        index = SearchIndex(Path(f"data/search_{size}.db"))
+        start = time.perf_counter()
+        index.add_many(posts)
+        build = time.perf_counter() - start
+        extra = [{"id": f"sx{i}", "content_input": "x", "generated_post": "חדש"} for i in range(args.samples)]
+        results[str(size)] = {
+            "build_posts_per_s": size / build,
+            "rare_term": measure(lambda i: index.search(f"topic{(i * 7919) % size}"), args.samples),
+            "common_term": measure(lambda i: index.search("סוכנים"), args.samples),
+            "common_prefix": measure(lambda i: index.search("agent"), args.samples),
+            "hebrew_prefixed": measure(lambda i: index.search("והבינה המלאכותית"), args.samples),
+            "deep_page": measure(lambda i: index.search("agents", 12, 120), args.samples),
+            "add": measure(lambda i: index.add(extra[i]), args.samples),
+            "remove": measure(lambda i: index.remove(extra[i]["id"]), args.samples),
+        }
+        print(f"  search {size}: common p50 {results[str(size)]['common_term']['p50_ms']:.3f}ms", file=sys.stderr)
+    return results
+
+
+RUNNERS = {
+    "generate": bench_generate,
+    "batch": bench_batch,
+    "concurrency": bench_concurrency,
+    "history": bench_history,
+    "cache": bench_cache,
+    "reduce": bench_reduce,
+    "dedup": bench_dedup,
+    "search": bench_search,
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _flatten(data, prefix="") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current: Dict, previous: Dict):
+    """Print metrics that moved more than 10% against a previous run"""
+    now, before = _flatten(current["suites"]), _flatten(previous.get("suites", {}))
+    print(f"\nCompared with {previous.get('git_commit') or '?'} ({previous.get('timestamp', '?')}):")
+    for name in sorted(now.keys() & before.keys()):
+        if before[name] and abs(now[name] / before[name] - 1) > 0.10:
+            print(f"  {name}: {before[name]:.4g} -> {now[name]:.4g} ({now[name] / before[name]:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="run only these suites (repeatable)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="history sizes, comma separated")
+    parser.add_argument("--samples", type=int, default=200, help="samples per micro-benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="generate_post runs per mode")
+    parser.add_argument("--batch-size", type=int, default=20, help="topics in the batch suite")
+    parser.add_argument("--workers", type=int, default=4, help="batch suite workers")
+    parser.add_argument("--concurrency", default=",".join(map(str, DEFAULT_CONCURRENCY)),
+                        help="concurrent generations in the concurrency suite, comma separated")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM latency per call (s)")
+    parser.add_argument("--llm-tokens", type=int, default=200, help="stub LLM output tokens per call")
+    parser.add_argument("--tool-latency", type=float, default=0.05, help="stub scrape/search latency (s)")
+    parser.add_argument("--out", type=Path, default=None, help="results file (default benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="previous results file to compare against")
+    args = parser.parse_args(argv)
+    args.sizes = [int(s) for s in args.sizes.split(",") if s]
+    args.concurrency = [int(s) for s in args.concurrency.split(",") if s]
+
+    started = datetime.now()
+    out = (args.out or ROOT / "benchmarks" / "results" / f"{started:%Y%m%d_%H%M%S}.json").resolve()
+    report = {
+        "timestamp": started.isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "suite")},
+        "suites": {},
+    }
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_") as scratch:
+        os.chdir(scratch)
+        try:
+            for name in args.suite or SUITES:
+                print(f"▶ {name}", file=sys.stderr)
+                try:
+                    report["suites"][name] = RUNNERS[name](args)
+                except ImportError as e:
+                    # generate/batch need crewai and dedup needs numpy; the others are stdlib only
+                    report["suites"][name] = {"skipped": str(e)}
+                    print(f"  skipped: {e}", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ results written to {out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Offline stubs for benchmarks: a deterministic LLM and fake research tools
+
+Nothing here touches the network. Latency and output size are configurable
+so pipeline overhead can be measured separately from model time.
+"""
+
+import json
+import time
+import asyncio
+import hashlib
+import threading
+
+try:
+    from crewai import BaseLLM
+except ImportError:
+    from crewai.llms.base_llm import BaseLLM
+
+WORDS = [
+    "agent", "python", "pipeline", "latency", "cache", "token", "crew", "reflex",
+    "בינה", "מלאכותית", "אוטומציה", "מפתחים", "כלי", "דמו", "קוד", "תוצאה",
+]
+
+
+def _deterministic_text(seed_text: str, n_words: int) -> str:
+    seed = hashlib.sha256(seed_text.encode("utf-8")).digest()
+    stream = (seed * (n_words // len(seed) + 1))[:n_words]
+    return " ".join(WORDS[b % len(WORDS)] for b in stream)
+
+
+class StubLLM(BaseLLM):
+    """LLM that sleeps ``latency`` seconds and returns ``output_tokens`` words.
+
+    The answer is derived from a hash of the prompt, so identical prompts
+    always produce identical output.
+    """
+
+    def __init__(self, latency: float = 0.05, output_tokens: int = 200, model: str = "stub/deterministic"):
+        super().__init__(model=model, temperature=0.0)
+        self.latency = latency
+        self.output_tokens = output_tokens
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return self._answer(messages)
+
+    def _answer(self, messages) -> str:
+        prompt = messages if isinstance(messages, str) else json.dumps(messages, ensure_ascii=False, default=str)
+        answer = _deterministic_text(prompt, self.output_tokens)
+        # CrewAI's agent executor expects the ReAct "Final Answer" format
+        return f"Thought: I now can give a great answer\nFinal Answer: {answer}"
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 128000
+
+
+def stub_page(url: str, content_chars: int = 20000) -> str:
+    """HTML page with navigation, scripts, repeated teasers and a footer around the article"""
+    nav = "".join(f"<li><a href='/{w}'>{w}</a></li>" for w in WORDS[:12])
+    teaser = f"<div class='teaser'>{_deterministic_text('related' + url, 20)}.</div>"
+    footer = "<footer>© 2025 Example Media. All rights reserved. Privacy Policy | Terms of Use</footer>"
+    head = f"<html><head><script>var tracking = {{}};</script></head><body><nav><ul>{nav}</ul></nav><h1>{url}</h1>"
+    tail = f"{teaser * 3}<div>Subscribe to our newsletter</div>{footer}</body></html>"
+    body, i = [], 0
+    while sum(map(len, body)) < content_chars - len(head) - len(tail):
+        body.append(f"<p>{_deterministic_text(f'{url}{i}', 60)}.</p>")
+        i += 1
+    return head + "".join(body) + tail
+
+
+class StubScrapeTool:
+    """Stands in for ScrapeWebsiteTool"""
+
+    def __init__(self, content_chars: int = 20000, latency: float = 0.05):
+        self.content_chars = content_chars
+        self.latency = latency
+        self.calls = 0
+
+    def run(self, args):
+        self.calls += 1
+        time.sleep(self.latency)
+        return stub_page(args["website_url"], self.content_chars)
+
+    async def arun(self, args):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return stub_page(args["website_url"], self.content_chars)
+
+
+class StubSearchTool:
+    """Stands in for SerperDevTool"""
+
+    def __init__(self, results: int = 10, latency: float = 0.05):
+        self.results = results
+        self.latency = latency
+        self.calls = 0
+
+    def run(self, args):
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._results(args["search_query"])
+
+    async def arun(self, args):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._results(args["search_query"])
+
+    def _results(self, query: str) -> str:
+        return json.dumps(
+            [{"title": f"{query} #{i}", "snippet": _deterministic_text(f"{query}{i}", 30)} for i in range(self.results)],
+            ensure_ascii=False,
+        )
+
+
+def install_stub_pipeline(latency: float = 0.05, output_tokens: int = 200, scrape_latency: float = 0.05):
+    """Make agents.get_pipeline() return a fully offline pipeline; returns it"""
+    import agents
+
+    pipeline = agents.Pipeline(
+        provider="stub",
+        llm=StubLLM(latency=latency, output_tokens=output_tokens),
+        scrape_tool=StubScrapeTool(latency=scrape_latency),
+        serper_tool=StubSearchTool(latency=scrape_latency),
+    )
+    agents.set_pipeline(pipeline)
+    return pipeline
@@ -0,0 +1,100 @@
+"""
+Local stub of the LinkedIn UGC API
+
+Accepts ``POST /v2/ugcPosts`` and ``GET /v2/me`` so the poster and the
+publish queue can be exercised without touching LinkedIn. Point the
+poster at it with ``LINKEDIN_API_BASE``.
+
+Usage:
+    python benchmarks/ugc_stub.py [--port 8099] [--fail-rate 0.2] [--retry-after 1]
+    LINKEDIN_API_BASE=http://127.0.0.1:8099/v2 python publish_queue.py run --once
+"""
+
+import sys
+import json
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+
+class UGCStub(ThreadingHTTPServer):
+    """Records every created post; fails a share of requests with 429/503"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, fail_rate: float = 0.0, retry_after: float = 1.0, seed: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.fail_rate = fail_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.posts: List[Dict] = []
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def api_base(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/v2"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: UGCStub
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: Dict = None, headers: Tuple = ()):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _should_fail(self) -> bool:
+        with self.server.lock:
+            self.server.requests += 1
+            return self.server.random.random() < self.server.fail_rate
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path != "/v2/ugcPosts":
+            return self._reply(404, {"message": "not found"})
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._reply(401, {"message": "missing token"})
+        if self._should_fail():
+            status = self.server.random.choice([429, 503])
+            return self._reply(status, {"message": "try again"}, (("Retry-After", str(self.server.retry_after)),))
+        with self.server.lock:
+            post_id = f"urn:li:share:{len(self.server.posts) + 1}"
+            self.server.posts.append({"id": post_id, "payload": payload})
+        self._reply(201, {}, (("X-RestLi-Id", post_id),))
+
+    def do_GET(self):
+        if self.path != "/v2/me":
+            return self._reply(404, {"message": "not found"})
+        self._reply(200, {"id": "stub", "localizedFirstName": "Stub", "localizedLastName": "User"})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stub of the LinkedIn UGC API")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of posts answered with 429/503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on failures")
+    args = parser.parse_args(argv)
+
+    server = UGCStub(args.port, args.fail_rate, args.retry_after)
+    print(f"🧪 UGC stub on {server.api_base} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{len(server.posts)} posts created, {server.requests} requests")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Content Reducer
+צמצום תוכן המחקר לפני שהוא נכנס ל-crew: הסרת HTML ו-boilerplate, פסקאות כפולות ובחירת משפטים לפי תקציב טוקנים
+
+Usage:
+    python content_reducer.py page.html [--budget 1500] [--query "AI agents"]
+"""
+
+import os
+import re
+import sys
+import math
+import argparse
+from html import unescape
+from html.parser import HTMLParser
+from collections import Counter
+from typing import Dict, List
+
+from crew_events import CHARS_PER_TOKEN
+from research_cache import canonical_topic
+
+# Research content is repeated in the context of every downstream task, so it gets a budget
+DEFAULT_TOKEN_BUDGET = int(os.getenv("RESEARCH_TOKEN_BUDGET", 1500))
+# Bump when the reduction changes, so reduced forms cached with the raw scrape are rebuilt
+REDUCER_VERSION = 3
+
+# Elements whose text is never article content
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer",
+             "aside", "form", "button", "select", "option"}
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "br", "tr", "table", "pre",
+              "blockquote", "h1", "h2", "h3", "h4", "h5", "h6", "dt", "dd", "figcaption"}
+BOILERPLATE = re.compile(
+    r"cookie|privacy policy|terms of (use|service)|all rights reserved|©|subscribe|newsletter|sign (in|up)"
+    r"|log ?in\b|follow us|share (on|this)|skip to (main )?content|accept all|advertisement|related (posts|articles)"
+    r"|עוגיות|מדיניות (ה)?פרטיות|תנאי שימוש|כל הזכויות שמורות|הירשמו|התחברו|שתפו|ניוזלטר",
+    re.IGNORECASE,
+)
+# Short lines are kept anyway when they look like code, commands or links
+CODE_OR_LINK = re.compile(r"https?://|[(){}\[\]=;<>]|^\s*(\$|>>>|pip |npm |python |import |from |def |class )")
+MIN_WORDS = 4
+# Longer lines and sentences are content even when they mention a boilerplate phrase
+MAX_BOILERPLATE_WORDS = 25
+# A paragraph longer than this is split into sentences before selection
+MAX_UNIT_TOKENS = 200
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w{3,}", re.UNICODE)
+
+
+def count_tokens(text: str) -> int:
+    """Same chars-per-token estimate the tracer uses when the provider reports no usage"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def strip_html(text: str) -> str:
+    """Visible text of an HTML page, one block element per line (plain text passes through)"""
+    if not re.search(r"<(html|body|div|p|span|a|script|br|h[1-6])\b", text, re.IGNORECASE):
+        return unescape(text)
+    parser = _TextExtractor()
+    parser.feed(text)
+    parser.close()
+    return "".join(parser.parts)
+
+
+def _boilerplate(text: str) -> bool:
+    return len(text.split()) < MAX_BOILERPLATE_WORDS and bool(BOILERPLATE.search(text))
+
+
+def _fingerprint(text: str) -> str:
+    # Text without longer words (code, commands) is compared as written
+    return " ".join(_WORD.findall(canonical_topic(text))) or text
+
+
+def paragraphs(text: str) -> List[str]:
+    """Non-boilerplate lines with whitespace collapsed and exact repeats dropped.
+
+    Boilerplate sentences inside longer lines ("Subscribe to our
+    newsletter.") are dropped as well.
+    """
+    seen = set()
+    kept = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if not line:
+            continue
+        words = len(line.split())
+        code_or_link = bool(CODE_OR_LINK.search(line))
+        if words < MIN_WORDS and not code_or_link:
+            continue  # menu items, buttons, breadcrumbs
+        if _boilerplate(line):
+            continue
+        if BOILERPLATE.search(line):
+            line = " ".join(s for s in _SENTENCE_END.split(line) if not _boilerplate(s))
+            if not line:
+                continue
+        fingerprint = _fingerprint(line)
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        kept.append(line)
+    return kept
+
+
+def _units(paras: List[str]) -> List[str]:
+    """Paragraphs, long ones split into sentences, without repeated units"""
+    seen = set()
+    units = []
+    for para in paras:
+        if count_tokens(para) <= MAX_UNIT_TOKENS:
+            parts = [para]
+        else:
+            parts = [s for s in _SENTENCE_END.split(para) if s.strip()]
+        for unit in parts:
+            fingerprint = _fingerprint(unit)
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                units.append(unit)
+    return units
+
+
+def select(units: List[str], budget: int, query: str = "") -> List[str]:
+    """Highest-scoring units that fit in ``budget`` tokens, in document order.
+
+    A unit scores by how many of the document's recurring words it contains
+    (words in most units count as stopwords), with a bonus for words of
+    ``query`` and a mild preference for earlier units and code.
+    """
+    bags = [set(_WORD.findall(canonical_topic(u))) for u in units]
+    df = Counter(w for bag in bags for w in bag)
+    common = max(len(units) // 2, 2)
+    query_words = set(_WORD.findall(canonical_topic(query)))
+    scores = []
+    for i, (unit, bag) in enumerate(zip(units, bags)):
+        weight = sum(math.log1p(df[w]) for w in bag if df[w] < common or len(units) < 4)
+        weight += 3.0 * len(bag & query_words)
+        if CODE_OR_LINK.search(unit):
+            weight *= 1.2
+        weight /= math.sqrt(max(count_tokens(unit), 1))
+        scores.append(weight / (1 + i / 20))
+
+    chosen, used = set(), 0
+    for i in sorted(range(len(units)), key=lambda i: -scores[i]):
+        tokens = count_tokens(units[i]) + 1  # + newline
+        if used + tokens <= budget:
+            chosen.add(i)
+            used += tokens
+    if not chosen and units:
+        # Nothing fits whole: keep the start of the best unit
+        best = max(range(len(units)), key=lambda i: scores[i])
+        return [units[best][: budget * CHARS_PER_TOKEN]]
+    return [units[i] for i in sorted(chosen)]
+
+
+def reduce_content(text: str, budget: int = DEFAULT_TOKEN_BUDGET, query: str = "") -> Dict:
+    """Compact ``text`` for the prompt; returns the content plus token counts before/after.
+
+    ``budget`` <= 0 only strips HTML, boilerplate and repeated paragraphs.
+    """
+    paras = paragraphs(strip_html(text))
+    cleaned = "\n".join(paras)
+    if budget > 0 and count_tokens(cleaned) > budget:
+        cleaned = "\n".join(select(_units(paras), budget, query))
+    if not cleaned.strip():
+        # Nothing recognisable as content - better the bare text than an empty prompt
+        cleaned = " ".join(strip_html(text).split())
+        if budget > 0:
+            cleaned = cleaned[: budget * CHARS_PER_TOKEN]
+    return {
+        "content": cleaned,
+        "tokens_before": count_tokens(text),
+        "tokens_after": count_tokens(cleaned),
+        "budget": budget,
+        "version": REDUCER_VERSION,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reduce scraped research content to a token budget")
+    parser.add_argument("file", help="scraped page or text file ('-' for stdin)")
+    parser.add_argument("--budget", type=int, default=DEFAULT_TOKEN_BUDGET)
+    parser.add_argument("--query", default="", help="topic whose words rank sentences higher")
+    args = parser.parse_args(argv)
+
+    if args.file == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.file, "r", encoding="utf-8") as f:
+            text = f.read()
+    reduced = reduce_content(text, args.budget, args.query)
+    print(reduced["content"])
+    print(f"\n✂️ {reduced['tokens_before']} -> {reduced['tokens_after']} טוקנים (תקציב {args.budget})",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Crew Events
+גשר בין ה-event bus של CrewAI לבין מאזינים לכל ריצה (התקדמות, טוקנים)
+
+CrewAI's event bus is process-global, so handlers are installed once and
+events are routed to whichever run owns the task that emitted them.
+"""
+
+import time
+import asyncio
+import threading
+import contextlib
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Optional
+
+Listener = Callable[[Dict], None]
+
+_lock = threading.Lock()
+_installed = False
+# id(task) -> (task, watch)
+_watched: Dict[int, tuple] = {}
+# (task, watch) of the watched task executing in this context, set around Agent.execute_task
+_current: ContextVar[Optional[tuple]] = ContextVar("crew_events_current", default=None)
+# id(task) -> usage the provider reported for the task's latest LLM call, until its completed event
+_call_usage: Dict[int, object] = {}
+_agent_class = None
+
+
+class GenerationCancelled(BaseException):
+    """Raised at the next task or LLM call of a run whose ``watch`` was cancelled.
+
+    A BaseException (like ``asyncio.CancelledError``), so CrewAI's
+    ``except Exception`` retry handlers don't swallow it.
+    """
+
+
+def _event_module():
+    try:
+        import crewai.events as events  # crewai >= 1.0
+    except ImportError:
+        import crewai.utilities.events as events
+    return events
+
+
+# Rough chars-per-token ratio, used when the provider reports no usage
+CHARS_PER_TOKEN = 4
+
+
+def _event_time(event) -> float:
+    timestamp = getattr(event, "timestamp", None)
+    return timestamp.timestamp() if timestamp is not None else time.time()
+
+
+def _emit(task, event: Dict):
+    entry = _watched.get(id(task))
+    if entry is not None and not entry[1].cancelled.is_set():
+        entry[1].listener(event)
+
+
+def raise_if_cancelled():
+    """Raise ``GenerationCancelled`` if the run owning the task executing here was cancelled"""
+    entry = _current.get()
+    if entry is not None and entry[1].cancelled.is_set():
+        raise GenerationCancelled(entry[0].name)
+
+
+@contextlib.contextmanager
+def running(task):
+    """Mark ``task`` as the task executing in this context (its thread) until the block ends"""
+    entry = _watched.get(id(task))
+    token = _current.set(entry)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        if entry is not None:
+            entry[1]._task_finished(task)
+
+
+def agent_class():
+    """crewai ``Agent`` subclass whose tasks run inside ``running(task)``.
+
+    A task of a cancelled run returns an empty output at once: CrewAI waits
+    forever on an async task whose thread raised, so it isn't re-raised.
+    """
+    global _agent_class
+    if _agent_class is None:
+        from crewai import Agent
+
+        class TrackedAgent(Agent):
+            def execute_task(self, task, *args, **kwargs):
+                with running(task):
+                    try:
+                        raise_if_cancelled()
+                        return super().execute_task(task, *args, **kwargs)
+                    except GenerationCancelled:
+                        return ""
+
+        _agent_class = TrackedAgent
+    return _agent_class
+
+
+def _task_for_llm_event(event):
+    """Watched task that made an LLM call (None if it isn't one of ours)"""
+    task_id = getattr(event, "task_id", None)
+    if task_id:
+        return next((task for task, _ in _watched.values() if str(task.id) == str(task_id)), None)
+    # CrewAI 0.x doesn't tag LLM events, but calls their handlers in the thread making the call,
+    # where running() has set the executing task
+    entry = _current.get()
+    return entry[0] if entry is not None and id(entry[0]) in _watched else None
+
+
+def _text_tokens(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, list):
+        value = " ".join(str(m.get("content", "")) if isinstance(m, dict) else str(m) for m in value)
+    return max(len(str(value)) // CHARS_PER_TOKEN, 1)
+
+
+def _cached_tokens(get) -> int:
+    """Prompt tokens the provider served from its prompt cache, in any of the usage shapes"""
+    cached = (get("cached_prompt_tokens", 0) or get("cached_tokens", 0)
+              or get("cache_read_input_tokens", 0)  # Anthropic
+              or get("cached_content_token_count", 0))  # Gemini
+    if not cached:
+        details = get("prompt_tokens_details", None)  # OpenAI / Groq, when not flattened by CrewAI
+        cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", 0)
+    return cached or 0
+
+
+class _UsageCallback:
+    """LLM callback recording the provider's token usage for the task making the call.
+
+    CrewAI's ``LLM.call`` hands each callback's ``log_success_event`` the
+    response's usage, in the calling thread and before it emits
+    ``LLMCallCompletedEvent`` (which carries no usage itself).
+    """
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        entry = _current.get()
+        if entry is not None and id(entry[0]) in _watched:
+            _call_usage[id(entry[0])] = response_obj.get("usage")
+
+
+# Pass along with the callbacks of LLM calls whose usage should be traced
+usage_callback = _UsageCallback()
+
+
+def _usage(task, event) -> Dict:
+    usage = _call_usage.pop(id(task), None)
+    if usage:
+        get = usage.get if isinstance(usage, dict) else (lambda k, d=0: getattr(usage, k, d))
+        return {
+            "prompt_tokens": get("prompt_tokens", 0) or 0,
+            "completion_tokens": get("completion_tokens", 0) or 0,
+            "cached_prompt_tokens": _cached_tokens(get),
+            "estimated": False,
+        }
+    return {
+        "prompt_tokens": 0,
+        "completion_tokens": _text_tokens(getattr(event, "response", None)),
+        "cached_prompt_tokens": 0,
+        "estimated": True,
+    }
+
+
+def _install():
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        _installed = True
+    events = _event_module()
+    bus = events.crewai_event_bus
+
+    @bus.on(events.TaskStartedEvent)
+    def _on_task_started(source, event):
+        if id(source) in _watched:
+            _emit(source, {
+                "type": "stage_started",
+                "stage": source.name,
+                "agent": source.agent.role.strip(),
+                "time": _event_time(event),
+            })
+
+    @bus.on(events.TaskCompletedEvent)
+    def _on_task_completed(source, event):
+        if id(source) in _watched:
+            _emit(source, {"type": "stage_completed", "stage": source.name, "time": _event_time(event)})
+
+    @bus.on(events.TaskFailedEvent)
+    def _on_task_failed(source, event):
+        if id(source) in _watched:
+            _emit(source, {
+                "type": "stage_failed",
+                "stage": source.name,
+                "error": str(getattr(event, "error", "")),
+                "time": _event_time(event),
+            })
+
+    @bus.on(events.LLMCallStartedEvent)
+    def _on_llm_started(source, event):
+        task = _task_for_llm_event(event)
+        if task is not None:
+            _emit(task, {
+                "type": "llm_call_started",
+                "stage": task.name,
+                "prompt_tokens_estimate": _text_tokens(getattr(event, "messages", None)),
+                "time": _event_time(event),
+            })
+
+    @bus.on(events.LLMCallCompletedEvent)
+    def _on_llm_completed(source, event):
+        task = _task_for_llm_event(event)
+        if task is not None:
+            _emit(task, dict(_usage(task, event), type="llm_call_completed", stage=task.name, time=_event_time(event)))
+
+    @bus.on(events.LLMCallFailedEvent)
+    def _on_llm_failed(source, event):
+        task = _task_for_llm_event(event)
+        if task is not None:
+            _emit(task, {
+                "type": "llm_call_failed",
+                "stage": task.name,
+                "error": str(getattr(event, "error", "")),
+                "time": _event_time(event),
+            })
+
+    @bus.on(events.LLMStreamChunkEvent)
+    def _on_chunk(source, event):
+        # Chunks nobody can be attributed to are dropped rather than sent to every stream
+        task = _task_for_llm_event(event)
+        entry = _watched.get(id(task))
+        if entry is not None and task.name in entry[1].stream_tasks:
+            _emit(task, {"type": "token", "stage": task.name, "text": event.chunk})
+
+
+class watch:
+    """Context manager routing CrewAI events for ``tasks`` to ``listener``.
+
+    Token chunks are only forwarded for tasks named in ``stream_tasks``.
+
+    Leaving the block with ``asyncio.CancelledError`` (or calling
+    ``cancel``) cancels the run: the crew keeps running in its thread, but
+    every remaining task and LLM call of it ends at once (for agents built
+    from ``agent_class`` and LLMs that call ``raise_if_cancelled``). The
+    tasks stay registered until they have finished, and the listener gets
+    no more events.
+    """
+
+    def __init__(self, tasks: Iterable, listener: Optional[Listener], stream_tasks: Iterable[str] = ()):
+        self.tasks = list(tasks)
+        self.listener = listener
+        self.stream_tasks = set(stream_tasks)
+        self.cancelled = threading.Event()
+        self._finished: set = set()
+        self._exited = False
+
+    def __enter__(self):
+        if self.listener is None:
+            return self
+        _install()
+        with _lock:
+            for task in self.tasks:
+                _watched[id(task)] = (task, self)
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _task_finished(self, task):
+        with _lock:
+            self._finished.add(id(task))
+            if self._exited:
+                self._unregister([task])
+
+    def _unregister(self, tasks):
+        for task in tasks:
+            if _watched.get(id(task), (None, None))[1] is self:
+                del _watched[id(task)]
+            _call_usage.pop(id(task), None)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and issubclass(exc_type, asyncio.CancelledError):
+            self.cancel()
+        with _lock:
+            self._exited = True
+            if self.cancelled.is_set():
+                # Tasks still to run must find the cancellation; drop them as they finish
+                self._unregister([t for t in self.tasks if id(t) in self._finished])
+            else:
+                self._unregister(self.tasks)
+        return False
@@ -0,0 +1,373 @@
+"""
+Dedup Index
+אינדקס דמיון מקומי (MinHash + LSH) לזיהוי נושאים ופוסטים כמעט-זהים
+
+Usage:
+    python dedup_index.py check "AI agents in 2025" [--field generated_post] [--threshold 0.7]
+    python dedup_index.py rebuild
+    python dedup_index.py stats
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from research_cache import canonical_topic, canonical_url, _is_url
+
+DEFAULT_INDEX_PATH = Path(os.getenv("DEDUP_INDEX_PATH", "data/dedup_index.db"))
+# Estimated Jaccard similarity of character shingles above which two texts are near-duplicates.
+# Short topics that differ in one token ("... 2024" / "... 2025") score ~0.85, so stay above that.
+DEFAULT_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.9))
+FIELDS = ("content_input", "generated_post")
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# 16 bands x 8 rows: pairs at similarity 0.8 share a band ~95% of the time, at 0.9 ~100%,
+# while pairs below ~0.5 (e.g. URLs on the same site) rarely become candidates
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Newly added rows are scanned linearly until this many pile up, then re-sorted
+MERGE_EVERY = 1024
+
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20250101)
+_PERM_A = _rng.integers(1, int(_PRIME), NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, int(_PRIME), NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 1 << 63, ROWS, dtype=np.uint64) | np.uint64(1)
+# Salting each band keeps keys of different bands apart in one sorted array
+_BAND_SALT = _rng.integers(0, 1 << 63, BANDS, dtype=np.uint64)
+
+
+def normalize(text: str) -> str:
+    """URLs in canonical form, free text casefolded without niqqud or extra whitespace"""
+    text = text.strip()
+    return canonical_url(text) if _is_url(text) else canonical_topic(text)
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Distinct 32-bit hashes of the text's character n-grams (vectorized rolling hash)"""
+    codes = np.frombuffer(normalize(text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return np.zeros(1, dtype=np.uint64)
+    k = min(SHINGLE_SIZE, len(codes))
+    n = len(codes) - k + 1
+    hashes = np.zeros(n, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(k):
+            hashes = hashes * np.uint64(1000003) + codes[j:j + n]
+    return np.unique(hashes & np.uint64(0xFFFFFFFF))
+
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values)"""
+    hashes = shingle_hashes(text)
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """One uint64 LSH key per band for each signature row -> shape (n, BANDS)"""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        return (bands * _BAND_MIX).sum(axis=2, dtype=np.uint64) ^ _BAND_SALT
+
+
+class _FieldIndex:
+    """In-memory LSH index over one text field.
+
+    Signatures and band keys live in growable NumPy arrays. All band keys
+    are kept in one sorted array, so a query is a single ``searchsorted``;
+    rows added since the last sort are compared directly.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.sigs = np.zeros((0, NUM_PERM), dtype=np.uint32)
+        self.keys = np.zeros((0, BANDS), dtype=np.uint64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.sorted_keys = np.zeros(0, dtype=np.uint64)
+        self.sorted_rows = np.zeros(0, dtype=np.int64)
+        self.merged = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _grow(self, needed: int):
+        capacity = len(self.sigs)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name in ("sigs", "keys", "alive"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add_many(self, post_ids: List[str], sigs: np.ndarray):
+        if not post_ids:
+            return
+        for post_id in post_ids:
+            self.remove(post_id)
+        start = len(self.ids)
+        self._grow(start + len(post_ids))
+        self.sigs[start:start + len(post_ids)] = sigs
+        self.keys[start:start + len(post_ids)] = band_keys(sigs)
+        self.alive[start:start + len(post_ids)] = True
+        for offset, post_id in enumerate(post_ids):
+            self.rows[post_id] = start + offset
+        self.ids.extend(post_ids)
+        if len(self.ids) - self.merged >= MERGE_EVERY:
+            self._merge()
+
+    def add(self, post_id: str, sig: np.ndarray):
+        self.add_many([post_id], sig[None, :])
+
+    def remove(self, post_id: str):
+        row = self.rows.pop(post_id, None)
+        if row is not None:
+            self.alive[row] = False
+
+    def _merge(self):
+        n = len(self.ids)
+        keys = self.keys[:n].ravel()
+        order = np.argsort(keys)
+        self.sorted_keys = keys[order]
+        self.sorted_rows = order // BANDS
+        self.merged = n
+
+    def query(self, sig: np.ndarray, threshold: float, limit: int) -> List[Tuple[str, float]]:
+        qkeys = band_keys(sig[None, :])[0]
+        candidates = []
+        if self.merged:
+            lo = np.searchsorted(self.sorted_keys, qkeys, "left")
+            hi = np.searchsorted(self.sorted_keys, qkeys, "right")
+            for band in np.nonzero(hi > lo)[0]:
+                candidates.append(self.sorted_rows[lo[band]:hi[band]])
+        n = len(self.ids)
+        if n > self.merged:
+            recent = np.nonzero((self.keys[self.merged:n] == qkeys).any(axis=1))[0] + self.merged
+            candidates.append(recent)
+        if not candidates:
+            return []
+        rows = np.unique(np.concatenate(candidates))
+        rows = rows[self.alive[rows]]
+        if len(rows) == 0:
+            return []
+        scores = (self.sigs[rows] == sig).mean(axis=1)
+        keep = scores >= threshold
+        rows, scores = rows[keep], scores[keep]
+        best = np.argsort(-scores, kind="stable")[:limit]
+        return [(self.ids[rows[i]], float(scores[i])) for i in best]
+
+
+class DedupIndex:
+    """Near-duplicate index over ``content_input`` and ``generated_post``.
+
+    Signatures are persisted in SQLite (one row per post and field), so
+    inserts and deletes are incremental. The LSH structures are built in
+    memory on first query.
+    """
+
+    fields = FIELDS
+
+    def __init__(self, path: Path = DEFAULT_INDEX_PATH, threshold: float = DEFAULT_THRESHOLD):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self._fields: Optional[Dict[str, _FieldIndex]] = None
+        self._synced = False
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS signatures ("
+                " post_id TEXT NOT NULL,"
+                " field TEXT NOT NULL,"
+                " sig BLOB NOT NULL,"
+                " PRIMARY KEY (post_id, field))"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _loaded(self) -> Dict[str, _FieldIndex]:
+        with self._lock:
+            if self._fields is None:
+                fields = {field: _FieldIndex() for field in FIELDS}
+                for field, index in fields.items():
+                    rows = self._conn().execute(
+                        "SELECT post_id, sig FROM signatures WHERE field = ?", (field,)
+                    ).fetchall()
+                    if rows:
+                        sigs = np.frombuffer(b"".join(r[1] for r in rows), dtype=np.uint32).reshape(-1, NUM_PERM)
+                        index.add_many([r[0] for r in rows], sigs)
+                        index._merge()
+                self._fields = fields
+            return self._fields
+
+    # ---- PostHistory hooks ----
+
+    def add(self, post: Dict):
+        """Index (or re-index) one post"""
+        self.add_many([post])
+
+    def add_many(self, posts: Iterable[Dict]):
+        entries = {field: ([], []) for field in FIELDS}
+        for post in posts:
+            for field in FIELDS:
+                text = post.get(field)
+                if isinstance(text, str) and text.strip():
+                    entries[field][0].append(post["id"])
+                    entries[field][1].append(signature(text))
+        with self._lock:
+            with self._conn() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO signatures (post_id, field, sig) VALUES (?, ?, ?)",
+                    [(pid, field, sig.tobytes())
+                     for field, (ids, sigs) in entries.items() for pid, sig in zip(ids, sigs)],
+                )
+            if self._fields is not None:
+                for field, (ids, sigs) in entries.items():
+                    if ids:
+                        self._fields[field].add_many(ids, np.stack(sigs))
+
+    def clear(self):
+        with self._lock:
+            with self._conn() as conn:
+                conn.execute("DELETE FROM signatures")
+            self._fields = None
+            self._synced = False
+
+    def remove(self, post_id: str):
+        with self._lock:
+            with self._conn() as conn:
+                conn.execute("DELETE FROM signatures WHERE post_id = ?", (post_id,))
+            if self._fields is not None:
+                for index in self._fields.values():
+                    index.remove(post_id)
+
+    # ---- queries ----
+
+    def count(self) -> int:
+        """Number of indexed posts"""
+        return self._conn().execute("SELECT COUNT(DISTINCT post_id) FROM signatures").fetchone()[0]
+
+    def sync(self, history, force: bool = False) -> int:
+        """Catch up with posts saved before the index existed (or removed behind its back)"""
+        with self._lock:
+            if self._synced and not force:
+                return 0
+            self._synced = True
+            if not force and self.count() == history.count():
+                return 0
+            posts = history.load()
+            known = {r[0] for r in self._conn().execute("SELECT DISTINCT post_id FROM signatures")}
+            current = {p["id"] for p in posts}
+            for post_id in known - current:
+                self.remove(post_id)
+            missing = [p for p in posts if p["id"] not in known]
+            self.add_many(missing)
+            return len(missing) + len(known - current)
+
+    def query(self, text: str, field: str = "content_input", threshold: Optional[float] = None,
+              limit: int = 5) -> List[Tuple[str, float]]:
+        """Indexed posts whose ``field`` is similar to ``text``: [(post_id, similarity)], best first"""
+        if not text or not text.strip():
+            return []
+        sig = signature(text)
+        with self._lock:
+            return self._loaded()[field].query(sig, self.threshold if threshold is None else threshold, limit)
+
+    def find_duplicate(self, text: str, history, field: str = "content_input",
+                       threshold: Optional[float] = None) -> Optional[Dict]:
+        """Closest post in ``history`` similar to ``text``: {"post", "score"} or None"""
+        self.sync(history)
+        for post_id, score in self.query(text, field, threshold, limit=3):
+            post = history.get_post(post_id)
+            if post is not None:
+                return {"post": post, "score": score}
+        return None
+
+    def stats(self) -> Dict:
+        fields = self._loaded()
+        return {"path": str(self.path), "posts": self.count(), **{f: len(i) for f, i in fields.items()}}
+
+
+_shared_index: Optional[DedupIndex] = None
+_shared_lock = threading.Lock()
+
+
+def get_dedup_index() -> DedupIndex:
+    """Process-wide index, so the in-memory LSH tables are built once"""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = DedupIndex()
+        return _shared_index
+
+
+def dedupe_topics(topics: List[str], threshold: float = DEFAULT_THRESHOLD) -> Tuple[List[str], Dict[str, str]]:
+    """Drop near-duplicate topics within one list; returns (kept, {dropped: kept_twin})"""
+    index = _FieldIndex()
+    kept, dropped = [], {}
+    for i, topic in enumerate(topics):
+        sig = signature(topic)
+        match = index.query(sig, threshold, 1)
+        if match:
+            dropped[topic] = topics[int(match[0][0])]
+            continue
+        index.add(str(i), sig)
+        kept.append(topic)
+    return kept, dropped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Near-duplicate index over post history")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="find posts similar to a topic or text")
+    check.add_argument("text")
+    check.add_argument("--field", choices=FIELDS, default="content_input")
+    check.add_argument("--threshold", type=float, default=None)
+    sub.add_parser("rebuild", help="re-index the whole post history")
+    sub.add_parser("stats", help="index size")
+    args = parser.parse_args(argv)
+
+    from post_store import PostHistory
+
+    history = PostHistory()
+    index = get_dedup_index()
+    if args.command == "rebuild":
+        start = time.perf_counter()
+        index.clear()
+        changed = index.sync(history, force=True)
+        print(f"✅ עודכנו {changed} פוסטים באינדקס ({time.perf_counter() - start:.1f}s)")
+    elif args.command == "stats":
+        index.sync(history)
+        print(index.stats())
+    else:
+        index.sync(history)
+        start = time.perf_counter()
+        matches = index.query(args.text, args.field, args.threshold)
+        elapsed = (time.perf_counter() - start) * 1000
+        for post_id, score in matches:
+            post = history.get_post(post_id) or {}
+            print(f"{score:.2f}  {post_id}  {str(post.get(args.field, ''))[:80]!r}")
+        print(f"🔎 {len(matches)} תוצאות ({elapsed:.2f}ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
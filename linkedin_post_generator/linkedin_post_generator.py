@@ -3,38 +3,74 @@ Post Generator UI - יצירת פוסטים ללינקדין עם Reflex
 """
 
 import reflex as rx
-from typing import List, Dict
-import json
+from typing import List, Dict, Optional
 from pathlib import Path
 from datetime import datetime
-import asyncio
+import time
 import sys
+import asyncio
+import contextlib
 sys.path.append(str(Path(__file__).parent.parent))
-from agents import generate_post
-
-# Database/Storage for posts
-class PostHistory:
-    def __init__(self):
-        self.history_file = Path("data/post_history.json")
-        self.history_file.parent.mkdir(exist_ok=True)
-        
-    def load(self) -> List[Dict]:
-        if self.history_file.exists():
-            with open(self.history_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return []
-    
-    def save(self, posts: List[Dict]):
-        with open(self.history_file, "w", encoding="utf-8") as f:
-            json.dump(posts, f, ensure_ascii=False, indent=2)
-    
-    def add_post(self, post_data: Dict):
-        posts = self.load()
-        posts.insert(0, post_data)  # Add to beginning
-        self.save(posts)
+from agents import generate_post_stream
+from post_store import PostHistory, make_post_record
+from search_index import RANK_LIMIT
+from result_cache import get_result_cache
 
+# Database/Storage for posts (SQLite by default, see POST_STORE_URL)
 post_db = PostHistory()
 
+# client token -> the background task generating for that browser tab
+_generations: Dict[str, asyncio.Task] = {}
+
+HISTORY_PAGE_SIZE = 12
+
+# Pipeline stage -> (agent label, progress text)
+STAGE_LABELS = {
+    "research_fetch": ("📥 Research Fetch", "מוריד את התוכן..."),
+    "research_task": ("🔍 Content Researcher", "חוקר את התוכן..."),
+    "style_task": ("🎨 Style Analyzer", "מנתח את סגנון הכתיבה..."),
+    "writer_task": ("✍️ Viral Writer", "כותב את הפוסט..."),
+    "viral_validator_task": ("✅ Viral Validator", "בודק את הצ'קליסט הויראלי..."),
+    "optimization_task": ("🚀 Engagement Optimizer", "מלטש את הגרסה הסופית..."),
+    "result_cache": ("♻️ Result Cache", "טוען פוסט זהה מהקאש..."),
+    "local_checks": ("🧪 Local Checks", "בודק את הצ'קליסט מקומית..."),
+}
+STREAM_PUSH_INTERVAL = 0.1  # seconds between UI pushes while tokens stream
+
+
+def checks_summary(trace: Optional[Dict]) -> str:
+    """Which checklist items were fixed locally / by the LLM in a fast-mode run ("" otherwise)"""
+    span = next((s for s in (trace or {}).get("spans", []) if s["name"] == "local_checks"), None)
+    if span is None:
+        return ""
+    attrs = span["attributes"]
+    parts = [f"{label}: {attrs[key].replace(',', ', ')}"
+             for key, label in (("fixed_locally", "🔧 תוקן מקומית"), ("fixed_by_llm", "🤖 תוקן ע\"י ה-LLM"),
+                                ("unresolved", "⚠️ עדיין חסר"))
+             if attrs.get(key)]
+    return " | ".join(parts) or "✅ כל סעיפי הצ'קליסט עברו בבדיקה המקומית"
+
+
+def _preview(text, limit: int) -> str:
+    """Truncate text for a history card"""
+    if not isinstance(text, str):
+        return ""
+    return text[:limit] + "..." if len(text) > limit else text
+
+
+def history_card_data(post: Dict) -> Dict[str, str]:
+    """Server-side view of a post - only what a history card displays"""
+    timestamp = post.get("timestamp", "")
+    gen_time = post.get("generation_time", 0)
+    return {
+        "id": post.get("id", ""),
+        "timestamp": timestamp[:10] if isinstance(timestamp, str) else "",
+        "generation_time": f"{gen_time:.1f}s" if isinstance(gen_time, (int, float)) else "0.0s",
+        "content_preview": _preview(post.get("content_input", ""), 100),
+        "post_preview": _preview(post.get("generated_post", ""), 200),
+        "snippet": post.get("snippet", ""),
+    }
+
 class State(rx.State):
     """State management for the app"""
     
@@ -46,112 +82,300 @@ class State(rx.State):
     generated_post: str = ""
     generation_time: float = 0.0
     generation_error: str = ""
+    duplicate_notice: str = ""
+    checks_notice: str = ""
+    force_regenerate: bool = False
     
     # Agent progress tracking
     current_agent: str = ""
     agent_progress: str = ""
     
-    # Post history
-    post_history: List[Dict] = []
+    # Post history (current page only)
+    post_history: List[Dict[str, str]] = []
+    history_cursor: str = ""
+    history_next_cursor: str = ""
+    history_prev_cursors: List[str] = []
+    
+    # Full-text search over history (active_search is the query being shown)
+    search_query: str = ""
+    active_search: str = ""
+    search_page: int = 0
+    search_total: int = 0
     
     # Stats
     total_posts: int = 0
     total_generation_time: float = 0.0
     avg_generation_time: float = 0.0
+    posts_today: int = 0
+    p50_generation_time: float = 0.0
+    p95_generation_time: float = 0.0
+    stage_stats: List[Dict[str, str]] = []
+    result_cache_hit_rate: float = 0.0
+    result_cache_saved_calls: int = 0
+    result_cache_saved_tokens: int = 0
     
     def load_history(self):
-        """Load post history from file"""
-        self.post_history = post_db.load()
-        self.total_posts = len(self.post_history)
-        
-        if self.total_posts > 0:
-            self.total_generation_time = sum(p.get("generation_time", 0) for p in self.post_history)
-            self.avg_generation_time = self.total_generation_time / self.total_posts
+        """Load stats and the first page of post history"""
+        self.history_cursor = ""
+        self.history_prev_cursors = []
+        self.search_query = ""
+        self.active_search = ""
+        self.load_stats()
+        self.load_history_page()
     
-    async def generate_new_post(self):
-        """Generate a new LinkedIn post"""
-        if not self.content_input.strip():
-            self.generation_error = "❌ אנא הזן URL או נושא"
+    def load_stats(self):
+        """Load generation statistics from the running aggregates"""
+        stats = post_db.stats()
+        self.total_posts = stats["total_posts"]
+        self.total_generation_time = stats["total_generation_time"]
+        self.avg_generation_time = stats["avg_generation_time"]
+        self.posts_today = stats["posts_today"]
+        self.p50_generation_time = stats["p50_generation_time"]
+        self.p95_generation_time = stats["p95_generation_time"]
+        self.stage_stats = [
+            {
+                "stage": STAGE_LABELS.get(name, (name, ""))[0],
+                "avg_wall_time": f"{stage['avg_wall_time']:.1f}s",
+                "avg_tokens": f"{stage['avg_tokens']:.0f}",
+                "avg_cached_tokens": f"{stage['avg_cached_tokens']:.0f}",
+            }
+            for name, stage in stats["stages"].items()
+        ]
+        cache_stats = get_result_cache().stats()
+        self.result_cache_hit_rate = cache_stats["hit_rate"] * 100
+        self.result_cache_saved_calls = cache_stats["saved_llm_calls"]
+        self.result_cache_saved_tokens = cache_stats["saved_tokens"]
+    
+    def load_history_page(self):
+        """Load the page of post history starting at history_cursor"""
+        posts, self.history_next_cursor = post_db.page(HISTORY_PAGE_SIZE, self.history_cursor)
+        self.post_history = [history_card_data(p) for p in posts]
+    
+    def search_history(self):
+        """Run a full-text search over the history (an empty query goes back to browsing)"""
+        self.active_search = self.search_query.strip()
+        self.search_page = 0
+        if not self.active_search:
+            self.clear_search()
+            return
+        self.load_search_page()
+    
+    def clear_search(self):
+        """Leave search results and show the newest posts again"""
+        self.search_query = ""
+        self.active_search = ""
+        self.search_total = 0
+        self.history_cursor = ""
+        self.history_prev_cursors = []
+        self.load_history_page()
+    
+    def load_search_page(self):
+        """Load the current page of ranked search results"""
+        posts, self.search_total = post_db.search(
+            self.active_search, HISTORY_PAGE_SIZE, self.search_page * HISTORY_PAGE_SIZE
+        )
+        self.post_history = [history_card_data(p) for p in posts]
+    
+    def next_history_page(self):
+        """Move to the next (older) page of history"""
+        if self.active_search:
+            if (self.search_page + 1) * HISTORY_PAGE_SIZE < self.search_total:
+                self.search_page += 1
+                self.load_search_page()
+            return
+        if not self.history_next_cursor:
+            return
+        self.history_prev_cursors.append(self.history_cursor)
+        self.history_cursor = self.history_next_cursor
+        self.load_history_page()
+    
+    def prev_history_page(self):
+        """Move back to the previous (newer) page of history"""
+        if self.active_search:
+            if self.search_page > 0:
+                self.search_page -= 1
+                self.load_search_page()
+            return
+        if not self.history_prev_cursors:
             return
+        self.history_cursor = self.history_prev_cursors.pop()
+        self.load_history_page()
+    
+    @rx.event(background=True)
+    async def generate_new_post(self):
+        """Generate a new LinkedIn post, streaming progress and final-stage tokens.
+
+        Runs as a background task, so other events (including
+        ``cancel_generation``) are handled while the crew works.
+        """
+        async with self:
+            if self.is_generating:
+                return
+            if not self.content_input.strip():
+                self.generation_error = "❌ אנא הזן URL או נושא"
+                return
+            content_input = self.content_input
+            force = self.force_regenerate
+            client_token = self.router.session.client_token
+            self.duplicate_notice = ""
+            self.checks_notice = ""
         
-        self.is_generating = True
-        self.generated_post = ""
-        self.generation_error = ""
-        self.current_agent = "מתחיל..."
-        self.agent_progress = "מכין את ה-AI Agents..."
+        if not force:
+            match = await asyncio.to_thread(post_db.find_duplicate, content_input)
+            if match:
+                # A near-identical topic was already generated - show it instead of a new 5-agent run
+                post = match["post"]
+                async with self:
+                    self.generated_post = post.get("generated_post", "")
+                    self.generation_time = 0.0
+                    self.generation_error = ""
+                    self.duplicate_notice = (
+                        f"♻️ נמצא פוסט דומה ({match['score']:.0%}) מ-{post.get('timestamp', '')[:10]} - "
+                        "מוצג הפוסט הקיים. סמן 'צור מחדש' כדי ליצור פוסט חדש."
+                    )
+                return
+        
+        async with self:
+            self.is_generating = True
+            self.generated_post = ""
+            self.generation_error = ""
+            self.current_agent = "מתחיל..."
+            self.agent_progress = "מכין את ה-AI Agents..."
+        _generations[client_token] = asyncio.current_task()
         
         try:
             start_time = datetime.now()
+            active_stages = []
+            completed = 0
+            total_stages = len(STAGE_LABELS)
+            last_push = 0.0
+            streamed = ""
+            result = None
+            trace = None
             
-            # Update progress
-            self.current_agent = "🔍 Content Researcher"
-            self.agent_progress = "חוקר את התוכן..."
-            
-            # Generate post using CrewAI agents
-            result = await asyncio.to_thread(
-                generate_post,
-                self.content_input,
-                use_existing_style=True
-            )
+            # Generate post using CrewAI agents - real stage boundaries drive the progress
+            async with contextlib.aclosing(generate_post_stream(content_input, use_existing_style=True,
+                                                                force=force)) as events:
+                async for event in events:
+                    kind = event["type"]
+                    if kind == "pipeline_started":
+                        total_stages = len(event["stages"]) + 1  # + research fetch
+                    elif kind == "stage_started":
+                        active_stages.append(event["stage"])
+                    elif kind in ("stage_completed", "stage_failed"):
+                        if event["stage"] in active_stages:
+                            active_stages.remove(event["stage"])
+                        completed += 1
+                    elif kind == "token":
+                        streamed += event["text"]
+                        # Throttle websocket pushes while tokens stream in
+                        now = time.monotonic()
+                        if now - last_push < STREAM_PUSH_INTERVAL:
+                            continue
+                        last_push = now
+                        async with self:
+                            self.generated_post = streamed
+                        continue
+                    elif kind == "done":
+                        result = event["result"]
+                        trace = event["trace"]
+                        break
+                    
+                    if active_stages:
+                        labels = [STAGE_LABELS.get(stage, (stage, "")) for stage in active_stages]
+                        async with self:
+                            self.current_agent = " + ".join(label for label, _ in labels)
+                            self.agent_progress = f"{labels[-1][1]} ({completed}/{total_stages} שלבים הושלמו)"
             
             end_time = datetime.now()
             generation_time = (end_time - start_time).total_seconds()
             
-            self.current_agent = "✅ הושלם"
-            self.agent_progress = "הפוסט נוצר בהצלחה!"
-            
             # Extract post text from result
             post_text = str(result)
+            cached = any(span.get("name") == "result_cache" for span in (trace or {}).get("spans", []))
             
-            self.generated_post = post_text
-            self.generation_time = generation_time
+            if cached:
+                # Served from the result cache: the post was saved when it was generated,
+                # and a ~0s record would skew the generation-time stats
+                async with self:
+                    self.current_agent = "✅ הושלם"
+                    self.agent_progress = "⚡ נטען מקאש התוצאות"
+                    self.generated_post = post_text
+                    self.generation_time = 0.0
+                    self.checks_notice = checks_summary(trace)
+                    self.duplicate_notice = "⚡ הפוסט נטען מקאש התוצאות. סמן 'צור מחדש' כדי ליצור פוסט חדש."
+                return
             
-            # Save to history
-            post_data = {
-                "id": datetime.now().strftime("%Y%m%d_%H%M%S"),
-                "content_input": self.content_input,
-                "generated_post": post_text,
-                "generation_time": generation_time,
-                "timestamp": datetime.now().isoformat(),
-                "posted_to_linkedin": False,
-                "engagement": {
-                    "likes": 0,
-                    "comments": 0,
-                    "shares": 0
-                }
-            }
+            # Save to history (SQLite work stays off the event loop)
+            post_data = make_post_record(content_input, post_text, generation_time, trace=trace)
+            similar = await asyncio.to_thread(post_db.find_duplicate, post_text, field="generated_post")
+            if similar:
+                post_data["near_duplicate_of"] = similar["post"]["id"]
+            await asyncio.to_thread(post_db.add_post, post_data)
             
-            post_db.add_post(post_data)
-            self.load_history()
+            async with self:
+                self.current_agent = "✅ הושלם"
+                self.agent_progress = "הפוסט נוצר בהצלחה!"
+                self.generated_post = post_text
+                self.generation_time = generation_time
+                self.checks_notice = checks_summary(trace)
+                if similar:
+                    self.duplicate_notice = f"⚠️ הפוסט החדש דומה ({similar['score']:.0%}) לפוסט קיים מ-{similar['post'].get('timestamp', '')[:10]}"
+                self.load_history()
             
+        except asyncio.CancelledError:
+            # Stopped by the user (or the page was left) - nothing is saved
+            async with self:
+                self.current_agent = "⏹️ בוטל"
+                self.agent_progress = ""
+        
         except Exception as e:
-            self.generation_error = f"❌ שגיאה ביצירת הפוסט: {str(e)}"
-            self.current_agent = "❌ נכשל"
-            self.agent_progress = ""
+            async with self:
+                self.generation_error = f"❌ שגיאה ביצירת הפוסט: {str(e)}"
+                self.current_agent = "❌ נכשל"
+                self.agent_progress = ""
             print(f"Error in generate_new_post: {e}")  # Debug logging
         
         finally:
-            self.is_generating = False
+            _generations.pop(client_token, None)
+            async with self:
+                self.is_generating = False
+    
+    def cancel_generation(self):
+        """Stop this client's running generation (its crew makes no LLM calls after the one in flight)"""
+        task = _generations.get(self.router.session.client_token)
+        if task is not None:
+            task.cancel()
     
     def clear_input(self):
         """Clear the input field"""
         self.content_input = ""
         self.generated_post = ""
         self.generation_error = ""
+        self.duplicate_notice = ""
+        self.checks_notice = ""
         self.current_agent = ""
         self.agent_progress = ""
     
     def delete_post(self, post_id: str):
         """Delete a post from history"""
-        posts = post_db.load()
-        posts = [p for p in posts if p.get("id") != post_id]
-        post_db.save(posts)
-        self.load_history()
+        post_db.delete_post(post_id)
+        self.load_stats()
+        if self.active_search:
+            self.load_search_page()
+        else:
+            self.load_history_page()
     
     def copy_post(self, post_text: str):
         """Copy post to clipboard"""
         # Note: Actual clipboard copy needs JS interop
         return rx.call_script(f"navigator.clipboard.writeText(`{post_text}`)")
+    
+    def copy_history_post(self, post_id: str):
+        """Copy a history post by id (cards only hold previews)"""
+        post = post_db.get_post(post_id)
+        if post:
+            return rx.set_clipboard(post.get("generated_post", ""))
 
 
 def header() -> rx.Component:
@@ -202,38 +426,105 @@ def stats_card(title: str, value: str, icon: str, color: str) -> rx.Component:
     )
 
 
+def stage_breakdown_row(stage: Dict) -> rx.Component:
+    """One pipeline stage in the breakdown table"""
+    return rx.table.row(
+        rx.table.cell(stage["stage"]),
+        rx.table.cell(stage["avg_wall_time"]),
+        rx.table.cell(stage["avg_tokens"]),
+        rx.table.cell(stage["avg_cached_tokens"]),
+    )
+
+
+def stage_breakdown(state: State) -> rx.Component:
+    """Average wall time, tokens and prompt-cached tokens per pipeline stage (from stored traces)"""
+    return rx.table.root(
+        rx.table.header(
+            rx.table.row(
+                rx.table.column_header_cell("שלב"),
+                rx.table.column_header_cell("זמן ממוצע"),
+                rx.table.column_header_cell("טוקנים בממוצע"),
+                rx.table.column_header_cell("מהקאש של הספק"),
+            )
+        ),
+        rx.table.body(
+            rx.foreach(state.stage_stats, stage_breakdown_row)
+        ),
+        size="1",
+        width="100%"
+    )
+
+
 def stats_section(state: State) -> rx.Component:
     """Stats dashboard section"""
     return rx.box(
         rx.heading("📊 סטטיסטיקות", size="5", margin_bottom="1rem"),
         rx.cond(
             state.total_posts > 0,
-            rx.grid(
-                stats_card(
-                    "פוסטים שנוצרו",
-                    state.total_posts,
-                    "📝",
-                    "blue"
-                ),
-                stats_card(
-                    "זמן יצירה ממוצע",
-                    f"{state.avg_generation_time:.1f}s",
-                    "⏱️",
-                    "green"
-                ),
-                stats_card(
-                    "סה\"כ זמן",
-                    f"{state.total_generation_time:.1f}s",
-                    "⌚",
-                    "purple"
+            rx.vstack(
+                rx.grid(
+                    stats_card(
+                        "פוסטים שנוצרו",
+                        state.total_posts,
+                        "📝",
+                        "blue"
+                    ),
+                    stats_card(
+                        "זמן יצירה ממוצע",
+                        f"{state.avg_generation_time:.1f}s",
+                        "⏱️",
+                        "green"
+                    ),
+                    stats_card(
+                        "סה\"כ זמן",
+                        f"{state.total_generation_time:.1f}s",
+                        "⌚",
+                        "purple"
+                    ),
+                    stats_card(
+                        "פוסטים היום",
+                        state.posts_today,
+                        "🎯",
+                        "orange"
+                    ),
+                    stats_card(
+                        "זמן יצירה p50",
+                        f"{state.p50_generation_time:.1f}s",
+                        "📈",
+                        "cyan"
+                    ),
+                    stats_card(
+                        "זמן יצירה p95",
+                        f"{state.p95_generation_time:.1f}s",
+                        "🐢",
+                        "red"
+                    ),
+                    stats_card(
+                        "פגיעות בקאש תוצאות",
+                        f"{state.result_cache_hit_rate:.0f}%",
+                        "♻️",
+                        "teal"
+                    ),
+                    stats_card(
+                        "קריאות LLM שנחסכו",
+                        state.result_cache_saved_calls,
+                        "💰",
+                        "yellow"
+                    ),
+                    stats_card(
+                        "טוקנים שנחסכו",
+                        state.result_cache_saved_tokens,
+                        "🪙",
+                        "gray"
+                    ),
+                    columns="3",
+                    spacing="4",
+                    width="100%"
                 ),
-                stats_card(
-                    "פוסטים היום",
-                    "0",  # TODO: Calculate today's posts
-                    "🎯",
-                    "orange"
+                rx.cond(
+                    state.stage_stats.length() > 0,
+                    stage_breakdown(state)
                 ),
-                columns="4",
                 spacing="4",
                 width="100%"
             ),
@@ -298,6 +589,16 @@ def input_section(state: State) -> rx.Component:
                     color_scheme="blue",
                     width="200px"
                 ),
+                rx.cond(
+                    state.is_generating,
+                    rx.button(
+                        "⏹️ עצור",
+                        on_click=State.cancel_generation,
+                        size="3",
+                        variant="outline",
+                        color_scheme="red"
+                    )
+                ),
                 rx.button(
                     "🗑️ נקה",
                     on_click=State.clear_input,
@@ -305,7 +606,14 @@ def input_section(state: State) -> rx.Component:
                     variant="outline",
                     color_scheme="gray"
                 ),
+                rx.checkbox(
+                    "צור מחדש",
+                    checked=state.force_regenerate,
+                    on_change=State.set_force_regenerate,
+                    size="2"
+                ),
                 spacing="3",
+                align="center",
                 width="100%"
             ),
             rx.cond(
@@ -317,6 +625,24 @@ def input_section(state: State) -> rx.Component:
                     width="100%"
                 )
             ),
+            rx.cond(
+                state.duplicate_notice != "",
+                rx.callout(
+                    state.duplicate_notice,
+                    icon="info",
+                    color_scheme="amber",
+                    width="100%"
+                )
+            ),
+            rx.cond(
+                state.checks_notice != "",
+                rx.callout(
+                    state.checks_notice,
+                    icon="list_checks",
+                    color_scheme="green",
+                    width="100%"
+                )
+            ),
             rx.cond(
                 state.is_generating,
                 rx.card(
@@ -416,37 +742,24 @@ def generated_post_section(state: State) -> rx.Component:
 
 
 def post_history_card(post: Dict) -> rx.Component:
-    """Single post history card"""
-    # Pre-process data to avoid Var slicing issues
-    timestamp_raw = post.get("timestamp", "")
-    timestamp = timestamp_raw[:10] if isinstance(timestamp_raw, str) else ""
-    
-    gen_time = post.get('generation_time', 0)
-    gen_time_str = f"{gen_time:.1f}s" if isinstance(gen_time, (int, float)) else "0.0s"
-    
-    content_input = post.get("content_input", "")
-    content_preview = (content_input[:100] + "...") if isinstance(content_input, str) and len(content_input) > 100 else content_input
-    
-    generated_post = post.get("generated_post", "")
-    post_preview = (generated_post[:200] + "...") if isinstance(generated_post, str) and len(generated_post) > 200 else generated_post
-    
+    """Single post history card (fields are pre-computed by history_card_data)"""
     return rx.card(
         rx.vstack(
             rx.hstack(
                 rx.badge(
-                    timestamp,
+                    post["timestamp"],
                     color_scheme="blue",
                     size="1"
                 ),
                 rx.spacer(),
                 rx.badge(
-                    gen_time_str,
+                    post["generation_time"],
                     color_scheme="green",
                     size="1"
                 ),
                 rx.button(
                     "🗑️",
-                    on_click=lambda: State.delete_post(post.get("id")),
+                    on_click=lambda: State.delete_post(post["id"]),
                     size="1",
                     variant="ghost",
                     color_scheme="red"
@@ -455,15 +768,24 @@ def post_history_card(post: Dict) -> rx.Component:
                 align="center"
             ),
             rx.text(
-                content_preview,
+                post["content_preview"],
                 color="gray.600",
                 size="2",
                 font_weight="500"
             ),
+            rx.cond(
+                post["snippet"] != "",
+                rx.text(
+                    post["snippet"],
+                    size="1",
+                    color="gray.500",
+                    dir="auto"
+                )
+            ),
             rx.divider(),
             rx.box(
                 rx.text(
-                    post_preview,
+                    post["post_preview"],
                     size="2",
                     color="gray.700",
                     white_space="pre-wrap",
@@ -475,7 +797,7 @@ def post_history_card(post: Dict) -> rx.Component:
             rx.hstack(
                 rx.button(
                     "📋 העתק",
-                    on_click=lambda: State.copy_post(post.get("generated_post", "")),
+                    on_click=lambda: State.copy_history_post(post["id"]),
                     size="2",
                     variant="soft",
                     color_scheme="blue"
@@ -502,12 +824,81 @@ def history_section(state: State) -> rx.Component:
         rx.heading("📚 היסטוריית פוסטים", size="5", margin_bottom="1rem"),
         rx.cond(
             state.total_posts > 0,
-            rx.grid(
-                rx.foreach(
-                    state.post_history,
-                    post_history_card
+            rx.vstack(
+                rx.hstack(
+                    rx.input(
+                        placeholder="חיפוש בפוסטים (עברית / English)...",
+                        value=state.search_query,
+                        on_change=State.set_search_query,
+                        dir="auto",
+                        width="100%"
+                    ),
+                    rx.button(
+                        "🔍 חפש",
+                        on_click=State.search_history,
+                        size="2"
+                    ),
+                    rx.cond(
+                        state.active_search != "",
+                        rx.button(
+                            "✖",
+                            on_click=State.clear_search,
+                            size="2",
+                            variant="outline",
+                            color_scheme="gray"
+                        )
+                    ),
+                    spacing="2",
+                    width="100%"
+                ),
+                rx.cond(
+                    state.active_search != "",
+                    rx.text(
+                        rx.cond(
+                            state.search_total > RANK_LIMIT,
+                            f"יותר מ-{RANK_LIMIT} תוצאות עבור \"{state.active_search}\" (מהחדש לישן)",
+                            f"{state.search_total} תוצאות עבור \"{state.active_search}\""
+                        ),
+                        size="2",
+                        color="gray.600"
+                    )
+                ),
+                rx.grid(
+                    rx.foreach(
+                        state.post_history,
+                        post_history_card
+                    ),
+                    columns="3",
+                    spacing="4",
+                    width="100%"
+                ),
+                rx.hstack(
+                    rx.button(
+                        "→ חדשים יותר",
+                        on_click=State.prev_history_page,
+                        disabled=rx.cond(
+                            state.active_search != "",
+                            state.search_page == 0,
+                            state.history_prev_cursors.length() == 0
+                        ),
+                        size="2",
+                        variant="outline"
+                    ),
+                    rx.button(
+                        "ישנים יותר ←",
+                        on_click=State.next_history_page,
+                        disabled=rx.cond(
+                            state.active_search != "",
+                            (state.search_page + 1) * HISTORY_PAGE_SIZE >= state.search_total,
+                            state.history_next_cursor == ""
+                        ),
+                        size="2",
+                        variant="outline"
+                    ),
+                    spacing="3",
+                    justify="center",
+                    width="100%"
                 ),
-                columns="3",
                 spacing="4",
                 width="100%"
             ),
@@ -545,7 +936,9 @@ def index() -> rx.Component:
             width="100%"
         ),
         max_width="1400px",
-        padding_x="1rem"
+        padding_x="1rem",
+        # Leaving the page stops an in-flight generation instead of finishing it for nobody
+        on_unmount=State.cancel_generation
     )
 
 
@@ -4,25 +4,161 @@ LinkedIn Auto-Poster
 """
 
 import os
+import time
+import random
+import hashlib
+import threading
 import requests
-from typing import Optional, Dict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from typing import Optional, Dict, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Throttled or transient server errors worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_POOL_SIZE = int(os.getenv("LINKEDIN_POOL_SIZE", 10))
+DEFAULT_MAX_RETRIES = int(os.getenv("LINKEDIN_MAX_RETRIES", 3))
+DEFAULT_BACKOFF = float(os.getenv("LINKEDIN_BACKOFF", 1.0))
+# Never sleep longer than this, whatever Retry-After says
+MAX_RETRY_WAIT = 60.0
+# Connect and read timeout (each) of a post or token refresh request
+POST_TIMEOUT = 30
+DEFAULT_API_BASE = "https://api.linkedin.com/v2"
+TOKEN_URL = "https://www.linkedin.com/oauth/v2/accessToken"
+
+# Profile lookups are cached per token, never past the token's expiry
+PROFILE_CACHE_TTL = float(os.getenv("LINKEDIN_PROFILE_CACHE_TTL", 3600))
+# A rejected token is remembered briefly so health checks don't hammer /me
+INVALID_TOKEN_TTL = 60.0
+# Refresh (or warn) this long before the access token expires
+TOKEN_REFRESH_MARGIN = float(os.getenv("LINKEDIN_TOKEN_REFRESH_MARGIN", 7 * 24 * 3600))
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _not_sent(error: requests.exceptions.RequestException) -> bool:
+    """True if ``error`` happened while connecting, before any of the request was sent"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    # requests wraps urllib3's MaxRetryError, whose reason is the underlying failure
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+def parse_expiry(value: Optional[str]) -> Optional[float]:
+    """Token expiry as a unix timestamp, from epoch seconds or an ISO date"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    when = datetime.fromisoformat(value)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp()
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class _ProfileCache:
+    """Process-wide ``/me`` results keyed by token hash; ``None`` marks a rejected token"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Optional[Dict], float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Tuple[bool, Optional[Dict]]:
+        with self._lock:
+            entry = self._entries.get(_token_key(token))
+            if entry is None or entry[1] <= time.time():
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, token: str, profile: Optional[Dict], ttl: float):
+        with self._lock:
+            self._entries[_token_key(token)] = (profile, time.time() + ttl)
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._entries.pop(_token_key(token), None)
+
+
+_profiles = _ProfileCache()
+# Tokens refreshed by any poster in this process: original token hash -> state
+_tokens: Dict[str, Dict] = {}
+_tokens_lock = threading.Lock()
+
 
 class LinkedInPoster:
-    """Class to handle LinkedIn post publishing"""
+    """Class to handle LinkedIn post publishing
+
+    All requests go through one pooled, keep-alive connection pool. Each
+    thread gets its own ``requests.Session`` mounted on the shared adapter,
+    so a single poster can be used from many threads at once.
+
+    Profile lookups are cached process-wide. When ``LINKEDIN_TOKEN_EXPIRES_AT``
+    is set, the token is refreshed ``TOKEN_REFRESH_MARGIN`` before it expires
+    (given ``LINKEDIN_REFRESH_TOKEN`` and client credentials) or a warning is
+    printed.
+    """
     
-    def __init__(self):
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        api_base: Optional[str] = None,
+    ):
         self.access_token = os.getenv("LINKEDIN_ACCESS_TOKEN")
         self.user_id = os.getenv("LINKEDIN_USER_ID")
-        self.api_base = "https://api.linkedin.com/v2"
+        # LINKEDIN_API_BASE can point at a local stub (see benchmarks/ugc_stub.py)
+        self.api_base = (api_base or os.getenv("LINKEDIN_API_BASE", DEFAULT_API_BASE)).rstrip("/")
         
         if not self.access_token:
             raise ValueError("❌ LINKEDIN_ACCESS_TOKEN לא נמצא ב-.env")
         if not self.user_id:
             raise ValueError("❌ LINKEDIN_USER_ID לא נמצא ב-.env")
+
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.token_expires_at = parse_expiry(os.getenv("LINKEDIN_TOKEN_EXPIRES_AT"))
+        self.refresh_token = os.getenv("LINKEDIN_REFRESH_TOKEN")
+        self._token_id = _token_key(self.access_token)
+        self._expiry_warned = False
+        self._next_refresh_attempt = 0.0
+        self._headers = self._get_headers()
+        # Retries are handled in _request so Retry-After and POST safety stay under our control.
+        # One pool per host: the API and the OAuth token endpoint
+        self._adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+        self._local = threading.local()
     
     def _get_headers(self) -> Dict[str, str]:
         """Get API request headers"""
@@ -31,6 +167,130 @@ class LinkedInPoster:
             "Content-Type": "application/json",
             "X-Restli-Protocol-Version": "2.0.0"
         }
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            session.headers.update({k: v for k, v in self._headers.items() if k != "Authorization"})
+            self._local.session = session
+        return session
+
+    # ---- token lifetime ----
+
+    def token_expires_in(self) -> Optional[float]:
+        """Seconds until the access token expires (None if unknown)"""
+        self._adopt_shared_token()
+        return self.token_expires_at - time.time() if self.token_expires_at else None
+
+    def _adopt_shared_token(self):
+        state = _tokens.get(self._token_id)
+        if state and state["access_token"] != self.access_token:
+            self.access_token = state["access_token"]
+            self.token_expires_at = state["expires_at"]
+            self.refresh_token = state["refresh_token"]
+
+    def _can_refresh(self) -> bool:
+        return bool(self.refresh_token and os.getenv("LINKEDIN_CLIENT_ID") and os.getenv("LINKEDIN_CLIENT_SECRET"))
+
+    def _ensure_fresh_token(self):
+        remaining = self.token_expires_in()
+        if remaining is None or remaining > TOKEN_REFRESH_MARGIN:
+            return
+        if self._can_refresh() and time.time() >= self._next_refresh_attempt:
+            with _tokens_lock:
+                # Another poster may have refreshed while we waited for the lock
+                self._adopt_shared_token()
+                # The adopted token may have no expiry (None): like above, that means it doesn't expire
+                remaining = self.token_expires_in()
+                if remaining is not None and remaining <= TOKEN_REFRESH_MARGIN and not self.refresh_access_token():
+                    # Keep using the current token; try again in a few minutes
+                    self._next_refresh_attempt = time.time() + 300
+        elif not self._expiry_warned:
+            self._expiry_warned = True
+            print(f"⚠️  ה-Access Token של LinkedIn יפוג בעוד {max(remaining, 0) / 86400:.1f} ימים - חדש אותו")
+
+    def refresh_access_token(self) -> bool:
+        """Exchange the refresh token for a new access token (shared with other posters)"""
+        try:
+            response = self._session().post(
+                TOKEN_URL,
+                data={
+                    "grant_type": "refresh_token",
+                    "refresh_token": self.refresh_token,
+                    "client_id": os.getenv("LINKEDIN_CLIENT_ID"),
+                    "client_secret": os.getenv("LINKEDIN_CLIENT_SECRET"),
+                },
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                timeout=POST_TIMEOUT,
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"Error refreshing token: {e}")
+            return False
+        if response.status_code != 200:
+            print(f"Error refreshing token: {response.status_code}")
+            return False
+        data = response.json()
+        old_token = self.access_token
+        self.access_token = data["access_token"]
+        self.token_expires_at = time.time() + float(data.get("expires_in", 0)) if data.get("expires_in") else None
+        self.refresh_token = data.get("refresh_token", self.refresh_token)
+        _tokens[self._token_id] = {
+            "access_token": self.access_token,
+            "expires_at": self.token_expires_at,
+            "refresh_token": self.refresh_token,
+        }
+        _profiles.invalidate(old_token)
+        print("🔑 ה-Access Token של LinkedIn חודש")
+        return True
+
+    def max_post_seconds(self) -> float:
+        """Longest ``post_to_linkedin`` can take: a token refresh, then every attempt
+        hitting its connect and read timeouts with the longest wait between attempts"""
+        return 2 * POST_TIMEOUT * (self.max_retries + 2) + MAX_RETRY_WAIT * self.max_retries
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter: backoff * 2^attempt, +/-25%"""
+        delay = self.backoff * (2 ** attempt)
+        return min(delay * random.uniform(0.75, 1.25), MAX_RETRY_WAIT)
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send a request, retrying 429/5xx, timeouts and connection failures.
+
+        A POST is only retried after failing to connect: once any of it was
+        sent, LinkedIn may already have created the post.
+        """
+        self._ensure_fresh_token()
+        url = f"{self.api_base}{path}"
+        kwargs.setdefault("headers", {})["Authorization"] = f"Bearer {self.access_token}"
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self._session().request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if last_attempt or (method != "GET" and not _not_sent(e)):
+                    raise
+                delay = self._backoff_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+                wait = retry_after_seconds(response)
+                delay = min(wait, MAX_RETRY_WAIT) if wait is not None else self._backoff_delay(attempt)
+                response.close()
+            time.sleep(delay)
+
+    def close(self):
+        """Close the pooled connections"""
+        self._adapter.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
     
     def post_to_linkedin(self, post_text: str, visibility: str = "PUBLIC") -> Dict:
         """
@@ -41,7 +301,9 @@ class LinkedInPoster:
             visibility: Post visibility (PUBLIC, CONNECTIONS)
             
         Returns:
-            Response dictionary with status and post URL
+            Response dictionary with status and post URL. Failures carry
+            ``retryable`` (safe to send again later) and ``may_have_posted``
+            (the connection failed or timed out after the request was sent).
         """
         
         # Prepare the post payload
@@ -63,12 +325,7 @@ class LinkedInPoster:
         
         try:
             # Make the API request
-            response = requests.post(
-                f"{self.api_base}/ugcPosts",
-                headers=self._get_headers(),
-                json=payload,
-                timeout=30
-            )
+            response = self._request("POST", "/ugcPosts", json=payload, timeout=POST_TIMEOUT)
             
             if response.status_code == 201:
                 post_id = response.headers.get("X-RestLi-Id")
@@ -79,40 +336,65 @@ class LinkedInPoster:
                     "post_url": f"https://www.linkedin.com/feed/update/{post_id}"
                 }
             else:
-                error_data = response.json() if response.text else {}
+                # Gateways answer 5xx with HTML; the status code decides retrying, not the body
+                try:
+                    error_data = response.json() if response.text else {}
+                except ValueError:
+                    error_data = {"body": response.text[:500]}
                 return {
                     "success": False,
                     "message": f"❌ שגיאה בפרסום: {response.status_code}",
-                    "error": error_data
+                    "error": error_data,
+                    "status_code": response.status_code,
+                    "retryable": response.status_code in RETRY_STATUSES,
+                    "may_have_posted": False
                 }
                 
-        except requests.exceptions.Timeout:
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            # Only a failure to connect proves LinkedIn never got the post
+            not_sent = _not_sent(e)
+            timed_out = isinstance(e, requests.exceptions.Timeout)
             return {
                 "success": False,
-                "message": "❌ הבקשה פגה (timeout)"
+                "message": "❌ הבקשה פגה (timeout)" if timed_out else f"❌ שגיאת רשת: {str(e)}",
+                "retryable": not_sent,
+                "may_have_posted": not not_sent
             }
         except requests.exceptions.RequestException as e:
             return {
                 "success": False,
-                "message": f"❌ שגיאת רשת: {str(e)}"
+                "message": f"❌ שגיאת רשת: {str(e)}",
+                "retryable": False,
+                "may_have_posted": False
             }
         except Exception as e:
             return {
                 "success": False,
-                "message": f"❌ שגיאה לא צפויה: {str(e)}"
+                "message": f"❌ שגיאה לא צפויה: {str(e)}",
+                "retryable": False,
+                "may_have_posted": False
             }
     
-    def get_user_profile(self) -> Optional[Dict]:
-        """Get LinkedIn user profile info"""
+    def _profile_ttl(self) -> float:
+        remaining = self.token_expires_in()
+        return PROFILE_CACHE_TTL if remaining is None else max(min(PROFILE_CACHE_TTL, remaining), 0.0)
+
+    def get_user_profile(self, force: bool = False) -> Optional[Dict]:
+        """Get LinkedIn user profile info (cached per token unless ``force``)"""
+        self._adopt_shared_token()
+        if not force:
+            hit, profile = _profiles.get(self.access_token)
+            if hit:
+                return profile
         try:
-            response = requests.get(
-                f"{self.api_base}/me",
-                headers=self._get_headers(),
-                timeout=10
-            )
+            response = self._request("GET", "/me", timeout=10)
             
             if response.status_code == 200:
-                return response.json()
+                profile = response.json()
+                _profiles.put(self.access_token, profile, self._profile_ttl())
+                return profile
+            if response.status_code == 401:
+                _profiles.put(self.access_token, None, INVALID_TOKEN_TTL)
             return None
             
         except Exception as e:
@@ -120,7 +402,7 @@ class LinkedInPoster:
             return None
     
     def test_connection(self) -> bool:
-        """Test if LinkedIn API connection works"""
+        """Test if LinkedIn API connection works (uses the cached profile)"""
         try:
             profile = self.get_user_profile()
             return profile is not None
@@ -159,6 +441,7 @@ def setup_linkedin_auth():
     print("\n8. הוסף ל-.env:")
     print("   LINKEDIN_ACCESS_TOKEN=your_access_token")
     print("   LINKEDIN_USER_ID=your_user_id")
+    print("   LINKEDIN_TOKEN_EXPIRES_AT=2025-03-01T00:00:00  (תאריך פקיעת הטוקן)")
     print("\n⚠️  שים לב: Access token תקף ל-60 יום. תצטרך לחדש אותו.")
     print("=" * 70)
 
@@ -169,12 +452,13 @@ if __name__ == "__main__":
         poster = LinkedInPoster()
         print("🔄 בודק חיבור ל-LinkedIn...")
         
-        if poster.test_connection():
+        profile = poster.get_user_profile()
+        if profile:
             print("✅ החיבור ל-LinkedIn תקין!")
-            
-            profile = poster.get_user_profile()
-            if profile:
-                print(f"\n👤 מחובר כ: {profile.get('localizedFirstName')} {profile.get('localizedLastName')}")
+            print(f"\n👤 מחובר כ: {profile.get('localizedFirstName')} {profile.get('localizedLastName')}")
+            expires_in = poster.token_expires_in()
+            if expires_in is not None:
+                print(f"🔑 ה-Access Token תקף לעוד {expires_in / 86400:.1f} ימים")
         else:
             print("❌ החיבור נכשל. בדוק את ה-Access Token")
             print("\n")
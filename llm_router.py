@@ -0,0 +1,316 @@
+"""
+LLM Router
+ניתוב קריאות LLM בין כל הספקים המוגדרים: סטטיסטיקות latency/שגיאות, failover ו-hedging
+
+Providers and their per-tier models live in config/providers.yaml; each agent
+picks a tier in config/agents.yaml. A provider is used only when its API key
+is set.
+"""
+
+import os
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from typing import Callable, Dict, List, Optional
+
+import crew_events
+from rate_limit import TokenBucket
+
+try:
+    from crewai import BaseLLM
+except ImportError:
+    from crewai.llms.base_llm import BaseLLM
+
+DEFAULT_TIER = "fast"
+# Rolling window of calls per provider model
+STATS_WINDOW = 50
+# p95 needs this many successful calls before it is trusted as a hedge deadline
+MIN_HEDGE_SAMPLES = 20
+# A provider erroring more often than this (over at least MIN_ERROR_SAMPLES recent calls)
+# is tried after the healthy ones; only the last ERROR_WINDOW seconds count, so it recovers
+MAX_ERROR_RATE = 0.5
+MIN_ERROR_SAMPLES = 5
+ERROR_WINDOW = 300.0
+# After a failure a provider is skipped for COOLDOWN * 2^(failures-1) seconds (capped)
+COOLDOWN = 5.0
+MAX_COOLDOWN = 300.0
+# Racing a second provider after the first one's p95 costs extra tokens, so it is opt-in
+HEDGE = os.getenv("LLM_HEDGE", "off").lower() in ("on", "1", "true", "yes")
+
+
+class ProviderStats:
+    """Rolling latency/error window and failure cooldown for one provider model"""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.samples = deque(maxlen=window)  # (monotonic time, latency seconds, ok)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self.samples.append((time.monotonic(), latency, ok))
+            if ok:
+                self.consecutive_failures = 0
+                self.cooldown_until = 0.0
+            else:
+                self.consecutive_failures += 1
+                backoff = min(COOLDOWN * 2 ** (self.consecutive_failures - 1), MAX_COOLDOWN)
+                self.cooldown_until = time.monotonic() + backoff
+
+    def error_rate(self) -> float:
+        """Share of failed calls within the last ERROR_WINDOW seconds"""
+        since = time.monotonic() - ERROR_WINDOW
+        with self._lock:
+            recent = [ok for at, _, ok in self.samples if at >= since]
+        return recent.count(False) / len(recent) if recent else 0.0
+
+    def unhealthy(self) -> bool:
+        since = time.monotonic() - ERROR_WINDOW
+        with self._lock:
+            recent = sum(1 for at, _, _ in self.samples if at >= since)
+        return recent >= MIN_ERROR_SAMPLES and self.error_rate() > MAX_ERROR_RATE
+
+    def latency_percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        """Latency percentile of successful calls (None with fewer than ``min_samples``)"""
+        with self._lock:
+            latencies = sorted(latency for _, latency, ok in self.samples if ok)
+        if len(latencies) < max(min_samples, 1):
+            return None
+        return latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+
+    def cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def to_dict(self) -> Dict:
+        p50, p95 = self.latency_percentile(0.5), self.latency_percentile(0.95)
+        return {
+            "calls": len(self.samples),
+            "error_rate": self.error_rate(),
+            "p50_s": p50,
+            "p95_s": p95,
+            "cooldown_s": max(self.cooldown_until - time.monotonic(), 0.0),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+class Provider:
+    """One provider model: name ("openai"), tier, the crewai LLM, its stats and rate limiter"""
+
+    def __init__(self, name: str, tier: str, llm, stats: ProviderStats):
+        self.name, self.tier, self.llm, self.stats = name, tier, llm, stats
+        self.limiter: Optional[TokenBucket] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}/{self.llm.model}"
+
+
+class LLMRouter:
+    """All configured providers, by tier, in order of preference.
+
+    ``candidates(tier)`` orders them for one request: providers in a failure
+    cooldown or with a high rolling error rate go last, otherwise the
+    configured preference holds.
+    """
+
+    def __init__(self, tiers: Dict[str, List[Provider]], hedge: bool = HEDGE):
+        if not any(tiers.values()):
+            raise ValueError("LLMRouter needs at least one provider")
+        self.tiers = tiers
+        self.hedge = hedge
+
+    @classmethod
+    def from_config(cls, config: Dict, llm_factory: Optional[Callable[..., object]] = None, hedge: bool = HEDGE):
+        """Build from the providers.yaml mapping; providers without an API key are skipped.
+
+        If no key is set at all the last provider is kept anyway (the old
+        Gemini default), so errors surface on the first call, not at startup.
+        """
+        if llm_factory is None:
+            from crewai import LLM as llm_factory
+
+        names = [name for name, spec in config.items() if os.getenv(spec.get("api_key_env", ""))]
+        if not names:
+            names = list(config)[-1:]
+        stats: Dict[str, ProviderStats] = {}
+        tiers: Dict[str, List[Provider]] = {}
+        for name in names:
+            spec = config[name]
+            for tier, model in spec.get("tiers", {}).items():
+                model = os.getenv(f"LLM_MODEL_{name.upper()}_{tier.upper()}", model)
+                llm = llm_factory(model=model, api_key=os.getenv(spec.get("api_key_env", "")),
+                                  **spec.get("options", {}))
+                # Tiers sharing a model share its stats
+                tiers.setdefault(tier, []).append(Provider(name, tier, llm, stats.setdefault(model, ProviderStats())))
+        return cls(tiers, hedge=hedge)
+
+    @property
+    def primary(self) -> str:
+        """Preferred provider name (e.g. for picking rate limits)"""
+        return next(iter(self.tiers.values()))[0].name
+
+    def configured(self, tier: str) -> List[Provider]:
+        """Providers serving ``tier`` in providers.yaml order (falling back to the default tier)"""
+        return self.tiers.get(tier) or self.tiers.get(DEFAULT_TIER) or next(iter(self.tiers.values()))
+
+    def candidates(self, tier: str) -> List[Provider]:
+        """``configured(tier)``, healthy providers first"""
+        providers = self.configured(tier)
+        ranked = sorted(
+            enumerate(providers),
+            key=lambda ip: (ip[1].stats.cooling_down(), ip[1].stats.unhealthy(), ip[0]),
+        )
+        return [p for _, p in ranked]
+
+    def llm(self, tier: str = DEFAULT_TIER, hedge: Optional[bool] = None) -> "RouterLLM":
+        """LLM for agents of ``tier`` (``hedge`` overrides the router default)"""
+        return RouterLLM(self, tier, self.hedge if hedge is None else hedge)
+
+    def limit_rate(self, rpm: Optional[Callable[[str], float]], burst: float = 1.0):
+        """Throttle calls per provider to ``rpm(name)`` requests per minute (None removes the limits).
+
+        Every call takes a token from the bucket of the provider it is
+        actually sent to, so failover and hedged calls are limited too.
+        Tiers of one provider share its bucket.
+        """
+        buckets: Dict[str, TokenBucket] = {}
+        for providers in self.tiers.values():
+            for p in providers:
+                if rpm is None:
+                    p.limiter = None
+                elif p.name not in buckets:
+                    buckets[p.name] = TokenBucket(rpm(p.name), capacity=burst)
+                p.limiter = buckets.get(p.name)
+
+    def stats(self) -> Dict[str, Dict]:
+        seen = {}
+        for providers in self.tiers.values():
+            for p in providers:
+                seen.setdefault(p.label, p.stats.to_dict())
+        return seen
+
+
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_HEDGE_THREADS", 32)),
+                                             thread_name_prefix="llm-hedge")
+        return _hedge_pool
+
+
+class RouterLLM(BaseLLM):
+    """A crewai LLM that sends each call to the best provider of its tier.
+
+    A failing call moves on to the next candidate. With ``hedge``, a call
+    still running after the provider's p95 latency is raced against the
+    next provider and the first success wins. Hedging is best left off for
+    streamed tasks, whose tokens would come from both providers.
+    """
+
+    def __init__(self, router: LLMRouter, tier: str, hedge: bool = False):
+        # Configuration order, not health order: the model string is part of cache keys
+        providers = router.configured(tier)
+        chain = ">".join(p.label for p in providers)
+        super().__init__(model=f"router:{tier}[{chain}]", temperature=getattr(providers[0].llm, "temperature", None))
+        self.router = router
+        self.tier = tier
+        self.hedge = hedge
+
+    # ---- one provider ----
+
+    def _prepare(self, provider: Provider):
+        # The agent executor sets ReAct stop words on the LLM it was given
+        stop = getattr(self, "stop", None)
+        if stop:
+            provider.llm.stop = list(stop)
+
+    def _call_one(self, provider: Provider, messages, kwargs):
+        self._prepare(provider)
+        if provider.limiter is not None:
+            provider.limiter.acquire()
+        start = time.perf_counter()
+        try:
+            result = provider.llm.call(messages, **kwargs)
+        except Exception:
+            provider.stats.record(time.perf_counter() - start, False)
+            raise
+        provider.stats.record(time.perf_counter() - start, True)
+        return result
+
+    def _deadline(self, provider: Provider) -> Optional[float]:
+        return provider.stats.latency_percentile(0.95, MIN_HEDGE_SAMPLES) if self.hedge else None
+
+    # ---- routing ----
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        # The usage callback records each provider call's real token usage for the trace
+        callbacks = [*(callbacks or []), crew_events.usage_callback]
+        kwargs = dict(kwargs, tools=tools, callbacks=callbacks, available_functions=available_functions)
+        candidates = self.router.candidates(self.tier)
+        error = None
+        i = 0
+        while i < len(candidates):
+            # A cancelled generation makes no further provider calls
+            crew_events.raise_if_cancelled()
+            primary = candidates[i]
+            backup = candidates[i + 1] if i + 1 < len(candidates) else None
+            deadline = self._deadline(primary) if backup else None
+            try:
+                if deadline is None:
+                    return self._call_one(primary, messages, kwargs)
+                return self._hedged(primary, backup, deadline, messages, kwargs)
+            except _BothFailed as e:
+                error = e.error
+                i += 2
+            except Exception as e:
+                error = e
+                i += 1
+            print(f"⚠️  {primary.label} נכשל ({error}) - עובר לספק הבא")
+        raise error
+
+    def _hedged(self, primary: Provider, backup: Provider, deadline: float, messages, kwargs):
+        pool = _pool()
+        first = pool.submit(contextvars.copy_context().run, self._call_one, primary, messages, kwargs)
+        try:
+            return first.result(timeout=deadline)
+        except FuturesTimeout:
+            pass
+        print(f"⏱️  {primary.label} איטי מה-p95 ({deadline:.1f}s) - מריץ במקביל גם את {backup.label}")
+        primary.stats.hedges += 1
+        second = pool.submit(contextvars.copy_context().run, self._call_one, backup, messages, kwargs)
+        for future in as_completed([first, second]):
+            if future.exception() is None:
+                if future is second:
+                    primary.stats.hedge_wins += 1
+                return future.result()
+        raise _BothFailed(first.exception())
+
+    # ---- capabilities of the preferred provider ----
+
+    def supports_function_calling(self) -> bool:
+        return all(p.llm.supports_function_calling() for p in self.router.candidates(self.tier))
+
+    def supports_stop_words(self) -> bool:
+        return self.router.candidates(self.tier)[0].llm.supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return min(p.llm.get_context_window_size() for p in self.router.candidates(self.tier))
+
+
+class _BothFailed(Exception):
+    """The hedged pair both failed; ``error`` is the primary's"""
+
+    def __init__(self, error: BaseException):
+        super().__init__(str(error))
+        self.error = error
@@ -0,0 +1,139 @@
+"""
+Post Checks
+בדיקת הצ'קליסט הויראלי באופן מקומי ודטרמיניסטי (אמוג'יז, hashtags, קישור, קוד, CTA)
+
+Usage:
+    python post_checks.py post.txt [--topic https://github.com/x/y] [--fix]
+"""
+
+import re
+import sys
+import argparse
+from typing import Dict, List, Tuple
+
+from research_cache import _is_url
+
+MIN_EMOJIS = 2
+MIN_HASHTAGS = 5
+CHECKS = ("emojis", "hashtags", "link", "code", "cta")
+# What the LLM is asked to add for a failed check it can't be fixed locally
+CHECK_INSTRUCTIONS = {
+    "emojis": f"לפחות {MIN_EMOJIS} אמוג'יז במקומות טבעיים",
+    "hashtags": f"{MIN_HASHTAGS}+ hashtags רלוונטיים בסוף הפוסט",
+    "link": "קישור רלוונטי (לכלי, לריפו או לדמו)",
+    "code": "דוגמת קוד קצרה או פקודת התקנה, מסומנת בבירור",
+    "cta": "CTA בסוף שמזמין מפתחים לשתף כלים, תהליכים או הערות",
+}
+DEFAULT_HASHTAGS = ["#AI", "#Python", "#Automation", "#DevTools", "#Tech"]
+
+_EMOJI = re.compile(
+    "[\U0001F300-\U0001FAFF\U00002600-\U000027BF\U0001F1E6-\U0001F1FF\U00002B00-\U00002BFF\U0000231A-\U000023FF]"
+)
+_HASHTAG = re.compile(r"(?<![\w&])#[\w֐-׿]+")
+_LINK = re.compile(r"https?://\S+|\bwww\.\S+|\b[\w-]+\.(?:com|io|dev|ai|org|net|co\.il)/\S*", re.IGNORECASE)
+_CODE = re.compile(
+    r"```|`[^`\n]+`|^\s*(?:\$ |>>> |pip3? install |npm (?:i|install) |uv (?:add|pip) |python3? -|docker run |git clone |"
+    r"import \w|from \w+ import )",
+    re.MULTILINE,
+)
+_CTA = re.compile(
+    r"שתפו|ספרו|כתבו|תגיבו|בתגובות|מה דעתכם|מה אתם|מי מכם|איך אתם|הייתם|נשמח לשמוע|"
+    r"\bcomment|\bshare\b|let me know|what do you|drop a",
+    re.IGNORECASE,
+)
+_TRAILER = re.compile(f"{_HASHTAG.pattern}|{_LINK.pattern}|{_EMOJI.pattern}", re.IGNORECASE)
+_TOPIC_WORD = re.compile(r"[A-Za-z][A-Za-z0-9]{2,}")
+
+
+def _body_lines(text: str) -> List[str]:
+    """Non-empty lines without the trailing block of hashtags, links and emojis"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    while lines and not _TRAILER.sub("", lines[-1]).strip():
+        lines.pop()
+    return lines
+
+
+def check_post(text: str) -> Dict[str, bool]:
+    """Which checklist items ``text`` satisfies"""
+    tail = "\n".join(_body_lines(text)[-3:])
+    return {
+        "emojis": len(_EMOJI.findall(text)) >= MIN_EMOJIS,
+        "hashtags": len(set(_HASHTAG.findall(text))) >= MIN_HASHTAGS,
+        "link": bool(_LINK.search(text)),
+        "code": bool(_CODE.search(text)),
+        # A question or an invitation near the end
+        "cta": "?" in tail or bool(_CTA.search(tail)),
+    }
+
+
+def topic_hashtags(content_input: str) -> List[str]:
+    """Hashtags from the topic's Latin words (e.g. the repo name of a GitHub URL), then defaults"""
+    source = content_input.rstrip("/").rsplit("/", 1)[-1] if _is_url(content_input) else content_input
+    tags = [f"#{w[0].upper()}{w[1:]}" for w in _TOPIC_WORD.findall(source.replace("-", " ").replace("_", " "))]
+    return list(dict.fromkeys(tags + DEFAULT_HASHTAGS))
+
+
+def fix_locally(text: str, content_input: str = "") -> Tuple[str, List[str]]:
+    """Fix the items that don't need writing: hashtags, emojis and (for URL inputs) the link.
+
+    Returns the new text and the names of the checks it fixed.
+    """
+    results = check_post(text)
+    fixed = []
+    text = text.rstrip()
+    if not results["link"] and _is_url(content_input):
+        text = f"{text}\n\n🔗 {content_input.strip()}"
+        fixed.append("link")
+    if not check_post(text)["emojis"]:
+        lines = text.split("\n")
+        lines[0] = f"🚀 {lines[0]}"
+        text = "\n".join(lines)
+        if not check_post(text)["emojis"]:
+            text = f"{text}\n👇"
+        fixed.append("emojis")
+    if not results["hashtags"]:
+        present = {tag.lower() for tag in _HASHTAG.findall(text)}
+        missing = MIN_HASHTAGS - len(present)
+        extra = [tag for tag in topic_hashtags(content_input) if tag.lower() not in present][:missing]
+        if len(extra) == missing:
+            text = f"{text}\n\n{' '.join(extra)}"
+            fixed.append("hashtags")
+    return text, fixed
+
+
+def review(text: str, content_input: str = "") -> Dict:
+    """Check ``text``, fix what can be fixed locally, and list what still needs the LLM"""
+    before = check_post(text)
+    fixed_text, fixed = fix_locally(text, content_input)
+    after = check_post(fixed_text)
+    return {
+        "text": fixed_text,
+        "passed": [name for name in CHECKS if before[name]],
+        "fixed_locally": fixed,
+        "needs_llm": [name for name in CHECKS if not after[name]],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a post against the viral checklist")
+    parser.add_argument("file", help="post text file ('-' for stdin)")
+    parser.add_argument("--topic", default="", help="topic or URL the post was generated from")
+    parser.add_argument("--fix", action="store_true", help="print the post with local fixes applied")
+    args = parser.parse_args(argv)
+
+    if args.file == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.file, "r", encoding="utf-8") as f:
+            text = f.read()
+    report = review(text, args.topic)
+    for name in CHECKS:
+        status = "✅" if name in report["passed"] else "🔧" if name in report["fixed_locally"] else "❌"
+        print(f"{status} {name}")
+    if args.fix:
+        print("\n" + report["text"])
+    return 0 if not report["needs_llm"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
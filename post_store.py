@@ -0,0 +1,598 @@
+"""
+Post Store
+אחסון היסטוריית הפוסטים - JSON (legacy) או SQLite עם אינדקסים
+"""
+
+import os
+import json
+import math
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+from tracing import stage_summary
+
+DEFAULT_STORE_URL = "sqlite:///data/post_history.db"
+LEGACY_HISTORY_FILE = Path("data/post_history.json")
+
+
+def new_post_id() -> str:
+    """Unique, time-sortable post id (microsecond resolution)"""
+    return datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+
+
+def make_post_record(content_input: str, post_text: str, generation_time: float, trace: Optional[Dict] = None) -> Dict:
+    """New history record for a generated post (``trace`` is a ``tracing.Trace.to_dict()``)"""
+    record = {
+        "id": new_post_id(),
+        "content_input": content_input,
+        "generated_post": post_text,
+        "generation_time": generation_time,
+        "timestamp": datetime.now().isoformat(),
+        "posted_to_linkedin": False,
+        "engagement": {
+            "likes": 0,
+            "comments": 0,
+            "shares": 0
+        }
+    }
+    if trace:
+        record["trace"] = trace
+    return record
+
+
+def _sort_key(post: Dict) -> Tuple[str, str]:
+    return (post.get("timestamp", ""), post.get("id", ""))
+
+
+def encode_cursor(post: Dict) -> str:
+    """Opaque pagination cursor pointing just after ``post``"""
+    return "|".join(_sort_key(post))
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, str]]:
+    if not cursor:
+        return None
+    timestamp, _, post_id = cursor.rpartition("|")
+    return (timestamp, post_id)
+
+
+# ==== סטטיסטיקות מצטברות ====
+AGGREGATES_VERSION = "3"
+LATENCY_BUCKET_GROWTH = 1.1
+LATENCY_MAX_BUCKET = 120
+
+
+def latency_bucket(seconds: float) -> int:
+    """Log-scaled histogram bucket (~10% resolution) for a generation time"""
+    if seconds <= 1:
+        return 0
+    return min(int(math.log(seconds, LATENCY_BUCKET_GROWTH)) + 1, LATENCY_MAX_BUCKET)
+
+
+def latency_bucket_upper(bucket: int) -> float:
+    return LATENCY_BUCKET_GROWTH ** bucket
+
+
+def _post_day(post: Dict) -> str:
+    timestamp = post.get("timestamp", "")
+    return timestamp[:10] if isinstance(timestamp, str) else ""
+
+
+def _post_generation_time(post: Dict) -> float:
+    gen_time = post.get("generation_time", 0)
+    return float(gen_time) if isinstance(gen_time, (int, float)) else 0.0
+
+
+def aggregate_rows(post: Dict) -> List[Tuple[str, float]]:
+    """(key, value) aggregate rows one post contributes to, each counted once.
+
+    Keys are "all", the post's day ("YYYY-MM-DD"), and "stage:<name>",
+    "stage_tokens:<name>" and "stage_cached_tokens:<name>" for every stage
+    in the post's trace.
+    """
+    gen_time = _post_generation_time(post)
+    rows = [("all", gen_time), (_post_day(post), gen_time)]
+    for stage, summary in stage_summary(post.get("trace") or {}).items():
+        rows.append((f"stage:{stage}", summary["wall_time"]))
+        rows.append((f"stage_tokens:{stage}", summary["tokens"]))
+        rows.append((f"stage_cached_tokens:{stage}", summary["cached_tokens"]))
+    return rows
+
+
+class Aggregates:
+    """Running totals, per-day and per-stage buckets and a latency histogram.
+
+    ``apply`` is O(1), so the record can be kept up to date on every insert
+    and delete instead of being recomputed from the full history.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, List[float]] = {}  # key -> [posts, total]
+        self.histogram: Dict[int, int] = {}
+
+    def apply(self, post: Dict, sign: int = 1):
+        for key, value in aggregate_rows(post):
+            row = self.rows.setdefault(key, [0, 0.0])
+            row[0] += sign
+            row[1] += sign * value
+        bucket = latency_bucket(_post_generation_time(post))
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + sign
+
+    def snapshot(self, today: Optional[str] = None) -> Dict:
+        return stats_snapshot(self.rows, today or _today(), self.histogram)
+
+
+def _today() -> str:
+    return datetime.now().date().isoformat()
+
+
+def percentile_from_histogram(histogram: Dict[int, int], q: float) -> float:
+    """Approximate percentile (bucket upper bound) from a latency histogram"""
+    total = sum(c for c in histogram.values() if c > 0)
+    if total == 0:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += max(histogram[bucket], 0)
+        if seen >= rank:
+            return latency_bucket_upper(bucket)
+    return latency_bucket_upper(max(histogram))
+
+
+def stats_snapshot(rows: Dict[str, List[float]], today: str, histogram: Dict[int, int]) -> Dict:
+    """Stats dict from aggregate rows (key -> (posts, total)) and the latency histogram"""
+    posts, total = rows.get("all", (0, 0.0))
+    stages = {}
+    for key, (count, stage_total) in rows.items():
+        if key.startswith("stage:") and count > 0:
+            name = key[len("stage:"):]
+            tokens = rows.get(f"stage_tokens:{name}", (0, 0.0))[1]
+            cached = rows.get(f"stage_cached_tokens:{name}", (0, 0.0))[1]
+            stages[name] = {"avg_wall_time": stage_total / count, "avg_tokens": tokens / count,
+                            "avg_cached_tokens": cached / count, "count": int(count)}
+    return {
+        "total_posts": int(posts),
+        "total_generation_time": total,
+        "avg_generation_time": total / posts if posts > 0 else 0.0,
+        "posts_today": int(rows.get(today, (0, 0.0))[0]),
+        "p50_generation_time": percentile_from_histogram(histogram, 0.50),
+        "p95_generation_time": percentile_from_histogram(histogram, 0.95),
+        "stages": stages,
+    }
+
+
+class JsonBackend:
+    """Legacy backend - the whole history lives in one JSON file.
+
+    Every write rewrites the file, so this is only meant for small
+    histories and for reading data written by older versions.
+    """
+
+    def __init__(self, path: Path = LEGACY_HISTORY_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _read(self) -> List[Dict]:
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return []
+
+    def _write(self, posts: List[Dict]):
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(posts, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def add_post(self, post_data: Dict):
+        with self._lock:
+            posts = self._read()
+            posts.insert(0, post_data)
+            self._write(posts)
+
+    def update_post(self, post_id: str, changes: Dict) -> Optional[Dict]:
+        with self._lock:
+            posts = self._read()
+            for post in posts:
+                if post.get("id") == post_id:
+                    post.update(changes)
+                    self._write(posts)
+                    return post
+        return None
+
+    def delete_post(self, post_id: str) -> Optional[Dict]:
+        with self._lock:
+            posts = self._read()
+            removed = next((p for p in posts if p.get("id") == post_id), None)
+            if removed is not None:
+                self._write([p for p in posts if p.get("id") != post_id])
+            return removed
+
+    def get_post(self, post_id: str) -> Optional[Dict]:
+        return next((p for p in self._read() if p.get("id") == post_id), None)
+
+    def list_posts(self, limit: Optional[int] = None, before: Optional[Tuple[str, str]] = None) -> List[Dict]:
+        posts = sorted(self._read(), key=_sort_key, reverse=True)
+        if before:
+            posts = [p for p in posts if _sort_key(p) < tuple(before)]
+        return posts if limit is None else posts[:limit]
+
+    def posts_between(self, start: str, end: str) -> List[Dict]:
+        return [p for p in self.list_posts() if start <= p.get("timestamp", "") < end]
+
+    def count(self) -> int:
+        return len(self._read())
+
+    def stats(self, today: Optional[str] = None) -> Dict:
+        aggregates = Aggregates()
+        for post in self._read():
+            aggregates.apply(post)
+        return aggregates.snapshot(today)
+
+    def daily_stats(self, start_day: str, end_day: str) -> Dict[str, Dict]:
+        aggregates = Aggregates()
+        for post in self._read():
+            aggregates.apply(post)
+        return {
+            day: {"posts": int(v[0]), "total_generation_time": v[1]}
+            for day, v in sorted(aggregates.rows.items())
+            if day != "all" and start_day <= day <= end_day and v[0] > 0
+        }
+
+
+class SQLiteBackend:
+    """Indexed SQLite backend.
+
+    Posts are keyed by ``id`` (O(1) insert/delete) with a secondary index on
+    ``timestamp``. WAL mode plus ``BEGIN IMMEDIATE`` lets several Reflex
+    workers write to the same file without losing each other's posts.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS posts ("
+                " id TEXT PRIMARY KEY,"
+                " timestamp TEXT NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_timestamp ON posts (timestamp, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            # Running aggregates: 'all', the day ('YYYY-MM-DD') or 'stage:'/'stage_tokens:' + stage name
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS aggregates ("
+                " key TEXT PRIMARY KEY,"
+                " posts INTEGER NOT NULL DEFAULT 0,"
+                " total_generation_time REAL NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS latency_histogram ("
+                " bucket INTEGER PRIMARY KEY,"
+                " count INTEGER NOT NULL DEFAULT 0)"
+            )
+            version = conn.execute("SELECT value FROM meta WHERE key = 'aggregates_version'").fetchone()
+            if not version or version[0] != AGGREGATES_VERSION:
+                self._rebuild_aggregates(conn)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return ImmediateTransaction(self._conn())
+
+    @staticmethod
+    def _row_to_post(row) -> Dict:
+        return json.loads(row[0])
+
+    @staticmethod
+    def _apply_aggregates(conn: sqlite3.Connection, post: Dict, sign: int):
+        """O(1) update of the running aggregates for one inserted/deleted post"""
+        for key, value in aggregate_rows(post):
+            conn.execute(
+                "INSERT INTO aggregates (key, posts, total_generation_time) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET posts = posts + excluded.posts,"
+                " total_generation_time = total_generation_time + excluded.total_generation_time",
+                (key, sign, sign * value),
+            )
+        conn.execute(
+            "INSERT INTO latency_histogram (bucket, count) VALUES (?, ?)"
+            " ON CONFLICT(bucket) DO UPDATE SET count = count + excluded.count",
+            (latency_bucket(_post_generation_time(post)), sign),
+        )
+
+    def _rebuild_aggregates(self, conn: sqlite3.Connection):
+        """Recompute aggregates from scratch (databases created before they existed)"""
+        conn.execute("DELETE FROM aggregates")
+        conn.execute("DELETE FROM latency_histogram")
+        for row in conn.execute("SELECT data FROM posts").fetchall():
+            self._apply_aggregates(conn, self._row_to_post(row), 1)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('aggregates_version', ?)", (AGGREGATES_VERSION,)
+        )
+
+    def add_post(self, post_data: Dict):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM posts WHERE id = ?", (post_data["id"],)).fetchone()
+            if row is not None:
+                self._apply_aggregates(conn, self._row_to_post(row), -1)
+            conn.execute(
+                "INSERT OR REPLACE INTO posts (id, timestamp, data) VALUES (?, ?, ?)",
+                (post_data["id"], post_data.get("timestamp", ""), json.dumps(post_data, ensure_ascii=False)),
+            )
+            self._apply_aggregates(conn, post_data, 1)
+
+    def update_post(self, post_id: str, changes: Dict) -> Optional[Dict]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM posts WHERE id = ?", (post_id,)).fetchone()
+            if row is None:
+                return None
+            post = self._row_to_post(row)
+            self._apply_aggregates(conn, post, -1)
+            post.update(changes)
+            self._apply_aggregates(conn, post, 1)
+            conn.execute(
+                "UPDATE posts SET timestamp = ?, data = ? WHERE id = ?",
+                (post.get("timestamp", ""), json.dumps(post, ensure_ascii=False), post_id),
+            )
+            return post
+
+    def delete_post(self, post_id: str) -> Optional[Dict]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM posts WHERE id = ?", (post_id,)).fetchone()
+            if row is None:
+                return None
+            post = self._row_to_post(row)
+            conn.execute("DELETE FROM posts WHERE id = ?", (post_id,))
+            self._apply_aggregates(conn, post, -1)
+            return post
+
+    def get_post(self, post_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT data FROM posts WHERE id = ?", (post_id,)).fetchone()
+        return self._row_to_post(row) if row else None
+
+    def list_posts(self, limit: Optional[int] = None, before: Optional[Tuple[str, str]] = None) -> List[Dict]:
+        query = "SELECT data FROM posts"
+        params: list = []
+        if before:
+            query += " WHERE (timestamp, id) < (?, ?)"
+            params.extend(before)
+        query += " ORDER BY timestamp DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [self._row_to_post(r) for r in self._conn().execute(query, params)]
+
+    def posts_between(self, start: str, end: str) -> List[Dict]:
+        rows = self._conn().execute(
+            "SELECT data FROM posts WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC, id DESC",
+            (start, end),
+        )
+        return [self._row_to_post(r) for r in rows]
+
+    def count(self) -> int:
+        row = self._conn().execute("SELECT posts FROM aggregates WHERE key = 'all'").fetchone()
+        return row[0] if row else 0
+
+    def stats(self, today: Optional[str] = None) -> Dict:
+        conn = self._conn()
+        today = today or _today()
+        rows = {
+            key: (posts, total)
+            for key, posts, total in conn.execute(
+                "SELECT key, posts, total_generation_time FROM aggregates"
+                " WHERE key IN ('all', ?) OR key LIKE 'stage:%' OR key LIKE 'stage_tokens:%'"
+                " OR key LIKE 'stage_cached_tokens:%'",
+                (today,),
+            )
+        }
+        histogram = dict(conn.execute("SELECT bucket, count FROM latency_histogram WHERE count > 0"))
+        return stats_snapshot(rows, today, histogram)
+
+    def daily_stats(self, start_day: str, end_day: str) -> Dict[str, Dict]:
+        rows = self._conn().execute(
+            "SELECT key, posts, total_generation_time FROM aggregates"
+            " WHERE key >= ? AND key <= ? AND key NOT LIKE '%:%' AND key != 'all' AND posts > 0 ORDER BY key",
+            (start_day, end_day),
+        )
+        return {day: {"posts": posts, "total_generation_time": total} for day, posts, total in rows}
+
+    def migrate_from_json(self, json_file: Path = LEGACY_HISTORY_FILE) -> int:
+        """One-shot import of the legacy JSON history.
+
+        Runs once per database (tracked in ``meta``); the JSON file is renamed
+        to ``*.migrated`` afterwards so it is never read again. Legacy ids only
+        have second resolution, so a post whose id is already taken by a
+        different post gets the id with a ``_<n>`` suffix; exact repeats are
+        skipped.
+        """
+        json_file = Path(json_file)
+        if not json_file.exists():
+            return 0
+        with self._transaction() as conn:
+            done = conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+            if done:
+                return 0
+            with open(json_file, "r", encoding="utf-8") as f:
+                posts = json.load(f)
+            imported = renamed = 0
+            for p in posts:
+                base = post_id = p.get("id") or new_post_id()
+                data = json.dumps(p, ensure_ascii=False)
+                n = 0
+                while True:
+                    if conn.execute(
+                        "INSERT OR IGNORE INTO posts (id, timestamp, data) VALUES (?, ?, ?)",
+                        (post_id, p.get("timestamp", ""), data),
+                    ).rowcount:
+                        break
+                    existing = conn.execute("SELECT data FROM posts WHERE id = ?", (post_id,)).fetchone()
+                    if existing and json.loads(existing[0]) == dict(p, id=post_id):
+                        post_id = None
+                        break
+                    n += 1
+                    post_id = f"{base}_{n}"
+                    p = dict(p, id=post_id)
+                    data = json.dumps(p, ensure_ascii=False)
+                if post_id is not None:
+                    imported += 1
+                    renamed += n > 0
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)",
+                (datetime.now().isoformat(),),
+            )
+            self._rebuild_aggregates(conn)
+        json_file.rename(json_file.with_suffix(json_file.suffix + ".migrated"))
+        print(f"✅ הועברו {imported} פוסטים מ-{json_file} ל-SQLite"
+              + (f" ({renamed} קיבלו מזהה חדש בגלל התנגשות)" if renamed else "")
+              + (f", {len(posts) - imported} כפולים דולגו" if imported < len(posts) else ""))
+        return imported
+
+
+class ImmediateTransaction:
+    """``BEGIN IMMEDIATE`` ... ``COMMIT`` / ``ROLLBACK`` context manager"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def create_backend(url: Optional[str] = None):
+    """Build a backend from a store URL (``sqlite:///path`` or ``json:///path``)"""
+    url = url or os.getenv("POST_STORE_URL", DEFAULT_STORE_URL)
+    scheme, _, path = url.partition(":///")
+    if scheme == "sqlite":
+        backend = SQLiteBackend(Path(path))
+        backend.migrate_from_json()
+        return backend
+    if scheme == "json":
+        return JsonBackend(Path(path))
+    raise ValueError(f"❌ POST_STORE_URL לא נתמך: {url}")
+
+
+def default_indexes() -> List:
+    """Derived indexes kept in step with the default store (SEARCH_INDEX/DEDUP_INDEX=off disable them)"""
+    indexes = []
+    if os.getenv("SEARCH_INDEX", "on") != "off":
+        from search_index import get_search_index
+        indexes.append(get_search_index())
+    if os.getenv("DEDUP_INDEX", "on") != "off":
+        try:
+            from dedup_index import get_dedup_index
+        except ImportError:
+            # numpy not installed - history works without near-duplicate detection
+            pass
+        else:
+            indexes.append(get_dedup_index())
+    return indexes
+
+
+class PostHistory:
+    """Post history facade used by the UI, batch runs and the publisher
+
+    ``indexes`` are notified of every insert/delete (``add(post)`` /
+    ``remove(post_id)``). They default to ``default_indexes()`` for the
+    default store and to none for an explicit backend.
+    """
+
+    def __init__(self, backend=None, indexes: Optional[List] = None):
+        if indexes is None:
+            indexes = default_indexes() if backend is None else []
+        self.backend = backend or create_backend()
+        self.indexes = indexes
+
+    def load(self) -> List[Dict]:
+        """All posts, newest first"""
+        return self.backend.list_posts()
+
+    def add_post(self, post_data: Dict):
+        post_data.setdefault("id", new_post_id())
+        post_data.setdefault("timestamp", datetime.now().isoformat())
+        self.backend.add_post(post_data)
+        for index in self.indexes:
+            index.add(post_data)
+
+    def update_post(self, post_id: str, changes: Dict) -> Optional[Dict]:
+        post = self.backend.update_post(post_id, changes)
+        if post is not None:
+            for index in self.indexes:
+                if set(changes) & set(index.fields):
+                    index.add(post)
+        return post
+
+    def delete_post(self, post_id: str) -> Optional[Dict]:
+        post = self.backend.delete_post(post_id)
+        if post is not None:
+            for index in self.indexes:
+                index.remove(post_id)
+        return post
+
+    def get_post(self, post_id: str) -> Optional[Dict]:
+        return self.backend.get_post(post_id)
+
+    def search(self, query: str, limit: int = 12, offset: int = 0) -> Tuple[List[Dict], int]:
+        """Ranked full-text matches (posts with a "snippet") and the total count"""
+        for index in self.indexes:
+            if hasattr(index, "find_posts"):
+                return index.find_posts(query, self, limit, offset)
+        return [], 0
+
+    def find_duplicate(self, text: str, field: str = "content_input") -> Optional[Dict]:
+        """Closest near-duplicate post as {"post", "score"} (None without a dedup index)"""
+        for index in self.indexes:
+            if hasattr(index, "find_duplicate"):
+                return index.find_duplicate(text, self, field)
+        return None
+
+    def list_posts(self, limit: Optional[int] = None, before: Optional[Tuple[str, str]] = None) -> List[Dict]:
+        """Newest-first posts, optionally only those older than ``before``"""
+        return self.backend.list_posts(limit=limit, before=before)
+
+    def page(self, limit: int, cursor: str = "") -> Tuple[List[Dict], str]:
+        """One page of posts plus the cursor of the next page ("" when done)"""
+        posts = self.backend.list_posts(limit=limit + 1, before=decode_cursor(cursor))
+        if len(posts) > limit:
+            posts = posts[:limit]
+            return posts, encode_cursor(posts[-1])
+        return posts, ""
+
+    def posts_between(self, start: str, end: str) -> List[Dict]:
+        """Posts whose ISO timestamp falls in ``[start, end)``"""
+        return self.backend.posts_between(start, end)
+
+    def count(self) -> int:
+        return self.backend.count()
+
+    def stats(self, today: Optional[str] = None) -> Dict:
+        """Totals, posts today and p50/p95 generation time from the running aggregates"""
+        return self.backend.stats(today)
+
+    def daily_stats(self, start_day: str, end_day: str) -> Dict[str, Dict]:
+        """Per-day post counts and generation time for days in ``[start_day, end_day]``"""
+        return self.backend.daily_stats(start_day, end_day)
+
+
+if __name__ == "__main__":
+    # מיגרציה חד-פעמית מ-data/post_history.json
+    history = PostHistory()
+    print(f"📚 {history.count()} פוסטים במאגר")
@@ -0,0 +1,262 @@
+"""
+Prompt Templates
+טעינה ואימות של agents.yaml ו-tasks.yaml פעם אחת, תבניות מקומפלות, וטעינה מחדש כשהקבצים משתנים
+
+Usage:
+    python prompt_templates.py check
+"""
+
+import os
+import sys
+import json
+import string
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+CONFIG_DIR = Path(__file__).resolve().parent / "config"
+AGENT_KEYS = ("role", "goal", "backstory")
+TASK_KEYS = ("description", "expected_output")
+# Tasks the pipeline builds -> placeholders the code fills in their "request" template
+REQUEST_FIELDS = {
+    "research_task": {"content_input"},
+    "style_task": {"style_examples", "style_guidelines"},
+    "writer_task": {"style_analysis"},
+    "viral_validator_task": set(),
+    "optimization_task": set(),
+    "fast_review_task": {"missing", "post"},
+}
+EMPTY_STYLE = {"examples": [], "style_guidelines": ""}
+
+
+class TemplateError(ValueError):
+    """agents.yaml / tasks.yaml failed validation"""
+
+
+class Template:
+    """A ``str.format`` template parsed once into literal chunks and field names"""
+
+    def __init__(self, source: str, where: str):
+        self.source = source
+        self.where = where
+        try:
+            parsed = list(string.Formatter().parse(source))
+        except ValueError as e:  # unbalanced braces
+            raise TemplateError(f"{where}: {e}") from None
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in parsed:
+            if field is not None and (not field.isidentifier() or spec or conversion):
+                raise TemplateError(f"{where}: only plain {{name}} placeholders are supported, got {{{field}}}")
+            self._parts.append((literal, field))
+        self.fields = {field for _, field in self._parts if field is not None}
+
+    def render(self, **values) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise TemplateError(f"{self.where}: no value for {', '.join(sorted(missing))}")
+        return "".join(literal + (str(values[field]) if field is not None else "") for literal, field in self._parts)
+
+
+def _digest(value) -> str:
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PromptConfig:
+    """Validated agents.yaml + tasks.yaml with each task's ``request`` template precompiled.
+
+    Descriptions and agent personas must be static (no placeholders), so
+    they stay a byte-identical prompt prefix; per-request values only go
+    through ``request`` templates, whose placeholders must be ones the
+    pipeline fills in (``REQUEST_FIELDS``).
+    """
+
+    def __init__(self, agents_config: Dict, tasks_config: Dict, agent_names=()):
+        errors = []
+        if not isinstance(agents_config, dict) or not isinstance(tasks_config, dict):
+            raise TemplateError("agents.yaml and tasks.yaml must be mappings")
+        for name in agent_names:
+            if name not in agents_config:
+                errors.append(f"agents.yaml: missing agent {name}")
+        for name, spec in agents_config.items():
+            for key in AGENT_KEYS:
+                errors += self._check_static(spec, key, f"agents.yaml:{name}.{key}")
+        self.requests: Dict[str, Template] = {}
+        for name, fields in REQUEST_FIELDS.items():
+            spec = tasks_config.get(name)
+            if spec is None:
+                errors.append(f"tasks.yaml: missing task {name}")
+                continue
+            for key in TASK_KEYS:
+                errors += self._check_static(spec, key, f"tasks.yaml:{name}.{key}")
+            if "request" in spec:
+                try:
+                    template = Template(str(spec["request"]), f"tasks.yaml:{name}.request")
+                except TemplateError as e:
+                    errors.append(str(e))
+                    continue
+                unknown = template.fields - fields
+                if unknown:
+                    errors.append(f"{template.where}: unknown placeholder(s) {', '.join(sorted(unknown))}"
+                                  f" (available: {', '.join(sorted(fields)) or 'none'})")
+                self.requests[name] = template
+            elif fields:
+                errors.append(f"tasks.yaml:{name}: missing request template (needs {', '.join(sorted(fields))})")
+        if errors:
+            raise TemplateError("\n".join(errors))
+        self.agents_config = agents_config
+        self.tasks_config = tasks_config
+        self.digest = _digest({"agents": agents_config, "tasks": tasks_config})
+
+    @staticmethod
+    def _check_static(spec, key: str, where: str) -> List[str]:
+        if not isinstance(spec, dict) or not isinstance(spec.get(key), str) or not spec[key].strip():
+            return [f"{where}: missing or empty"]
+        try:
+            fields = Template(spec[key], where).fields
+        except TemplateError as e:
+            return [str(e)]
+        if fields:
+            return [f"{where}: must be static, move {{{', '.join(sorted(fields))}}} to the task's request template"]
+        return []
+
+    def description(self, task_name: str, **request) -> str:
+        """Static description, then the task's ``request`` template filled with ``request``"""
+        description = self.tasks_config[task_name]["description"]
+        if not request:
+            return description
+        return description + "\n" + self.requests[task_name].render(**request)
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_yaml(path: Path) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+class PromptConfigLoader:
+    """The current PromptConfig, re-read when agents.yaml or tasks.yaml change on disk.
+
+    Checking costs two ``stat`` calls. A broken edit keeps the last good
+    config (the error is printed once per change); at startup it raises.
+    """
+
+    def __init__(self, config_dir: Path = CONFIG_DIR, agent_names=()):
+        self.paths = (Path(config_dir) / "agents.yaml", Path(config_dir) / "tasks.yaml")
+        self.agent_names = tuple(agent_names)
+        self._lock = threading.Lock()
+        self._stats = None
+        self._failed_stats = None
+        self.config = self._load(self._current_stats())
+
+    def _current_stats(self):
+        return tuple(_stat_key(p) for p in self.paths)
+
+    def _load(self, stats) -> PromptConfig:
+        config = PromptConfig(*(_read_yaml(p) for p in self.paths), agent_names=self.agent_names)
+        self._stats = stats
+        return config
+
+    def get(self) -> PromptConfig:
+        stats = self._current_stats()
+        if stats == self._stats or stats == self._failed_stats:
+            return self.config
+        with self._lock:
+            if stats != self._stats and stats != self._failed_stats:
+                try:
+                    config = self._load(stats)
+                except (TemplateError, yaml.YAMLError, OSError) as e:
+                    self._failed_stats = stats
+                    print(f"⚠️ שינוי בקבצי ה-YAML לא נטען, ממשיך עם ההגדרות הקודמות:\n{e}")
+                else:
+                    # A touch without a content change keeps the same object (nothing to rebuild)
+                    if config.digest != self.config.digest:
+                        print("🔄 agents.yaml / tasks.yaml נטענו מחדש")
+                        self.config = config
+        return self.config
+
+
+class StyleFile:
+    """writing_style.json, re-read when its mtime/size change.
+
+    The examples are serialized for the style prompt once per content hash,
+    so unchanged content keeps a byte-identical (prompt-cacheable) block.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stat = None
+        self.digest = None
+        self.data = EMPTY_STYLE
+        self.examples_json = "[]"
+
+    def get(self) -> Dict:
+        """Current style dict ({"examples", "style_guidelines"}); treat it as read-only"""
+        stat = _stat_key(self.path)
+        if stat != self._stat:
+            with self._lock:
+                if stat != self._stat:
+                    self._reload(stat)
+        return self.data
+
+    def _reload(self, stat):
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raw = b""
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest != self.digest:
+            try:
+                data = json.loads(raw) if raw else dict(EMPTY_STYLE)
+            except json.JSONDecodeError:
+                # Caught mid-write by a writer that doesn't replace the file atomically:
+                # keep the previous content and read again on next use
+                return
+            self.examples_json = json.dumps(data.get("examples", []), ensure_ascii=False)
+            self.data, self.digest = data, digest
+        self._stat = stat
+
+    def invalidate(self):
+        """Force a re-read on next use (the file was just rewritten)"""
+        with self._lock:
+            self._stat = None
+
+    def examples_block(self, writing_style: Dict) -> str:
+        """Serialized examples of ``writing_style`` - cached when it is this file's current content"""
+        if writing_style is self.data:
+            return self.examples_json
+        return json.dumps(writing_style.get("examples", []), ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate config/agents.yaml and config/tasks.yaml")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("check", help="parse and validate the prompt templates")
+    parser.parse_args(argv)
+
+    from agents import AGENT_NAMES
+
+    try:
+        config = PromptConfigLoader(agent_names=AGENT_NAMES).config
+    except (TemplateError, yaml.YAMLError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ {len(config.agents_config)} אייג'נטים, {len(config.tasks_config)} משימות תקינים")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
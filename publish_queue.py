@@ -0,0 +1,422 @@
+"""
+Publish Queue
+תור פרסום עמיד ללינקדין - תזמון, הגבלת קצב ומפתחות idempotency
+
+Usage:
+    python publish_queue.py enqueue <post_id> [--at 2025-01-01T09:00] [--visibility CONNECTIONS]
+    python publish_queue.py enqueue-all [--at 2025-01-01T09:00] [--spacing 3600]
+    python publish_queue.py run [--once] [--poll 30]
+    python publish_queue.py list [--status pending]
+    python publish_queue.py cancel <job_id>
+    python publish_queue.py requeue <job_id>
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from rate_limit import TokenBucket
+from post_store import PostHistory, ImmediateTransaction
+
+DEFAULT_QUEUE_PATH = Path(os.getenv("PUBLISH_QUEUE_PATH", "data/publish_queue.db"))
+# LinkedIn allows 150 member shares per day; spread them evenly
+DEFAULT_DAILY_QUOTA = float(os.getenv("LINKEDIN_DAILY_POST_QUOTA", 150))
+DEFAULT_BURST = float(os.getenv("LINKEDIN_POST_BURST", 1))
+MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", 5))
+# Seconds before a retryable failure is tried again, doubled per attempt
+RETRY_DELAY = 60.0
+# A job still "publishing" after this long belonged to a worker that died. The lease is
+# extended to LEASE_MARGIN past the poster's worst-case post (retries included) when longer
+LEASE_SECONDS = 300.0
+LEASE_MARGIN = 60.0
+# Row of the shared publish rate limiter in the limiter table
+LIMITER_NAME = "linkedin"
+
+# pending -> publishing -> published / failed, or back to pending on a retryable error.
+# "unknown" means the request may have reached LinkedIn; it is never retried automatically.
+STATUSES = ("pending", "publishing", "published", "failed", "cancelled", "unknown")
+REQUEUEABLE = ("failed", "cancelled", "unknown")
+
+JOB_COLUMNS = (
+    "id, idempotency_key, post_id, visibility, publish_at, status, attempts,"
+    " linkedin_post_id, post_url, error, created_at, updated_at"
+)
+
+
+def idempotency_key(post: Dict) -> str:
+    """Same post id and text -> same key, so re-enqueueing never duplicates a post"""
+    return hashlib.sha256(f"{post['id']}\n{post.get('generated_post', '')}".encode("utf-8")).hexdigest()
+
+
+def _iso(ts: Optional[float]) -> str:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else ""
+
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def _job(row) -> Dict:
+    names = [c.strip() for c in JOB_COLUMNS.split(",")]
+    return dict(zip(names, row))
+
+
+class PublishQueue:
+    """SQLite-backed queue of posts waiting to be published.
+
+    Several workers may share one queue file: jobs are claimed inside
+    ``BEGIN IMMEDIATE`` transactions, and publishing is throttled by a
+    token bucket sized for LinkedIn's daily share quota. ``limiter`` only
+    sets the bucket's rate and burst: its tokens are kept in the queue file
+    and taken in the same transaction that claims a job, so all workers
+    share one quota. Every state change is mirrored into the post's
+    history record (``publish_status``, ``linkedin_post_url`` ...).
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_QUEUE_PATH,
+        history: Optional[PostHistory] = None,
+        poster=None,
+        limiter: Optional[TokenBucket] = None,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.history = history if history is not None else PostHistory()
+        self.limiter = limiter or TokenBucket(DEFAULT_DAILY_QUOTA / (24 * 60), capacity=DEFAULT_BURST)
+        self._poster = poster
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " idempotency_key TEXT NOT NULL UNIQUE,"
+                " post_id TEXT NOT NULL,"
+                " visibility TEXT NOT NULL,"
+                " publish_at REAL NOT NULL,"
+                " status TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " lease_until REAL,"
+                " linkedin_post_id TEXT,"
+                " post_url TEXT,"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (status, publish_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS limiter (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return ImmediateTransaction(self._conn())
+
+    @property
+    def poster(self):
+        # Built on first publish, so enqueueing works without LinkedIn credentials
+        if self._poster is None:
+            from linkedin_poster import LinkedInPoster
+            self._poster = LinkedInPoster()
+        return self._poster
+
+    # ---- queue operations ----
+
+    def enqueue(self, post_id: str, publish_at: Optional[float] = None, visibility: str = "PUBLIC",
+                key: Optional[str] = None) -> Dict:
+        """Schedule a post (now by default); returns the job.
+
+        Enqueueing the same post twice returns the existing job. A failed,
+        cancelled or unknown job is rescheduled instead.
+        """
+        post = self.history.get_post(post_id)
+        if post is None:
+            raise ValueError(f"❌ פוסט {post_id} לא נמצא בהיסטוריה")
+        key = key or idempotency_key(post)
+        now = time.time()
+        publish_at = publish_at or now
+        with self._transaction() as conn:
+            row = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (idempotency_key, post_id, visibility, publish_at, status, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, 'pending', ?, ?)",
+                    (key, post_id, visibility, publish_at, now, now),
+                )
+            elif row[5] in REQUEUEABLE:
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', publish_at = ?, visibility = ?, error = NULL, updated_at = ?"
+                    " WHERE id = ?",
+                    (publish_at, visibility, now, row[0]),
+                )
+            else:
+                return _job(row)
+            job = _job(conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE idempotency_key = ?", (key,)).fetchone())
+        self.history.update_post(post_id, {
+            "publish_status": "scheduled",
+            "scheduled_for": _iso(publish_at),
+            "publish_key": key,
+        })
+        return job
+
+    def get_job(self, job_id: int) -> Optional[Dict]:
+        row = self._conn().execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def jobs(self, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Jobs by schedule time, optionally only those in ``status``"""
+        query = f"SELECT {JOB_COLUMNS} FROM jobs"
+        params: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY publish_at, id LIMIT ?"
+        return [_job(row) for row in self._conn().execute(query, params + (limit,))]
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that hasn't started publishing"""
+        return self._set_status(job_id, "cancelled", only_from=("pending",))
+
+    def requeue(self, job_id: int, publish_at: Optional[float] = None) -> bool:
+        """Put a failed, cancelled or unknown job back in the queue.
+
+        For an "unknown" job, check LinkedIn first - the post may exist.
+        """
+        return self._set_status(job_id, "pending", only_from=REQUEUEABLE, publish_at=publish_at or time.time())
+
+    def _set_status(self, job_id: int, status: str, only_from=(), publish_at: Optional[float] = None) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status, post_id FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or (only_from and row[0] not in only_from):
+                return False
+            conn.execute(
+                "UPDATE jobs SET status = ?, publish_at = COALESCE(?, publish_at), updated_at = ? WHERE id = ?",
+                (status, publish_at, time.time(), job_id),
+            )
+        self.history.update_post(row[1], {"publish_status": "scheduled" if status == "pending" else status})
+        return True
+
+    # ---- worker ----
+
+    def recover_stale(self, now: Optional[float] = None) -> int:
+        """Mark jobs whose worker died mid-publish as "unknown" (never republished blindly)"""
+        now = now or time.time()
+        with self._transaction() as conn:
+            stale = conn.execute(
+                "SELECT id, post_id FROM jobs WHERE status = 'publishing' AND lease_until < ?", (now,)
+            ).fetchall()
+            conn.execute(
+                "UPDATE jobs SET status = 'unknown', error = 'worker stopped while publishing', updated_at = ?"
+                " WHERE status = 'publishing' AND lease_until < ?",
+                (now, now),
+            )
+        for _, post_id in stale:
+            self.history.update_post(post_id, {"publish_status": "unknown"})
+        return len(stale)
+
+    def next_due(self) -> Optional[float]:
+        """Publish time of the earliest pending job (None if the queue is empty)"""
+        row = self._conn().execute("SELECT MIN(publish_at) FROM jobs WHERE status = 'pending'").fetchone()
+        return row[0] if row else None
+
+    def _tokens(self, conn: sqlite3.Connection, at: float) -> float:
+        """Tokens in the shared bucket at wall-clock time ``at``"""
+        row = conn.execute("SELECT tokens, updated FROM limiter WHERE name = ?", (LIMITER_NAME,)).fetchone()
+        if row is None:
+            return self.limiter.capacity
+        return min(self.limiter.capacity, row[0] + max(at - row[1], 0.0) * self.limiter.rate)
+
+    def limit_wait(self) -> float:
+        """Seconds until the shared rate limit allows the next publish"""
+        needed = min(1.0, self.limiter.capacity)
+        return max(needed - self._tokens(self._conn(), time.time()), 0.0) / self.limiter.rate
+
+    def _lease_seconds(self) -> float:
+        max_post = getattr(self.poster, "max_post_seconds", None)
+        return max(LEASE_SECONDS, max_post() + LEASE_MARGIN) if max_post else LEASE_SECONDS
+
+    def _claim(self, now: float) -> Optional[Dict]:
+        """Lease the next due job and take a rate-limit token for it, atomically.
+
+        Returns None when nothing is due or the shared bucket is empty.
+        """
+        lease = self._lease_seconds()
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE status = 'pending' AND publish_at <= ?"
+                " ORDER BY publish_at, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            at = time.time()
+            tokens = self._tokens(conn, at) - min(1.0, self.limiter.capacity)
+            if tokens < 0:
+                return None
+            conn.execute(
+                "INSERT OR REPLACE INTO limiter (name, tokens, updated) VALUES (?, ?, ?)", (LIMITER_NAME, tokens, at)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'publishing', attempts = attempts + 1, lease_until = ?, updated_at = ?"
+                " WHERE id = ?",
+                (now + lease, now, row[0]),
+            )
+        job = _job(row)
+        job["attempts"] += 1
+        return job
+
+    def _finish(self, job: Dict, status: str, publish_at: Optional[float] = None, **fields):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, publish_at = COALESCE(?, publish_at), lease_until = NULL,"
+                " linkedin_post_id = COALESCE(?, linkedin_post_id), post_url = COALESCE(?, post_url),"
+                " error = ?, updated_at = ? WHERE id = ?",
+                (status, publish_at, fields.get("linkedin_post_id"), fields.get("post_url"),
+                 fields.get("error"), now, job["id"]),
+            )
+
+    def publish(self, job: Dict) -> str:
+        """Publish one claimed job and write the outcome back; returns the new status"""
+        post = self.history.get_post(job["post_id"])
+        if post is None:
+            self._finish(job, "failed", error="post deleted from history")
+            return "failed"
+        if post.get("posted_to_linkedin") and post.get("linkedin_post_id"):
+            # Already live (e.g. published by an earlier job) - don't post it again
+            self._finish(job, "published", linkedin_post_id=post["linkedin_post_id"],
+                         post_url=post.get("linkedin_post_url"))
+            return "published"
+
+        result = self.poster.post_to_linkedin(post["generated_post"], visibility=job["visibility"])
+        if result.get("success"):
+            self._finish(job, "published", linkedin_post_id=result["post_id"], post_url=result["post_url"])
+            self.history.update_post(job["post_id"], {
+                "posted_to_linkedin": True,
+                "publish_status": "published",
+                "linkedin_post_id": result["post_id"],
+                "linkedin_post_url": result["post_url"],
+                "published_at": datetime.now().isoformat(),
+            })
+            return "published"
+
+        error = result.get("message", "")
+        if result.get("may_have_posted"):
+            status, retry_at = "unknown", None
+        elif result.get("retryable") and job["attempts"] < MAX_ATTEMPTS:
+            status, retry_at = "pending", time.time() + RETRY_DELAY * 2 ** (job["attempts"] - 1)
+        else:
+            status, retry_at = "failed", None
+        self._finish(job, status, publish_at=retry_at, error=error)
+        self.history.update_post(job["post_id"], {
+            "publish_status": "scheduled" if status == "pending" else status,
+            "publish_error": error,
+            "scheduled_for": _iso(retry_at) if retry_at else post.get("scheduled_for", ""),
+        })
+        return status
+
+    def run_once(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Publish every due job the rate limit allows right now; returns counts per outcome"""
+        self.recover_stale(now)
+        counts: Dict[str, int] = {}
+        validated = False
+        while True:
+            current = now or time.time()
+            due = self.next_due()
+            if due is None or due > current:
+                break
+            if not validated:
+                # Cached per token, so this costs at most one /me call per TTL
+                if not self.poster.test_connection():
+                    print("❌ החיבור ל-LinkedIn נכשל - הפרסום נדחה")
+                    break
+                validated = True
+            job = self._claim(current)
+            if job is None:
+                break
+            status = self.publish(job)
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def run_forever(self, poll_interval: float = 30.0):
+        """Worker loop: publish due jobs, then sleep until the next one or the next token"""
+        while True:
+            counts = self.run_once()
+            if counts:
+                print(f"📤 {counts}")
+            wait = poll_interval
+            due = self.next_due()
+            if due is not None:
+                wait = min(wait, max(due - time.time(), self.limit_wait()))
+            time.sleep(max(wait, 1.0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Schedule and publish posts to LinkedIn")
+    sub = parser.add_subparsers(dest="command", required=True)
+    enqueue = sub.add_parser("enqueue", help="schedule one post")
+    enqueue.add_argument("post_id")
+    enqueue.add_argument("--at", default=None, help="ISO publish time (default: now)")
+    enqueue.add_argument("--visibility", default="PUBLIC", choices=["PUBLIC", "CONNECTIONS"])
+    enqueue_all = sub.add_parser("enqueue-all", help="schedule every post not yet on LinkedIn")
+    enqueue_all.add_argument("--at", default=None, help="ISO time of the first post (default: now)")
+    enqueue_all.add_argument("--spacing", type=float, default=0, help="seconds between scheduled posts")
+    enqueue_all.add_argument("--visibility", default="PUBLIC", choices=["PUBLIC", "CONNECTIONS"])
+    run = sub.add_parser("run", help="publish due posts")
+    run.add_argument("--once", action="store_true", help="publish what's due now and exit")
+    run.add_argument("--poll", type=float, default=30.0, help="seconds between queue checks")
+    listing = sub.add_parser("list", help="show jobs")
+    listing.add_argument("--status", choices=STATUSES, default=None)
+    cancel = sub.add_parser("cancel", help="cancel a pending job")
+    cancel.add_argument("job_id", type=int)
+    requeue = sub.add_parser("requeue", help="retry a failed/cancelled/unknown job")
+    requeue.add_argument("job_id", type=int)
+    args = parser.parse_args(argv)
+
+    queue = PublishQueue()
+    if args.command == "enqueue":
+        job = queue.enqueue(args.post_id, _parse_time(args.at), args.visibility)
+        print(f"✅ job {job['id']}: {job['status']} ({_iso(job['publish_at'])})")
+    elif args.command == "enqueue-all":
+        start = _parse_time(args.at) or time.time()
+        posts = [p for p in reversed(queue.history.load()) if not p.get("posted_to_linkedin")]
+        for i, post in enumerate(posts):
+            queue.enqueue(post["id"], start + i * args.spacing, args.visibility)
+        print(f"✅ תוזמנו {len(posts)} פוסטים")
+    elif args.command == "run":
+        if args.once:
+            print(f"📤 {queue.run_once()}")
+        else:
+            print("🔄 מפרסם פוסטים מהתור (Ctrl+C לעצירה)...")
+            try:
+                queue.run_forever(args.poll)
+            except KeyboardInterrupt:
+                pass
+    elif args.command == "list":
+        for job in queue.jobs(args.status):
+            print(f"{job['id']:>5}  {job['status']:<10}  {_iso(job['publish_at'])}  {job['post_id']}"
+                  f"  {job['post_url'] or job['error'] or ''}")
+    elif args.command == "cancel":
+        print("✅ בוטל" if queue.cancel(args.job_id) else "❌ לא ניתן לבטל")
+    elif args.command == "requeue":
+        print("✅ הוחזר לתור" if queue.requeue(args.job_id) else "❌ לא ניתן להחזיר לתור")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Rate Limiting
+Token bucket משותף להגבלת קצב קריאות (LLM, LinkedIn API)
+"""
+
+import time
+import threading
+from typing import Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    ``rate_per_minute`` tokens are refilled continuously up to ``capacity``;
+    ``acquire`` blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if not rate_per_minute > 0:
+            raise ValueError(f"❌ קצב לא תקין: {rate_per_minute} לדקה (חייב להיות חיובי)")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(rate_per_minute / 60.0, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available; otherwise return the seconds to wait (0 on success)"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """Seconds until ``tokens`` would be available, without taking them"""
+        with self._lock:
+            self._refill()
+            return max(tokens - self.tokens, 0.0) / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """Block until ``tokens`` are available"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
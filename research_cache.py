@@ -0,0 +1,502 @@
+"""
+Research Cache
+קאש דו-שכבתי (זיכרון + דיסק) לתוצאות scraping וחיפוש, עם TTL, LRU ומדדים
+
+Usage:
+    python research_cache.py stats
+    python research_cache.py list
+    python research_cache.py prune [--max-bytes N]
+    python research_cache.py clear
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import asyncio
+import hashlib
+import argparse
+import threading
+import unicodedata
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+CACHE_DIR = Path("cache")
+STATS_FILE = "_stats.json"
+
+# Search results go stale quickly, scraped pages much less so
+DEFAULT_TTL = {
+    "scrape": int(os.getenv("RESEARCH_CACHE_SCRAPE_TTL", 7 * 24 * 3600)),
+    "search": int(os.getenv("RESEARCH_CACHE_SEARCH_TTL", 24 * 3600)),
+}
+DEFAULT_MAX_BYTES = int(os.getenv("RESEARCH_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+DEFAULT_MEMORY_ENTRIES = int(os.getenv("RESEARCH_CACHE_MEMORY_ENTRIES", 128))
+
+
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref", "ref_src", "si"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _is_url(text: str) -> bool:
+    lowered = text.lower()
+    return lowered.startswith(("http://", "https://", "www."))
+
+
+def canonical_url(url: str) -> str:
+    """https, lower-case host, no default port, trailing slash, fragment or tracking params"""
+    if url.lower().startswith("www."):
+        url = "https://" + url
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/")
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def canonical_topic(topic: str) -> str:
+    """NFKC, no Hebrew niqqud/cantillation marks, case-folded, single spaces"""
+    text = unicodedata.normalize("NFKC", topic)
+    text = "".join(ch for ch in text if not ("\u0591" <= ch <= "\u05c7" and unicodedata.combining(ch)))
+    return " ".join(text.casefold().split())
+
+
+def canonical_key(key: str) -> str:
+    """Equivalent URLs/topics map to the same cache key"""
+    key = key.strip()
+    return canonical_url(key) if _is_url(key) else canonical_topic(key)
+
+
+def key_hash(key: str) -> str:
+    return hashlib.sha256(canonical_key(key).encode("utf-8")).hexdigest()
+
+
+def _atomic_write(path: Path, data: str):
+    """Write via a unique temp file + rename, so readers never see a partial file"""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class _Flight:
+    """One in-progress fetch that concurrent callers wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class _AsyncFlight:
+    """One in-progress fetch task and how many callers are awaiting it"""
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class ResearchCache:
+    """Memory tier in front of a size-bounded disk tier.
+
+    Disk entries are ``<sha256>.json`` files in ``cache_dir``. Recency is kept
+    in an in-process LRU index (seeded from file mtimes), and the least
+    recently used entries are evicted once ``max_bytes`` is exceeded.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+        ttl: Optional[Dict[str, int]] = None,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.ttl = dict(DEFAULT_TTL, **(ttl or {}))
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._index: Optional["OrderedDict[str, int]"] = None  # hash -> size, LRU order
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._inflight: Dict[str, _Flight] = {}
+        self._ainflight: Dict[str, _AsyncFlight] = {}
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "normalized_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "expired": 0,
+            "evictions": 0,
+            "writes": 0,
+        }
+        self._flushed = dict.fromkeys(self.counters, 0)
+
+    # ---- disk index ----
+    def _entry_files(self):
+        return [f for f in self.cache_dir.glob("*.json") if len(f.stem) == 64]
+
+    def _ensure_index(self):
+        if self._index is not None:
+            return
+        files = []
+        for f in self._entry_files():
+            try:
+                st = f.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, f.stem, st.st_size))
+        self._index = OrderedDict((h, size) for _, h, size in sorted(files))
+        self._bytes = sum(self._index.values())
+
+    def _path(self, h: str) -> Path:
+        return self.cache_dir / f"{h}.json"
+
+    def _is_expired(self, entry: Dict) -> bool:
+        ttl = self.ttl.get(entry.get("kind", "scrape"), self.ttl["scrape"])
+        return time.time() - entry.get("created", 0) > ttl
+
+    def _read_disk(self, h: str) -> Optional[Dict]:
+        f = self._path(h)
+        try:
+            with open(f, "r", encoding="utf-8") as cf:
+                entry = json.load(cf)
+            # Entries written before TTLs existed only have "content"
+            entry.setdefault("created", f.stat().st_mtime)
+            entry.setdefault("kind", "scrape")
+            return entry
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _remember(self, h: str, entry: Dict):
+        self._memory[h] = entry
+        self._memory.move_to_end(h)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _remove(self, h: str):
+        self._memory.pop(h, None)
+        size = self._index.pop(h, None) if self._index is not None else None
+        if size is not None:
+            self._bytes -= size
+        self._path(h).unlink(missing_ok=True)
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._index:
+            h = next(iter(self._index))
+            self._remove(h)
+            self.counters["evictions"] += 1
+
+    # ---- public API ----
+    def get(self, key: str) -> Optional[str]:
+        """Cached content for ``key`` or None (expired entries are dropped).
+
+        Keys are canonicalized first, so equivalent URLs/topics share an entry.
+        """
+        h = key_hash(key)
+        with self._lock:
+            self._ensure_index()
+            entry = self._memory.get(h)
+            tier = "memory_hits"
+            if entry is None:
+                entry = self._read_disk(h)
+                tier = "disk_hits"
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            if self._is_expired(entry):
+                self._remove(h)
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            try:
+                if h not in self._index and tier == "disk_hits":
+                    # Written by another process since the index was built
+                    size = self._path(h).stat().st_size
+                    self._index[h] = size
+                    self._bytes += size
+                if h in self._index:
+                    self._index.move_to_end(h)
+                    os.utime(self._path(h))
+            except OSError:
+                # Deleted by another worker or the clear/prune CLI
+                self._remove(h)
+                self.counters["misses"] += 1
+                return None
+            self.counters[tier] += 1
+            if entry.get("input", key) != key:
+                # Served for a different spelling of the same URL/topic
+                self.counters["normalized_hits"] += 1
+            self._remember(h, entry)
+            return entry["content"]
+
+    def put(self, key: str, content: str, kind: str = "scrape"):
+        """Store ``content`` (``kind`` is "scrape" or "search" and picks the TTL)"""
+        h = key_hash(key)
+        entry = {"content": content, "kind": kind, "created": time.time(), "key": canonical_key(key), "input": key}
+        data = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._ensure_index()
+            _atomic_write(self._path(h), data)
+            size = len(data.encode("utf-8"))
+            self._bytes += size - self._index.get(h, 0)
+            self._index[h] = size
+            self._index.move_to_end(h)
+            self._remember(h, entry)
+            self.counters["writes"] += 1
+            self._evict()
+
+    def get_derived(self, key: str, name: str) -> Optional[Dict]:
+        """Value stored with ``put_derived`` next to the content for ``key`` (not counted as a lookup)"""
+        h = key_hash(key)
+        with self._lock:
+            entry = self._memory.get(h) or self._read_disk(h)
+            if entry is None or self._is_expired(entry):
+                return None
+            return entry.get("derived", {}).get(name)
+
+    def put_derived(self, key: str, name: str, value: Dict):
+        """Store ``value`` (e.g. a reduced form of the content) in the entry for ``key``.
+
+        Derived values share the entry's TTL and are dropped when ``put``
+        replaces the content. Does nothing if ``key`` isn't cached.
+        """
+        h = key_hash(key)
+        with self._lock:
+            self._ensure_index()
+            entry = self._memory.get(h) or self._read_disk(h)
+            if entry is None or self._is_expired(entry):
+                return
+            entry = dict(entry, derived=dict(entry.get("derived", {}), **{name: value}))
+            data = json.dumps(entry, ensure_ascii=False)
+            _atomic_write(self._path(h), data)
+            size = len(data.encode("utf-8"))
+            self._bytes += size - self._index.get(h, 0)
+            self._index[h] = size
+            self._index.move_to_end(h)
+            self._remember(h, entry)
+            self._evict()
+
+    def get_or_fetch(self, key: str, fetch: Callable[[str], Optional[Tuple[str, str]]]) -> Optional[str]:
+        """Cached content, or the result of ``fetch(key)`` -> ``(content, kind)``.
+
+        Concurrent callers for the same (canonical) key share a single fetch:
+        the first one runs it, the rest wait and get its result. ``None``
+        results are not cached.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        h = key_hash(key)
+        with self._lock:
+            flight = self._inflight.get(h)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[h] = _Flight()
+                # Another leader may have finished between get() and here
+                entry = self._memory.get(h)
+                if entry is not None and not self._is_expired(entry):
+                    del self._inflight[h]
+                    return entry["content"]
+            else:
+                self.counters["coalesced"] += 1
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            result = fetch(key)
+            if result is not None:
+                content, kind = result
+                self.put(key, content, kind=kind)
+                flight.result = content
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(h, None)
+            flight.event.set()
+
+    async def aget_or_fetch(
+        self, key: str, fetch: Callable[[str], Awaitable[Optional[Tuple[str, str]]]]
+    ) -> Optional[str]:
+        """``get_or_fetch`` for coroutines: concurrent awaiters of the same key share one fetch.
+
+        Only coalesces callers on the same event loop. The fetch runs in its
+        own task, so cancelling one caller doesn't cancel the others; it is
+        only cancelled once every caller awaiting it has gone. The disk tier
+        is read and written in worker threads, off the event loop.
+        """
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            return cached
+        h = key_hash(key)
+        loop = asyncio.get_running_loop()
+        flight = self._ainflight.get(h)
+        if flight is not None and flight.task.get_loop() is loop and not flight.task.done():
+            with self._lock:
+                self.counters["coalesced"] += 1
+        else:
+            flight = self._ainflight[h] = _AsyncFlight(loop.create_task(self._afetch_and_put(key, fetch)))
+            flight.task.add_done_callback(lambda _, h=h, flight=flight: self._ainflight.get(h) is flight
+                                          and self._ainflight.pop(h))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    async def _afetch_and_put(self, key: str, fetch) -> Optional[str]:
+        result = await fetch(key)
+        if result is None:
+            return None
+        content, kind = result
+        await asyncio.to_thread(self.put, key, content, kind)
+        return content
+
+    def prune(self, max_bytes: Optional[int] = None) -> Dict[str, int]:
+        """Drop expired entries, then evict LRU entries down to ``max_bytes``"""
+        removed = 0
+        with self._lock:
+            self._ensure_index()
+            for h in list(self._index):
+                entry = self._read_disk(h)
+                if entry is None or self._is_expired(entry):
+                    self._remove(h)
+                    removed += 1
+            evictions = self.counters["evictions"]
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._evict()
+            return {"expired": removed, "evicted": self.counters["evictions"] - evictions}
+
+    def clear(self):
+        with self._lock:
+            self._ensure_index()
+            for h in list(self._index):
+                self._remove(h)
+
+    def entries(self):
+        """(key, kind, size, age_seconds, expired) for every disk entry, most recent first"""
+        with self._lock:
+            self._ensure_index()
+            hashes = list(reversed(self._index))
+        for h in hashes:
+            entry = self._read_disk(h)
+            if entry is None:
+                continue
+            yield {
+                "key": entry.get("key", h),
+                "kind": entry["kind"],
+                "size": self._index.get(h, 0),
+                "age": time.time() - entry["created"],
+                "expired": self._is_expired(entry),
+            }
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters (this process + persisted) and disk usage"""
+        with self._lock:
+            self._ensure_index()
+            totals = self._persisted_stats()
+            for name, value in self.counters.items():
+                totals[name] = totals.get(name, 0) + value - self._flushed[name]
+            hits = totals["memory_hits"] + totals["disk_hits"]
+            lookups = hits + totals["misses"]
+            totals.update({
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            })
+            return totals
+
+    def _persisted_stats(self) -> Dict[str, int]:
+        f = self.cache_dir / STATS_FILE
+        if f.exists():
+            try:
+                with open(f, "r", encoding="utf-8") as sf:
+                    return json.load(sf)
+            except json.JSONDecodeError:
+                pass
+        return dict.fromkeys(self.counters, 0)
+
+    def flush_stats(self):
+        """Add this process's counters to the persisted totals"""
+        with self._lock:
+            totals = self._persisted_stats()
+            for name, value in self.counters.items():
+                totals[name] = totals.get(name, 0) + value - self._flushed[name]
+            self._flushed = dict(self.counters)
+            _atomic_write(self.cache_dir / STATS_FILE, json.dumps(totals))
+
+
+_shared_cache: Optional[ResearchCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_research_cache() -> ResearchCache:
+    """Process-wide cache instance, so the memory tier is shared by all callers"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResearchCache()
+            atexit.register(_shared_cache.flush_stats)
+        return _shared_cache
+
+
+def _format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}TB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and prune the research cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="hit/miss/eviction counters and disk usage")
+    sub.add_parser("list", help="list cached entries")
+    prune = sub.add_parser("prune", help="drop expired entries and enforce the size budget")
+    prune.add_argument("--max-bytes", type=int, default=None)
+    sub.add_parser("clear", help="delete every cached entry")
+    args = parser.parse_args(argv)
+
+    cache = ResearchCache()
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"📦 {stats['entries']} רשומות, {_format_bytes(stats['bytes'])} / {_format_bytes(stats['max_bytes'])}")
+        print(f"🎯 hit rate: {stats['hit_rate']:.1%}")
+        for name in cache.counters:
+            print(f"   • {name}: {stats[name]}")
+    elif args.command == "list":
+        for entry in cache.entries():
+            flag = "⌛" if entry["expired"] else "✅"
+            print(f"{flag} [{entry['kind']}] {_format_bytes(entry['size']):>8}  {entry['age'] / 3600:7.1f}h  {entry['key']}")
+    elif args.command == "prune":
+        result = cache.prune(args.max_bytes)
+        cache.flush_stats()
+        print(f"🧹 נמחקו {result['expired']} רשומות שפג תוקפן, {result['evicted']} לפי LRU")
+    elif args.command == "clear":
+        cache.clear()
+        print("🗑️ הקאש נוקה")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Result Cache
+שמירת הפוסט הסופי לפי hash של הקלט, קובץ הסגנון, הגדרות ה-YAML, המודל ומצב ה-pipeline
+
+Usage:
+    python result_cache.py stats
+    python result_cache.py clear
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from research_cache import canonical_key, _atomic_write
+
+RESULT_CACHE_DIR = Path(os.getenv("RESULT_CACHE_DIR", "cache/results"))
+STATS_FILE = "_stats.json"
+# Research for a topic goes stale, so even an identical request is regenerated eventually
+DEFAULT_TTL = int(os.getenv("RESULT_CACHE_TTL", 7 * 24 * 3600))
+
+
+def enabled() -> bool:
+    return os.getenv("RESULT_CACHE", "on").lower() not in ("off", "0", "false", "no")
+
+
+def _digest(value) -> str:
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_key(content_input: str, writing_style: Dict, agents_config: Dict, tasks_config: Dict,
+              model: str = "", temperature: Optional[float] = None, mode: str = "") -> str:
+    """Hash of everything a generated post depends on (besides the research itself)"""
+    return _digest({
+        "input": canonical_key(content_input),
+        "style": _digest({
+            "examples": writing_style.get("examples", []),
+            "style_guidelines": writing_style.get("style_guidelines", ""),
+        }),
+        "yaml": _digest({"agents": agents_config, "tasks": tasks_config}),
+        "model": model,
+        "temperature": temperature,
+        # "fast" skips the review tasks, so its posts differ from the full pipeline's
+        "mode": mode,
+    })
+
+
+class ResultCache:
+    """``<key>.json`` files holding a finished post and what it cost to generate.
+
+    Hit/miss counters, plus the LLM calls, tokens and seconds that hits
+    saved, are kept per process and added to ``_stats.json`` on flush.
+    """
+
+    counter_names = ("hits", "misses", "expired", "writes", "saved_llm_calls", "saved_tokens", "saved_seconds")
+
+    def __init__(self, cache_dir: Path = RESULT_CACHE_DIR, ttl: int = DEFAULT_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(self.counter_names, 0)
+        self._flushed = dict.fromkeys(self.counter_names, 0)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _read(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if time.time() - entry.get("created", 0) > self.ttl:
+            return None
+        return entry
+
+    def contains(self, key: str) -> bool:
+        """Whether ``key`` would hit, without counting a lookup"""
+        return self._read(key) is not None
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached entry ({"result", "llm_calls", "tokens", "generation_time", ...}), or None"""
+        entry = self._read(key)
+        with self._lock:
+            if entry is None:
+                self.counters["misses"] += 1
+                if self._path(key).exists():
+                    self.counters["expired"] += 1
+                return None
+            self.counters["hits"] += 1
+            self.counters["saved_llm_calls"] += entry.get("llm_calls", 0)
+            self.counters["saved_tokens"] += entry.get("tokens", 0)
+            self.counters["saved_seconds"] += entry.get("generation_time", 0.0)
+        return entry
+
+    def put(self, key: str, content_input: str, result: str, llm_calls: int = 0, tokens: int = 0,
+            generation_time: float = 0.0):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(self._path(key), json.dumps({
+            "input": content_input,
+            "result": result,
+            "created": time.time(),
+            "llm_calls": llm_calls,
+            "tokens": tokens,
+            "generation_time": generation_time,
+        }, ensure_ascii=False))
+        with self._lock:
+            self.counters["writes"] += 1
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def entries(self) -> int:
+        return sum(1 for f in self.cache_dir.glob("*.json") if len(f.stem) == 64) if self.cache_dir.exists() else 0
+
+    def stats(self) -> Dict:
+        """Counters (this process + persisted), hit rate and entry count"""
+        with self._lock:
+            totals = self._persisted_stats()
+            for name, value in self.counters.items():
+                totals[name] = totals.get(name, 0) + value - self._flushed[name]
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+        totals["entries"] = self.entries()
+        return totals
+
+    def _persisted_stats(self) -> Dict:
+        try:
+            with open(self.cache_dir / STATS_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict.fromkeys(self.counter_names, 0)
+
+    def flush_stats(self):
+        """Add this process's counters to the persisted totals"""
+        with self._lock:
+            totals = self._persisted_stats()
+            for name, value in self.counters.items():
+                totals[name] = totals.get(name, 0) + value - self._flushed[name]
+            self._flushed = dict(self.counters)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            _atomic_write(self.cache_dir / STATS_FILE, json.dumps(totals))
+
+
+_shared_cache: Optional[ResultCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide result cache"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResultCache()
+            atexit.register(_shared_cache.flush_stats)
+        return _shared_cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the generated-post result cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="hit/miss counters and the LLM spend saved by hits")
+    sub.add_parser("clear", help="delete every cached result")
+    args = parser.parse_args(argv)
+
+    cache = ResultCache()
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"📦 {stats['entries']} פוסטים שמורים")
+        print(f"🎯 hit rate: {stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['misses']} misses)")
+        print(f"💰 נחסכו {stats['saved_llm_calls']} קריאות LLM, {stats['saved_tokens']} טוקנים, "
+              f"{stats['saved_seconds']:.0f}s")
+    elif args.command == "clear":
+        cache.clear()
+        print("🗑️ קאש התוצאות נוקה")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Search Index
+חיפוש טקסט מלא בהיסטוריית הפוסטים (SQLite FTS5, עברית ואנגלית)
+
+Usage:
+    python search_index.py search "סוכני AI" [--page 2]
+    python search_index.py rebuild
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from research_cache import canonical_topic
+
+DEFAULT_INDEX_PATH = Path(os.getenv("SEARCH_INDEX_PATH", "data/search_index.db"))
+FIELDS = ("content_input", "generated_post")
+# Bump when what is indexed changes; an index built by another version is rebuilt
+INDEX_VERSION = 2
+
+# Hebrew attaches these letters to the next word: ו-, ה-, ב-, ל-, מ-, ש-, כ-
+HEBREW_PREFIXES = "והבלמשכ"
+# bm25 weights for content_input, generated_post and the normalized/prefix-stripped terms
+RANK_WEIGHTS = (2.0, 1.0, 0.5)
+# Above this many matches (a stopword-like query) bm25 ranking and exact counting cost
+# tens of ms, so results come newest first and the total is reported as RANK_LIMIT + 1
+RANK_LIMIT = 2000
+SNIPPET_TOKENS = 16
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_HEBREW_WORD = re.compile(r"^[א-ת]+$")
+
+
+def normalize(text: str) -> str:
+    """Text as matched: NFKC, no niqqud (FTS5 would split words on the marks)"""
+    return canonical_topic(text) if text else ""
+
+
+def hebrew_stems(word: str) -> List[str]:
+    """``word`` without up to two leading prefix letters ("והבינה" -> "הבינה", "בינה")"""
+    stems = []
+    stem = word
+    for _ in range(2):
+        if len(stem) > 3 and stem[0] in HEBREW_PREFIXES:
+            stem = stem[1:]
+            stems.append(stem)
+        else:
+            break
+    return stems
+
+
+def prefix_terms(text: str) -> str:
+    """Extra column with prefix-stripped Hebrew words, so "בינה" also finds "והבינה" """
+    terms = []
+    for word in _WORD.findall(text):
+        if _HEBREW_WORD.match(word):
+            terms.extend(hebrew_stems(word))
+    return " ".join(terms)
+
+
+def index_terms(text: str) -> str:
+    """``terms`` column: words that only match once normalized (niqqud, NFKC forms) and their Hebrew stems.
+
+    The text columns keep the original text for ``snippet()``.
+    """
+    normalized = normalize(text)
+    original = {word.lower() for word in _WORD.findall(text)}
+    extra = [word for word in _WORD.findall(normalized) if word not in original]
+    return " ".join(term for term in (" ".join(extra), prefix_terms(normalized)) if term)
+
+
+def build_match(query: str) -> str:
+    """FTS5 MATCH expression: every word must appear, user syntax is escaped.
+
+    Only the last word is a prefix query ("agent" -> "agents"), since
+    prefix lookups of common words cost far more than exact ones.
+    """
+    words = _WORD.findall(normalize(query))
+    clauses = []
+    for i, word in enumerate(words):
+        variants = [word] + (hebrew_stems(word) if _HEBREW_WORD.match(word) else [])
+        star = "*" if i == len(words) - 1 else ""
+        # Quoting keeps words like AND/OR/NEAR and stray quotes from being parsed as syntax
+        options = " OR ".join(f'"{v}"{star}' for v in variants)
+        clauses.append(f"({options})" if len(variants) > 1 else options)
+    return " AND ".join(clauses)
+
+
+class SearchIndex:
+    """Persistent FTS5 inverted index over ``content_input`` and ``generated_post``.
+
+    ``docs`` maps post ids to FTS rowids, so inserts and deletes touch a
+    single document. The text columns hold the posts as written (for
+    snippets); normalized forms and Hebrew stems go in ``terms``.
+    """
+
+    fields = FIELDS
+
+    def __init__(self, path: Path = DEFAULT_INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._synced = False
+        self._lock = threading.Lock()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS docs (rowid INTEGER PRIMARY KEY, post_id TEXT NOT NULL UNIQUE)")
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+                " content_input, generated_post, terms,"
+                " tokenize = 'unicode61 remove_diacritics 2',"
+                # Prefix indexes keep short "word*" queries from scanning every matching term
+                " prefix = '2 3')"
+            )
+            if conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                # Indexed by another version: start over, the next sync re-indexes every post
+                conn.execute("DELETE FROM docs")
+                conn.execute("DELETE FROM posts_fts")
+                conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, post_id: str):
+        row = conn.execute("SELECT rowid FROM docs WHERE post_id = ?", (post_id,)).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM posts_fts WHERE rowid = ?", (row[0],))
+            conn.execute("DELETE FROM docs WHERE rowid = ?", (row[0],))
+
+    # ---- PostHistory hooks ----
+
+    def add(self, post: Dict):
+        """Index (or re-index) one post"""
+        self.add_many([post])
+
+    def add_many(self, posts: Iterable[Dict]):
+        with self._conn() as conn:
+            for post in posts:
+                self._delete(conn, post["id"])
+                content_input = str(post.get("content_input", ""))
+                generated_post = str(post.get("generated_post", ""))
+                rowid = conn.execute("INSERT INTO docs (post_id) VALUES (?)", (post["id"],)).lastrowid
+                conn.execute(
+                    "INSERT INTO posts_fts (rowid, content_input, generated_post, terms) VALUES (?, ?, ?, ?)",
+                    (rowid, content_input, generated_post, index_terms(f"{content_input}\n{generated_post}")),
+                )
+
+    def remove(self, post_id: str):
+        with self._conn() as conn:
+            self._delete(conn, post_id)
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM docs")
+            conn.execute("DELETE FROM posts_fts")
+        self._synced = False
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def sync(self, history, force: bool = False) -> int:
+        """Index posts saved before the index existed (or drop ones deleted behind its back)"""
+        with self._lock:
+            if self._synced and not force:
+                return 0
+            self._synced = True
+            if not force and self.count() == history.count():
+                return 0
+            posts = history.load()
+            known = {r[0] for r in self._conn().execute("SELECT post_id FROM docs")}
+            current = {p["id"] for p in posts}
+            with self._conn() as conn:
+                for post_id in known - current:
+                    self._delete(conn, post_id)
+            # Oldest first, so rowid order follows post age for the unranked fallback
+            missing = [p for p in reversed(posts) if p["id"] not in known]
+            self.add_many(missing)
+            return len(missing) + len(known - current)
+
+    # ---- queries ----
+
+    def search(self, query: str, limit: int = 12, offset: int = 0) -> Tuple[List[Dict], int]:
+        """Best-ranked matches as [{"id", "snippet", "rank"}] plus the match count (capped at RANK_LIMIT + 1)"""
+        match = build_match(query)
+        if not match:
+            return [], 0
+        conn = self._conn()
+        try:
+            total = conn.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM posts_fts WHERE posts_fts MATCH ? LIMIT ?)",
+                (match, RANK_LIMIT + 1),
+            ).fetchone()[0]
+            ranked = total <= RANK_LIMIT
+            # bm25 needs corpus-wide statistics, so it is only computed when ranking
+            rank = "bm25(posts_fts, ?, ?, ?)" if ranked else "0.0"
+            rows = conn.execute(
+                "SELECT docs.post_id,"
+                f" snippet(posts_fts, 1, '«', '»', '…', {SNIPPET_TOKENS}),"
+                f" {rank} AS rank"
+                " FROM posts_fts JOIN docs ON docs.rowid = posts_fts.rowid"
+                f" WHERE posts_fts MATCH ? ORDER BY {'rank' if ranked else 'posts_fts.rowid DESC'} LIMIT ? OFFSET ?",
+                (*(RANK_WEIGHTS if ranked else ()), match, limit, offset),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return [], 0
+        return [{"id": r[0], "snippet": r[1], "rank": r[2]} for r in rows], total
+
+    def find_posts(self, query: str, history, limit: int = 12, offset: int = 0) -> Tuple[List[Dict], int]:
+        """Ranked posts from ``history`` matching ``query`` (each with a "snippet"), plus the total"""
+        self.sync(history)
+        hits, total = self.search(query, limit, offset)
+        posts = []
+        for hit in hits:
+            post = history.get_post(hit["id"])
+            if post is not None:
+                posts.append(dict(post, snippet=hit["snippet"]))
+        return posts, total
+
+
+_shared_index: Optional[SearchIndex] = None
+_shared_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Process-wide search index for the default post store"""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = SearchIndex()
+        return _shared_index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search over post history")
+    sub = parser.add_subparsers(dest="command", required=True)
+    search = sub.add_parser("search", help="search posts")
+    search.add_argument("query")
+    search.add_argument("--page", type=int, default=1)
+    search.add_argument("--page-size", type=int, default=10)
+    sub.add_parser("rebuild", help="re-index the whole post history")
+    args = parser.parse_args(argv)
+
+    from post_store import PostHistory
+
+    history = PostHistory()
+    index = get_search_index()
+    if args.command == "rebuild":
+        start = time.perf_counter()
+        index.clear()
+        changed = index.sync(history, force=True)
+        print(f"✅ אונדקסו {changed} פוסטים ({time.perf_counter() - start:.1f}s)")
+        return 0
+
+    index.sync(history)
+    start = time.perf_counter()
+    posts, total = index.find_posts(args.query, history, args.page_size, (args.page - 1) * args.page_size)
+    elapsed = (time.perf_counter() - start) * 1000
+    for post in posts:
+        print(f"{post['id']}  {post.get('content_input', '')[:60]!r}\n    {post['snippet']}")
+    print(f"🔎 {total} תוצאות, עמוד {args.page} ({elapsed:.1f}ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
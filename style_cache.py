@@ -0,0 +1,49 @@
+"""
+Style Analysis Cache
+שמירת תוצאת ניתוח הסגנון לפי hash של קובץ הסגנון והגדרות ה-YAML
+"""
+
+import json
+import shutil
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional
+
+from research_cache import _atomic_write
+
+STYLE_CACHE_DIR = Path("cache/style_analysis")
+
+
+def cache_key(writing_style: Dict, agent_config: Dict, task_config: Dict, model: str = "") -> str:
+    """Content hash of everything the style analysis output depends on"""
+    payload = json.dumps(
+        {
+            "examples": writing_style.get("examples", []),
+            "style_guidelines": writing_style.get("style_guidelines", ""),
+            "agent": agent_config,
+            "task": task_config,
+            "model": model,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load(key: str) -> Optional[str]:
+    """Cached style analysis for ``key``, or None"""
+    try:
+        with open(STYLE_CACHE_DIR / f"{key}.json", "r", encoding="utf-8") as cf:
+            return json.load(cf)["analysis"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def save(key: str, analysis: str):
+    STYLE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _atomic_write(STYLE_CACHE_DIR / f"{key}.json", json.dumps({"analysis": analysis}, ensure_ascii=False))
+
+
+def clear():
+    """Drop all cached analyses (called whenever the style file is rewritten)"""
+    shutil.rmtree(STYLE_CACHE_DIR, ignore_errors=True)
@@ -5,6 +5,8 @@
 
 import json
 from pathlib import Path
+import style_cache
+from research_cache import _atomic_write
 
 def collect_writing_samples():
     """Collect writing samples from user"""
@@ -95,7 +97,7 @@ def collect_style_guidelines():
 
 def save_style_data(examples, guidelines):
     """Save the writing style data"""
-    config_dir = Path("config")
+    config_dir = Path(__file__).resolve().parent / "config"
     config_dir.mkdir(exist_ok=True)
     
     style_data = {
@@ -107,8 +109,9 @@ def save_style_data(examples, guidelines):
         }
     }
     
-    with open(config_dir / "writing_style.json", "w", encoding="utf-8") as f:
-        json.dump(style_data, f, ensure_ascii=False, indent=2)
+    # Generations running meanwhile read the style file; they must never see it half written
+    _atomic_write(config_dir / "writing_style.json", json.dumps(style_data, ensure_ascii=False, indent=2))
+    style_cache.clear()
     
     print("\n" + "=" * 60)
     print("✅ סגנון הכתיבה נשמר בהצלחה!")
@@ -0,0 +1,270 @@
+"""
+Pipeline Tracing
+מדידת זמנים, זמני המתנה, טוקנים וניסיונות חוזרים לכל שלב ב-pipeline
+
+Usage:
+    python tracing.py export traces.json [--format otel] [--limit 100]
+    python tracing.py cache [--limit 100]
+"""
+
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+ROOT_SPAN = "generate_post"
+
+
+def _span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Trace:
+    """Spans for one generation, fed by the pipeline's progress events.
+
+    Each stage span records wall time, queue time (how long the stage waited
+    after its dependencies finished), LLM calls, prompt/completion tokens and
+    retries (failed LLM calls). ``calls`` keeps every LLM call with its
+    latency and how many of its prompt tokens the provider served from its
+    prompt cache.
+    """
+
+    def __init__(self, name: str = ROOT_SPAN):
+        self.trace_id = uuid.uuid4().hex
+        self.root = self._new_span(name, None, time.time())
+        self.spans: Dict[str, Dict] = {}
+        self.dependencies: Dict[str, List[str]] = {}
+        self.kickoff_time: Optional[float] = None
+        self._pending_prompt: Dict[str, int] = {}
+        self.calls: List[Dict] = []
+        self._open_calls: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _new_span(self, name: str, parent: Optional[str], start: float) -> Dict:
+        return {
+            "name": name,
+            "span_id": _span_id(),
+            "parent_span_id": parent,
+            "start": start,
+            "end": None,
+            "status": "ok",
+            "attributes": {},
+        }
+
+    def _stage(self, name: str, start: Optional[float] = None) -> Dict:
+        span = self.spans.get(name)
+        if span is None:
+            span = self.spans[name] = self._new_span(name, self.root["span_id"], start or time.time())
+            span["attributes"].update({
+                "queue_time": 0.0,
+                "llm_calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cached_prompt_tokens": 0,
+                "prompt_cache_hits": 0,
+                "retries": 0,
+                "tokens_estimated": False,
+            })
+        return span
+
+    def on_event(self, event: Dict):
+        """Progress-event listener (see ``agents.generate_post_with_timings``)"""
+        kind = event["type"]
+        at = event.get("time", time.time())
+        with self._lock:
+            if kind == "pipeline_started":
+                self.kickoff_time = at
+                self.dependencies = event.get("dependencies", {})
+            elif kind == "stage_started":
+                span = self._stage(event["stage"], at)
+                span["start"] = at
+                if event.get("agent"):
+                    span["attributes"]["agent"] = event["agent"]
+            elif kind in ("stage_completed", "stage_failed"):
+                span = self._stage(event["stage"], at)
+                span["end"] = at
+                if kind == "stage_failed":
+                    span["status"] = "error"
+                    span["attributes"]["error"] = event.get("error", "")
+            elif kind == "llm_call_started":
+                attrs = self._stage(event["stage"], at)["attributes"]
+                attrs["llm_calls"] += 1
+                self._pending_prompt[event["stage"]] = event.get("prompt_tokens_estimate", 0)
+                call = {"stage": event["stage"], "start": at, "end": None, "status": "ok",
+                        "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0}
+                self.calls.append(call)
+                self._open_calls[event["stage"]] = call
+            elif kind == "llm_call_completed":
+                attrs = self._stage(event["stage"], at)["attributes"]
+                prompt = event.get("prompt_tokens", 0)
+                if event.get("estimated"):
+                    prompt = self._pending_prompt.get(event["stage"], 0)
+                    attrs["tokens_estimated"] = True
+                attrs["prompt_tokens"] += prompt
+                attrs["completion_tokens"] += event.get("completion_tokens", 0)
+                cached = event.get("cached_prompt_tokens", 0)
+                attrs["cached_prompt_tokens"] += cached
+                attrs["prompt_cache_hits"] += 1 if cached else 0
+                call = self._open_calls.pop(event["stage"], None)
+                if call is not None:
+                    call.update(end=at, prompt_tokens=prompt, cached_prompt_tokens=cached,
+                                completion_tokens=event.get("completion_tokens", 0))
+            elif kind == "llm_call_failed":
+                self._stage(event["stage"], at)["attributes"]["retries"] += 1
+                call = self._open_calls.pop(event["stage"], None)
+                if call is not None:
+                    call.update(end=at, status="error")
+            elif kind == "stage_attributes":
+                self._stage(event["stage"], at)["attributes"].update(event.get("attributes", {}))
+
+    def finish(self, status: str = "ok"):
+        """Close the root span and derive queue times from stage dependencies"""
+        with self._lock:
+            self.root["end"] = time.time()
+            self.root["status"] = status
+            for name, span in self.spans.items():
+                if span["end"] is None:
+                    span["end"] = self.root["end"]
+                if name not in self.dependencies:
+                    continue
+                ready = self.kickoff_time or span["start"]
+                for dep in self.dependencies[name]:
+                    dep_span = self.spans.get(dep)
+                    if dep_span and dep_span["end"]:
+                        ready = max(ready, dep_span["end"])
+                span["attributes"]["queue_time"] = max(span["start"] - ready, 0.0)
+
+    def stage_timings(self) -> Dict[str, float]:
+        """Wall time per stage plus "total" """
+        timings = {name: span["end"] - span["start"] for name, span in self.spans.items() if span["end"]}
+        if self.root["end"]:
+            timings["total"] = self.root["end"] - self.root["start"]
+        return timings
+
+    def to_dict(self) -> Dict:
+        """Compact form stored with each post record"""
+        return {"trace_id": self.trace_id, "spans": [self.root] + list(self.spans.values()), "calls": self.calls}
+
+
+def stage_summary(trace: Dict) -> Dict[str, Dict]:
+    """Per-stage wall time, tokens and prompt-cached tokens from a stored trace dict"""
+    summary = {}
+    for span in trace.get("spans", []):
+        if span.get("parent_span_id") is None or span.get("end") is None:
+            continue
+        attrs = span.get("attributes", {})
+        summary[span["name"]] = {
+            "wall_time": span["end"] - span["start"],
+            "queue_time": attrs.get("queue_time", 0.0),
+            "tokens": attrs.get("prompt_tokens", 0) + attrs.get("completion_tokens", 0),
+            "cached_tokens": attrs.get("cached_prompt_tokens", 0),
+        }
+    return summary
+
+
+def prompt_cache_report(traces: List[Dict]) -> Dict[str, Dict]:
+    """Per stage: LLM calls, the share of prompt tokens served from the provider's prompt
+    cache, and the mean latency of calls with and without a cache hit"""
+    report: Dict[str, Dict] = {}
+    for trace in traces:
+        for call in trace.get("calls", []):
+            if call.get("end") is None or call.get("status") != "ok":
+                continue
+            row = report.setdefault(call["stage"], {"calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0,
+                                                    "hit_latencies": [], "miss_latencies": []})
+            row["calls"] += 1
+            row["prompt_tokens"] += call["prompt_tokens"]
+            row["cached_prompt_tokens"] += call["cached_prompt_tokens"]
+            latencies = row["hit_latencies"] if call["cached_prompt_tokens"] else row["miss_latencies"]
+            latencies.append(call["end"] - call["start"])
+    for row in report.values():
+        hits, misses = row.pop("hit_latencies"), row.pop("miss_latencies")
+        row["cache_hits"] = len(hits)
+        row["cached_ratio"] = row["cached_prompt_tokens"] / row["prompt_tokens"] if row["prompt_tokens"] else 0.0
+        row["avg_latency_hit"] = sum(hits) / len(hits) if hits else None
+        row["avg_latency_miss"] = sum(misses) / len(misses) if misses else None
+    return report
+
+
+def _otel_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otel(traces: List[Dict], service_name: str = "linkedin-post-generator") -> Dict:
+    """OTLP/JSON-style export of stored traces"""
+    spans = []
+    for trace in traces:
+        calls = trace.get("calls", [])
+        for span in trace.get("spans", []):
+            events = [
+                {
+                    "name": "llm_call",
+                    "timeUnixNano": str(int(call["start"] * 1e9)),
+                    "attributes": [
+                        {"key": f"llm.{k}", "value": _otel_value(call[k])}
+                        for k in ("status", "prompt_tokens", "cached_prompt_tokens", "completion_tokens")
+                    ] + [{"key": "llm.latency", "value": _otel_value((call["end"] or call["start"]) - call["start"])}],
+                }
+                for call in calls if call["stage"] == span["name"]
+            ]
+            spans.append({
+                "traceId": trace["trace_id"],
+                "spanId": span["span_id"],
+                "parentSpanId": span.get("parent_span_id") or "",
+                "name": span["name"],
+                "startTimeUnixNano": str(int(span["start"] * 1e9)),
+                "endTimeUnixNano": str(int((span.get("end") or span["start"]) * 1e9)),
+                "status": {"code": 2 if span.get("status") == "error" else 1},
+                "attributes": [
+                    {"key": f"pipeline.{k}", "value": _otel_value(v)} for k, v in span.get("attributes", {}).items()
+                ],
+                "events": events,
+            })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export pipeline traces stored with posts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write traces to a JSON file")
+    export.add_argument("out", help="output file")
+    export.add_argument("--format", choices=["json", "otel"], default="json")
+    export.add_argument("--limit", type=int, default=None, help="only the newest N posts")
+    cache = sub.add_parser("cache", help="prompt-cache hits and latency per stage")
+    cache.add_argument("--limit", type=int, default=None, help="only the newest N posts")
+    args = parser.parse_args(argv)
+
+    from post_store import PostHistory
+
+    posts = PostHistory().list_posts(limit=args.limit)
+    traces = [dict(p["trace"], post_id=p["id"]) for p in posts if p.get("trace")]
+    if args.command == "cache":
+        for stage, row in prompt_cache_report(traces).items():
+            hit = f"{row['avg_latency_hit']:.2f}s" if row["avg_latency_hit"] is not None else "-"
+            miss = f"{row['avg_latency_miss']:.2f}s" if row["avg_latency_miss"] is not None else "-"
+            print(f"{stage}: {row['cache_hits']}/{row['calls']} קריאות עם cache hit, "
+                  f"{row['cached_ratio']:.0%} מטוקני הפרומפט מהקאש, latency {hit} (hit) / {miss} (miss)")
+        return 0
+    data = to_otel(traces) if args.format == "otel" else traces
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"✅ יוצאו {len(traces)} traces ל-{args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())